@@ -0,0 +1,180 @@
+"""
+Benchmarks the queries which the database indexes are for, before and after
+applying the migrations.
+
+A copy of the database schema (without its data or indexes) is filled with
+generated rows, and the query plan and time of each query are shown. Without
+the indexes each query scans its whole table, whereas with them each query
+searches an index.
+
+Run the following command from the project root directory:
+
+    poetry run python -m benchmarks.benchmark_indexes --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_migrations as helper_migrations
+
+NUM_USERS = 10000
+QUERIES = {
+    "incomplete carpools": (
+        "SELECT journey_id FROM carpool_ride WHERE is_complete=0 "
+        "AND (pickup_epoch, journey_id) > (?, 0) "
+        "ORDER BY pickup_epoch ASC, journey_id ASC LIMIT 21;",
+        (int(time.time()),),
+    ),
+    "carpools drove": (
+        "SELECT COUNT(journey_id) FROM carpool_ride WHERE driver=? AND is_complete=1;",
+        ("user42",),
+    ),
+    "user rating": (
+        "SELECT AVG(rating_given), COUNT(rating_given) FROM rating "
+        "WHERE rated_username=?;",
+        ("user42",),
+    ),
+    "carpools joined": (
+        "SELECT COUNT(request_id) FROM carpool_request "
+        "WHERE requester=? AND journey_id IS NOT NULL;",
+        ("user42",),
+    ),
+    "passenger list": (
+        "SELECT requester FROM carpool_request WHERE journey_id=?;",
+        (42,),
+    ),
+    "interested carpools": (
+        "SELECT journey_id FROM carpool_interest WHERE username=?;",
+        ("user42",),
+    ),
+    "carpool interest": (
+        "SELECT * FROM carpool_interest WHERE journey_id=?;",
+        (42,),
+    ),
+    "route id": (
+        "SELECT route_id FROM route WHERE origin=? AND destination=?;",
+        ("origin42", "destination42"),
+    ),
+}
+
+
+def create_schema(db_path: str) -> None:
+    """
+    Creates the tables of the main database, without any data or indexes.
+    """
+    source = sqlite3.connect(helper_database.get_database_path())
+    statements = [
+        row[0]
+        for row in source.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE 'sqlite_%';"
+        )
+    ]
+    source.close()
+    with sqlite3.connect(db_path) as conn:
+        for statement in statements:
+            conn.execute(statement)
+
+
+def fill_tables(db_path: str, rows: int) -> None:
+    """
+    Fills the tables used by the benchmarked queries with generated rows.
+    """
+    start = datetime(2020, 1, 1)
+    # Almost all carpools are in the past, as they would be in production.
+    span = (datetime.now() - start).total_seconds() * 1.01
+
+    def user() -> str:
+        return f"user{random.randrange(NUM_USERS)}"
+
+    def pickup_datetime() -> str:
+        return str(start + timedelta(seconds=int(random.random() * span)))
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO carpool_ride (journey_id, is_complete, seats_initial, "
+            "seats_available, driver, starting_point, destination, "
+            "pickup_datetime, price, distance) "
+            "VALUES (?, ?, 3, 3, ?, 'A', 'B', ?, 5, 1000);",
+            (
+                (i, random.random() < 0.9, user(), pickup_datetime())
+                for i in range(rows)
+            ),
+        )
+        conn.execute(
+            "UPDATE carpool_ride SET "
+            "pickup_epoch=CAST(strftime('%s', pickup_datetime) AS INTEGER);"
+        )
+        # Ratings are unique for each pair of users, so duplicate pairs are
+        # skipped.
+        conn.executemany(
+            "INSERT OR IGNORE INTO rating VALUES (?, ?, ?, ?, 'driver');",
+            (
+                (user(), user(), random.randrange(rows), random.randint(1, 5))
+                for _ in range(rows)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO carpool_request (requester, journey_id, num_passengers, "
+            "starting_point, destination, pickup_datetime, desired_price) "
+            "VALUES (?, ?, 1, 'A', 'B', ?, 5);",
+            ((user(), random.randrange(rows), pickup_datetime()) for _ in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO carpool_interest (username, journey_id) VALUES (?, ?);",
+            ((user(), random.randrange(rows)) for _ in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO route (origin, destination) VALUES (?, ?);",
+            ((f"origin{i}", f"destination{i}") for i in range(rows)),
+        )
+
+
+def run_queries(db_path: str) -> dict:
+    """
+    Gets the query plan and time (milliseconds) of each query.
+    """
+    results = {}
+    with sqlite3.connect(db_path) as conn:
+        for name, (query, params) in QUERIES.items():
+            plan = "; ".join(
+                row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            )
+            start = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            results[name] = (plan, (time.perf_counter() - start) * 1000)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "benchmark.sqlite3")
+        create_schema(db_path)
+        print(f"Generating {args.rows:,} rows per table...")
+        fill_tables(db_path, args.rows)
+
+        before = run_queries(db_path)
+        helper_migrations.migrate(db_path)
+        after = run_queries(db_path)
+
+    for name in QUERIES:
+        print(f"\n{name}")
+        for label, (plan, duration) in (
+            ("before", before[name]),
+            ("after", after[name]),
+        ):
+            print(f"  {label:<6} {duration:>10.2f} ms  {plan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+import os
+
 from flask import Flask
 
-import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_avatars as helper_avatars
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_distance as helper_distance
+import src.travel_buddy.helpers.helper_ev as helper_ev
+import src.travel_buddy.helpers.helper_fuel as helper_fuel
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+import src.travel_buddy.helpers.helper_migrations as helper_migrations
+import src.travel_buddy.helpers.helper_registry as helper_registry
+import src.travel_buddy.helpers.helper_routes as helper_routes
 import src.travel_buddy.views.carpool as carpool
+import src.travel_buddy.views.health as health
 import src.travel_buddy.views.login as login
 import src.travel_buddy.views.profile as profile
 import src.travel_buddy.views.register as register
@@ -10,8 +21,35 @@ import src.travel_buddy.views.settings as settings
 import src.travel_buddy.views.trends as trends
 from src.travel_buddy.helpers.helper_limiter import limiter
 
-API_KEY_FILE = "keys.json"
-KEYS = helper_general.get_keys(API_KEY_FILE)
+KEYS = helper_registry.registry.get_keys()
+# Whether the development server runs with the debugger and reloader.
+DEBUG = True
+
+
+def is_serving_process() -> bool:
+    """
+    Checks whether this process serves requests. With the reloader, the
+    process started first only watches for changes, and restarts a child
+    process which serves the requests.
+    """
+    return not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+
+def start_background_services() -> None:
+    """
+    Starts the threads which keep data up to date and run slow work in the
+    background.
+    """
+    # Runs slow work queued by requests in the background.
+    helper_jobs.job_queue.start()
+    # Keeps fuel prices up to date in the background.
+    helper_fuel.fuel_prices.start()
+    # Keeps the electric car catalog up to date in the background.
+    helper_ev.ev_catalog.start()
+    # Records route searches in batches, outside of the requests making them.
+    helper_routes.search_buffer.start()
+    # Fits the local route estimates to the routes looked up so far.
+    helper_distance.distance_estimator.calibrate()
 
 
 def main() -> Flask:
@@ -21,8 +59,13 @@ def main() -> Flask:
     Returns:
         An instance of the web application with the blueprints configured.
     """
+    # Brings the database schema up to date before handling any requests.
+    helper_migrations.migrate()
+
     app = Flask(__name__)
     limiter.init_app(app)
+    helper_database.init_app(app)
+    helper_avatars.init_app(app)
     app.register_blueprint(register.register_blueprint, url_prefix="")
     app.register_blueprint(login.login_blueprint, url_prefix="")
     app.register_blueprint(profile.profile_blueprint, url_prefix="")
@@ -30,12 +73,19 @@ def main() -> Flask:
     app.register_blueprint(settings.settings_blueprint, url_prefix="")
     app.register_blueprint(carpool.carpool_blueprint, url_prefix="")
     app.register_blueprint(trends.trends_blueprint, url_prefix="")
+    app.register_blueprint(health.health_blueprint, url_prefix="")
+
+    # Allows API keys to be reloaded without restarting the application.
+    helper_registry.registry.install_reload_handler()
+    # Only one process runs the background threads, or each would run twice.
+    if is_serving_process():
+        start_background_services()
 
     app.url_map.strict_slashes = False
     app.secret_key = KEYS["app_secret_key"]
-    app.run(debug=True)
+    app.run(debug=DEBUG)
     return app
 
 
 if __name__ == "__main__":
-    main().run(debug=True)
+    main().run(debug=DEBUG)
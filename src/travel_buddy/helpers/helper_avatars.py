@@ -0,0 +1,210 @@
+"""
+Helper functions for processing uploaded avatars into the sizes and formats
+served to browsers, so that pages showing small avatars don't download the
+full size image.
+
+Uploads are processed by a background job, and the user's profile is only
+changed to the new avatar once every size of it has been written. Pages only
+offer the sizes of avatars which have them, such as those uploaded before
+avatars were processed, until they've been backfilled.
+"""
+
+import os
+import pathlib
+from typing import List, Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
+from PIL import Image
+
+AVATAR_DIRECTORY = os.path.join(pathlib.Path(__file__).parent.parent, "static/avatars")
+# The widths (pixels) of the square avatars served in each format, from the
+# largest. The templates' srcset attributes list the same sizes.
+AVATAR_SIZES = (512, 128, 48)
+# The Pillow format and save options for each file extension served.
+AVATAR_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+UPLOAD_EXTENSION = ".upload"
+# The largest width and height (pixels) of an avatar's own file.
+MAX_AVATAR_SIZE = 1000
+
+# The avatars known to have every size, which never stop having them.
+_with_variants = set()
+
+
+def get_upload_path(file_name: str) -> str:
+    """
+    Gets the path an upload is stored at until it has been processed.
+    """
+    return os.path.join(AVATAR_DIRECTORY, file_name + UPLOAD_EXTENSION)
+
+
+def is_valid_image(file) -> bool:
+    """
+    Checks that an uploaded file is an image Pillow can read, without
+    decoding it, and rewinds the file so that it can be saved afterwards.
+    """
+    try:
+        with Image.open(file) as img:
+            img.verify()
+        return True
+    except (OSError, SyntaxError, ValueError):
+        return False
+    finally:
+        file.seek(0)
+
+
+def get_variant_name(file_name: str, size: int, extension: str) -> str:
+    """
+    Gets the file name of an avatar in one size and format, such as
+    'default-48.webp' for 'default.jpg'.
+    """
+    return f"{file_name.rsplit('.', 1)[0]}-{size}.{extension}"
+
+
+def save_atomically(img: Image.Image, file_path: str, extension: str) -> None:
+    """
+    Saves an image to a temporary file first, so that it's never served half
+    written.
+    """
+    image_format, options = AVATAR_FORMATS[extension]
+    temp_path = file_path + ".tmp"
+    img.save(temp_path, image_format, **options)
+    os.replace(temp_path, file_path)
+
+
+def get_variant_names(file_name: str) -> List[str]:
+    """
+    Gets the file names of an avatar in every size and format.
+    """
+    return [
+        get_variant_name(file_name, size, extension)
+        for size in AVATAR_SIZES
+        for extension in AVATAR_FORMATS
+    ]
+
+
+def has_variants(file_name: Optional[str]) -> bool:
+    """
+    Checks whether every size and format of an avatar has been written.
+    """
+    if not file_name:
+        return False
+    if file_name not in _with_variants:
+        if not all(
+            os.path.exists(os.path.join(AVATAR_DIRECTORY, variant_name))
+            for variant_name in get_variant_names(file_name)
+        ):
+            return False
+        _with_variants.add(file_name)
+    return True
+
+
+def init_app(app) -> None:
+    """
+    Lets templates check which avatars have every size.
+    """
+    app.add_template_global(has_variants, "avatar_has_variants")
+
+
+def generate_avatar_variants(source_path: str, file_name: str) -> List[str]:
+    """
+    Crops an image to a square, and writes it in every size and format next
+    to the avatar's own file, which is left as it is.
+
+    The image is decoded in draft mode, which lets JPEGs be decoded at a
+    fraction of their size, and each size is reduced from the one before.
+
+    Args:
+        source_path: The path to the image.
+        file_name: The file name of the avatar.
+
+    Returns:
+        The file names written.
+    """
+    largest = AVATAR_SIZES[0]
+    with Image.open(source_path) as img:
+        img.draft("RGB", (largest, largest))
+        img = img.convert("RGB")
+    side = min(img.size)
+    left, top = (img.width - side) // 2, (img.height - side) // 2
+    img = img.crop((left, top, left + side, top + side))
+
+    written = []
+    for size in AVATAR_SIZES:
+        img.thumbnail((size, size), Image.LANCZOS)
+        for extension in AVATAR_FORMATS:
+            variant_name = get_variant_name(file_name, size, extension)
+            save_atomically(
+                img, os.path.join(AVATAR_DIRECTORY, variant_name), extension
+            )
+            written.append(variant_name)
+    return written
+
+
+def process_avatar(file_name: str, username: str) -> None:
+    """
+    Processes an uploaded avatar, and then changes the user's avatar to it.
+    Runs as a background job.
+
+    Args:
+        file_name: The hashed file name of the avatar.
+        username: The user who uploaded the avatar.
+    """
+    upload_path = get_upload_path(file_name)
+    with Image.open(upload_path) as img:
+        img.draft("RGB", (MAX_AVATAR_SIZE, MAX_AVATAR_SIZE))
+        img = img.convert("RGB")
+    img.thumbnail((MAX_AVATAR_SIZE, MAX_AVATAR_SIZE), Image.LANCZOS)
+    save_atomically(img, os.path.join(AVATAR_DIRECTORY, file_name), "jpg")
+    generate_avatar_variants(upload_path, file_name)
+    with helper_database.get_connection() as conn:
+        conn.execute(
+            "UPDATE profile SET photo=? WHERE username=?;", (file_name, username)
+        )
+    helper_user_cards.user_cards.invalidate(username)
+    os.remove(upload_path)
+
+
+def discard_upload(file_name: str, username: str) -> None:
+    """
+    Deletes an upload which couldn't be processed. Runs once its job has used
+    every attempt.
+
+    Args:
+        file_name: The hashed file name of the avatar.
+        username: The user who uploaded the avatar.
+    """
+    try:
+        os.remove(get_upload_path(file_name))
+    except FileNotFoundError:
+        pass
+
+
+def backfill_avatars() -> List[str]:
+    """
+    Writes every size and format of the avatars which don't have them yet,
+    such as those uploaded before avatars were processed, leaving the
+    avatars themselves as they are. Runs as a background job, queued once by
+    a migration.
+
+    Returns:
+        The file names of the avatars processed.
+    """
+    variant_suffixes = tuple(get_variant_names(""))
+    processed = []
+    for file_name in sorted(os.listdir(AVATAR_DIRECTORY)):
+        if not file_name.endswith(".jpg") or file_name.endswith(variant_suffixes):
+            continue
+        if has_variants(file_name):
+            continue
+        generate_avatar_variants(os.path.join(AVATAR_DIRECTORY, file_name), file_name)
+        processed.append(file_name)
+    return processed
+
+
+helper_jobs.job_queue.register("process_avatar", process_avatar, discard_upload)
+helper_jobs.job_queue.register("backfill_avatars", backfill_avatars)
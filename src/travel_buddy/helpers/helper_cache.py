@@ -0,0 +1,233 @@
+"""
+Helper functions for caching Google Maps Distance Matrix results, so that
+repeated searches for the same route don't call the API again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_general as helper_general
+
+# Stored next to the main database, as it can be safely deleted at any time.
+CACHE_PATH = os.path.join(
+    os.path.dirname(helper_general.get_database_path()), "cache.sqlite3"
+)
+# How long (seconds) results stay fresh for each mode of transport - transit
+# depends on timetables, whereas walking routes rarely change.
+DEFAULT_TTLS = {
+    "transit": 60 * 60,
+    "driving": 6 * 60 * 60,
+    "bicycling": 7 * 24 * 60 * 60,
+    "walking": 30 * 24 * 60 * 60,
+}
+DEFAULT_MAX_ENTRIES = 10000
+# How long (seconds) after expiring a result can still be served while it's
+# refreshed in the background.
+DEFAULT_MAX_STALE = 30 * 24 * 60 * 60
+# How long (seconds) after an entry was last marked as used before it's
+# marked again, so that popular routes don't write to the cache on every hit.
+DEFAULT_TOUCH_INTERVAL = 60
+
+
+def normalise_location(location: str) -> str:
+    """
+    Normalises a location so that different spellings of the same search
+    share a cache entry.
+
+    Args:
+        location: The location entered by the user.
+
+    Returns:
+        The location in lower case, without commas or repeated whitespace.
+    """
+    return " ".join(location.casefold().replace(",", " ").split())
+
+
+class DistanceMatrixCache:
+    """
+    A persistent cache of Distance Matrix results keyed on the normalised
+    origin, destination, and mode of transport.
+
+    Each mode has its own time to live, and the least recently used entries
+    are evicted once the cache grows past its size cap. Expired entries are
+    kept until they're too old to serve while being refreshed.
+
+    The number of entries is counted once when the cache is opened, and then
+    kept up to date as entries are added and evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttls: Optional[dict] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_stale: float = DEFAULT_MAX_STALE,
+        touch_interval: float = DEFAULT_TOUCH_INTERVAL,
+    ):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Opens the cache database on first use, creating the table if needed.
+        """
+        if self._conn is None:
+            self._conn = helper_database.open_connection(
+                self.path, check_same_thread=False
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS distance_matrix_cache ("
+                "origin VARCHAR NOT NULL, destination VARCHAR NOT NULL, "
+                "mode VARCHAR NOT NULL, response VARCHAR NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (origin, destination, mode));"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_distance_matrix_cache_accessed_at "
+                "ON distance_matrix_cache (accessed_at);"
+            )
+            self._conn.commit()
+            self._entries = self._conn.execute(
+                "SELECT COUNT(*) FROM distance_matrix_cache;"
+            ).fetchone()[0]
+        return self._conn
+
+    def get(self, origins: str, destinations: str, mode: str) -> Optional[dict]:
+        """
+        Gets the cached result for a route if it hasn't expired.
+
+        Args:
+            origins: The starting point of the route.
+            destinations: The end point of the route.
+            mode: The mode of transport.
+
+        Returns:
+            The cached API response, or None if there is no fresh entry.
+        """
+        entry = self.get_entry(origins, destinations, mode, allow_stale=False)
+        return entry[0] if entry else None
+
+    def get_entry(
+        self, origins: str, destinations: str, mode: str, allow_stale: bool = True
+    ) -> Optional[Tuple[dict, bool]]:
+        """
+        Gets the cached result for a route, including one which has expired
+        but is still recent enough to serve while it's refreshed.
+
+        Args:
+            origins: The starting point of the route.
+            destinations: The end point of the route.
+            mode: The mode of transport.
+            allow_stale: Whether to return expired entries.
+
+        Returns:
+            The cached API response and whether it has expired, or None if
+            there is no entry which can be served.
+        """
+        key = (normalise_location(origins), normalise_location(destinations), mode)
+        now = time.time()
+        with self._lock:
+            conn = self._get_connection()
+            row = conn.execute(
+                "SELECT response, created_at, accessed_at FROM distance_matrix_cache "
+                "WHERE origin=? AND destination=? AND mode=?;",
+                key,
+            ).fetchone()
+            ttl = self.ttls.get(mode, 0)
+            is_stale = row is not None and now - row[1] > ttl
+            if (
+                row is None
+                or (is_stale and not allow_stale)
+                or now - row[1] > ttl + self.max_stale
+            ):
+                self.misses += 1
+                return None
+            if now - row[2] >= self.touch_interval:
+                conn.execute(
+                    "UPDATE distance_matrix_cache SET accessed_at=? "
+                    "WHERE origin=? AND destination=? AND mode=?;",
+                    (now, *key),
+                )
+                conn.commit()
+            if is_stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]), is_stale
+
+    def set(self, origins: str, destinations: str, mode: str, response: dict) -> None:
+        """
+        Stores the result for a route, evicting the least recently used
+        entries if the cache is over its size cap.
+
+        Args:
+            origins: The starting point of the route.
+            destinations: The end point of the route.
+            mode: The mode of transport.
+            response: The API response to cache.
+        """
+        key = (normalise_location(origins), normalise_location(destinations), mode)
+        now = time.time()
+        with self._lock:
+            conn = self._get_connection()
+            updated = conn.execute(
+                "UPDATE distance_matrix_cache SET response=?, created_at=?, "
+                "accessed_at=? WHERE origin=? AND destination=? AND mode=?;",
+                (json.dumps(response), now, now, *key),
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    "INSERT INTO distance_matrix_cache (origin, destination, "
+                    "mode, response, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?);",
+                    (*key, json.dumps(response), now, now),
+                )
+                self._entries += 1
+            excess = self._entries - self.max_entries
+            if excess > 0:
+                evicted = conn.execute(
+                    "DELETE FROM distance_matrix_cache WHERE rowid IN ("
+                    "SELECT rowid FROM distance_matrix_cache "
+                    "ORDER BY accessed_at ASC LIMIT ?);",
+                    (excess,),
+                ).rowcount
+                self._entries -= evicted
+                self.evictions += evicted
+            conn.commit()
+
+    def get_stats(self) -> dict:
+        """
+        Gets the hit and miss statistics for the cache.
+
+        Returns:
+            The number of hits, stale hits, misses, evictions, and entries,
+            and the hit rate (including stale hits).
+        """
+        with self._lock:
+            self._get_connection()
+            entries = self._entries
+        hits = self.hits + self.stale_hits
+        lookups = hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -2,14 +2,25 @@
 Helper functions for the carpool system and related functionality.
 """
 
-import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Tuple
+import base64
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_registry as helper_registry
 import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_stats as helper_stats
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
 
 DB_PATH = helper_general.get_database_path()
+# The default and maximum number of carpools on each page of the listings.
+CARPOOL_PAGE_SIZE = 20
+MAX_CARPOOL_PAGE_SIZE = 100
+# The format of the start and end times in the listings.
+LISTING_TIME_FORMAT = "%e/%m %H:%M"
 
 
 def get_icons(description):
@@ -134,9 +145,6 @@ def validate_carpool_ride(
     pickup_datetime: datetime,
     price: float,
     description: str,
-    distance: str,
-    duration: str,
-    co2: str,
 ) -> Tuple[bool, List[str]]:
     """
     Validates that a carpool ride has valid details.
@@ -171,7 +179,7 @@ def validate_carpool_ride(
         error_messages.append("Please fill in all required fields (marked with *).")
 
     # Validates that the driver exists in the database.
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT username FROM account WHERE username=? LIMIT 1;",
@@ -221,7 +229,7 @@ def add_carpool_ride(
     duration_text: str,
     co2_pp: float,
     co2_saved: float,
-) -> None:
+) -> int:
     """
     Adds a valid carpool request to the database.
 
@@ -234,15 +242,19 @@ def add_carpool_ride(
         pickup_datetime: The datetime to get picked up for the carpool.
         price: The price they are charging passengers for the ride.
         description: A description of the carpool.
+
+    Returns:
+        The id of the carpool ride.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         # Adds the carpool ride to the database.
         cur.execute(
             "INSERT INTO carpool_ride (driver, seats_initial, seats_available, starting_point, "
-            "destination, pickup_datetime, price, description, distance, distance_text, "
-            "estimate_duration, estimate_duration_text, estimate_co2_per_person, estimate_co2_saved) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+            "destination, pickup_datetime, pickup_epoch, price, description, distance, "
+            "distance_text, estimate_duration, estimate_duration_text, "
+            "estimate_co2_per_person, estimate_co2_saved) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
             (
                 driver,
                 seats_initial,
@@ -250,6 +262,7 @@ def add_carpool_ride(
                 starting_point,
                 destination,
                 pickup_datetime,
+                helper_general.datetime_to_epoch(pickup_datetime),
                 price,
                 description,
                 distance,
@@ -260,26 +273,89 @@ def add_carpool_ride(
                 co2_saved,
             ),
         )
+        return cur.lastrowid
 
 
-def get_incomplete_carpools() -> List[
-    Tuple[int, str, int, str, str, str, float, str, float, int, float, float, str, int]
-]:
+def encode_carpool_cursor(pickup_epoch: int, journey_id: int) -> str:
     """
-    Gets all incomplete carpools in the database and ratings for the driver.
+    Encodes the position of a carpool in the listings as a cursor for the URL.
+
+    Args:
+        pickup_epoch: The pickup epoch of the last carpool on a page.
+        journey_id: The unique identifier of the last carpool on a page.
 
     Returns:
-        A list of tuples containing the carpool information.
+        The cursor for the page after the carpool.
+    """
+    position = f"{pickup_epoch}|{journey_id}".encode()
+    return base64.urlsafe_b64encode(position).decode()
+
+
+def decode_carpool_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    Decodes a cursor from the URL into the position of a carpool in the
+    listings.
+
+    Args:
+        cursor: The cursor given in the URL.
+
+    Returns:
+        The pickup epoch and journey ID of the carpool, or None if the cursor
+        is missing or invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        pickup_epoch, journey_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return int(pickup_epoch), int(journey_id)
+    except ValueError:
+        return None
+
+
+def get_incomplete_carpools(
+    after: Optional[Tuple[int, int]] = None, page_size: int = CARPOOL_PAGE_SIZE
+) -> Tuple[
+    List[
+        Tuple[
+            int, str, int, str, str, int, float, str, float, int, float, float, str, int
+        ]
+    ],
+    Optional[str],
+]:
+    """
+    Gets a page of incomplete carpools in the database and ratings for the
+    driver, ordered by pickup datetime.
+
+    Pages are found with the (pickup_epoch, journey_id) of the last carpool on
+    the previous page, so every page reads the same number of rows from the
+    index, and each driver's rating is read from their summary.
+
+    Args:
+        after: The pickup epoch and journey ID of the last carpool on the
+               previous page, or None for the first page.
+        page_size: The maximum number of carpools on the page.
+
+    Returns:
+        A list of tuples containing the carpool information (with the pickup
+        datetime as an epoch), and the cursor for the next page (or None if
+        this is the last page).
+    """
+    page_size = max(1, min(page_size, MAX_CARPOOL_PAGE_SIZE))
+    # Starts the index search from whichever is later of the cursor and the
+    # current time.
+    after_epoch, after_journey_id = max(after or (0, 0), (int(time.time()), 0))
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
+        # Fetches one extra carpool to find whether there is a next page.
         cur.execute(
             """SELECT c.journey_id,
                     c.driver,
                     c.seats_available,
                     c.starting_point,
                     c.destination,
-                    c.pickup_datetime,
+                    c.pickup_epoch,
                     c.price,
                     c.description,
                     c.distance,
@@ -289,18 +365,57 @@ def get_incomplete_carpools() -> List[
                     c.estimate_co2_per_person,
                     c.estimate_co2_saved,
 
-                    AVG(r.rating_given),
-                    COUNT(r.rating_given)
-
-            FROM carpool_ride c
-            LEFT JOIN rating r ON c.driver = r.rated_username
-            WHERE c.is_complete=0
-            AND CURRENT_TIMESTAMP < c.pickup_datetime
-            GROUP BY c.journey_id
-            ORDER BY pickup_datetime ASC;"""
+                    r.rating_average,
+                    COALESCE(r.rating_count, 0)
+
+            FROM (
+                SELECT * FROM carpool_ride
+                WHERE is_complete=0
+                AND (pickup_epoch, journey_id) > (?, ?)
+                ORDER BY pickup_epoch ASC, journey_id ASC
+                LIMIT ?
+            ) c
+            LEFT JOIN rating_summary r ON c.driver = r.username
+            ORDER BY c.pickup_epoch ASC, c.journey_id ASC;""",
+            (after_epoch, after_journey_id, page_size + 1),
         )
         incomplete_carpools = cur.fetchall()
-    return incomplete_carpools
+
+    next_cursor = None
+    if len(incomplete_carpools) > page_size:
+        incomplete_carpools = incomplete_carpools[:page_size]
+        last = incomplete_carpools[-1]
+        next_cursor = encode_carpool_cursor(last[5], last[0])
+    return incomplete_carpools, next_cursor
+
+
+def format_carpool_listings(carpools: list) -> List[list]:
+    """
+    Formats the price, start time, and end time of carpools for the listings.
+
+    The start and end times of the whole page are formatted from their
+    epochs together.
+
+    Args:
+        carpools: The carpools from get_incomplete_carpools.
+
+    Returns:
+        The carpools as lists, with the end time appended to each.
+    """
+    start_times = helper_general.format_epochs(
+        [c[5] for c in carpools], LISTING_TIME_FORMAT
+    )
+    end_times = helper_general.format_epochs(
+        [get_end_epoch(c[5], c[10]) for c in carpools], LISTING_TIME_FORMAT
+    )
+    formatted_carpools = []
+    for c, start_time, end_time in zip(carpools, start_times, end_times):
+        carpool = list(c)
+        carpool[5] = start_time
+        carpool[6] = format(c[6], ".2f")
+        carpool.append(end_time)
+        formatted_carpools.append(carpool)
+    return formatted_carpools
 
 
 def get_user_interested_carpools(username: str) -> list:
@@ -313,7 +428,7 @@ def get_user_interested_carpools(username: str) -> list:
     Returns:
         A list of tuples containing the carpool ids.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             """SELECT journey_id FROM carpool_interest
@@ -336,7 +451,7 @@ def get_carpool_details(journey_id: int) -> list:
     Returns:
         The details of the carpool, such as the driver and seats available.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT driver, is_complete, seats_initial, seats_available, starting_point, "
@@ -349,6 +464,133 @@ def get_carpool_details(journey_id: int) -> list:
         return carpool_details
 
 
+class CarpoolDetail:
+    """
+    The details of a carpool journey shown on its page, including the cards
+    of its driver and passengers.
+    """
+
+    __slots__ = (
+        "journey_id",
+        "driver",
+        "is_complete",
+        "seats_initial",
+        "seats_available",
+        "starting_point",
+        "destination",
+        "pickup_datetime",
+        "price",
+        "description",
+        "distance_text",
+        "duration",
+        "duration_text",
+        "co2_pp",
+        "co2_saved",
+        "driver_card",
+        "passengers",
+    )
+
+    def __init__(
+        self,
+        journey_id: int,
+        driver: str,
+        is_complete: bool,
+        seats_initial: int,
+        seats_available: int,
+        starting_point: str,
+        destination: str,
+        pickup_datetime: datetime,
+        price: float,
+        description: str,
+        distance_text: str,
+        duration: int,
+        duration_text: str,
+        co2_pp: float,
+        co2_saved: float,
+        driver_card: helper_user_cards.UserCard,
+        passengers: Dict[str, helper_user_cards.UserCard],
+    ):
+        self.journey_id = journey_id
+        self.driver = driver
+        self.is_complete = is_complete
+        self.seats_initial = seats_initial
+        self.seats_available = seats_available
+        self.starting_point = starting_point
+        self.destination = destination
+        self.pickup_datetime = pickup_datetime
+        self.price = price
+        self.description = description
+        self.distance_text = distance_text
+        self.duration = duration
+        self.duration_text = duration_text
+        self.co2_pp = co2_pp
+        self.co2_saved = co2_saved
+        self.driver_card = driver_card
+        self.passengers = passengers
+
+
+def get_carpool_detail(journey_id: int) -> Optional[CarpoolDetail]:
+    """
+    Gets the details of a carpool journey, its driver's card, and its
+    passengers' cards from the database in a single query.
+
+    Args:
+        journey_id: The unique identifier for the selected carpool.
+
+    Returns:
+        The details of the carpool, or None if it doesn't exist.
+    """
+    conn = helper_database.get_connection()
+    cur = conn.cursor()
+    # The passengers are collected into a JSON array, so the row needs no
+    # further queries, and the pickup datetime is read as its epoch.
+    cur.execute(
+        "SELECT c.driver, c.is_complete, c.seats_initial, c.seats_available, "
+        "c.starting_point, c.destination, "
+        "c.pickup_epoch, c.price, "
+        "c.description, c.distance_text, c.estimate_duration, "
+        "c.estimate_duration_text, c.estimate_co2_per_person, "
+        "c.estimate_co2_saved, p.photo, p.verified, "
+        "COALESCE(r.rating_average, 0), COALESCE(r.rating_count, 0), "
+        "(SELECT json_group_array(json_array(q.requester, qp.photo, "
+        "qp.verified, COALESCE(qr.rating_average, 0), "
+        "COALESCE(qr.rating_count, 0))) "
+        "FROM carpool_request q "
+        "LEFT JOIN profile qp ON q.requester = qp.username "
+        "LEFT JOIN rating_summary qr ON q.requester = qr.username "
+        "WHERE q.journey_id = c.journey_id) "
+        "FROM carpool_ride c "
+        "LEFT JOIN profile p ON c.driver = p.username "
+        "LEFT JOIN rating_summary r ON c.driver = r.username "
+        "WHERE c.journey_id=?;",
+        (journey_id,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+
+    def to_card(photo, verified, rating_average, rating_count):
+        return helper_user_cards.UserCard(
+            photo, verified == 1, rating_average, rating_count
+        )
+
+    driver_card = to_card(*row[14:18])
+    passengers = {
+        passenger[0]: to_card(*passenger[1:]) for passenger in json.loads(row[18])
+    }
+    # Saves the cards for anything else on the page which needs them.
+    helper_user_cards.user_cards.prime({row[0]: driver_card, **passengers})
+
+    return CarpoolDetail(
+        journey_id,
+        *row[:6],
+        datetime.fromtimestamp(row[6], timezone.utc).replace(tzinfo=None),
+        *row[7:14],
+        driver_card,
+        passengers,
+    )
+
+
 def validate_joining_carpool(journey_id: int, username: str) -> bool:
     """
     Validates whether the carpool can be joined by the user.
@@ -402,36 +644,32 @@ def add_passenger_to_carpool_journey(journey_id: int, username: str):
         journey_id: The unique identifier for the selected carpool.
         username: The user to add to the carpool journey.
     """
-    carpool_details = get_carpool_details(journey_id)
-    (
-        _,
-        _,
-        _,
-        starting_point,
-        destination,
-        pickup_datetime,
-        price,
-        _,
-    ) = carpool_details[0]
-
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         # Creates a carpool request with the journey ID attached to it, as this
         # indicates that there is a matching carpool ride listing.
         cur.execute(
             "INSERT INTO carpool_request "
             "(requester, journey_id, num_passengers, starting_point, destination, "
-            "pickup_datetime, price, description) VALUES (?, ?, ?, ?, ?, ?, ?);",
-            (
-                username,
-                journey_id,
-                1,
-                starting_point,
-                destination,
-                pickup_datetime,
-                price,
-                "Joined from the carpool listing.",
-            ),
+            "pickup_datetime, desired_price, description, distance, distance_text, "
+            "estimate_duration, estimate_duration_text, estimate_co2_per_person, "
+            "estimate_co2_saved) "
+            "SELECT ?, journey_id, 1, starting_point, destination, "
+            "pickup_datetime, price, 'Joined from the carpool listing.', distance, "
+            "distance_text, estimate_duration, estimate_duration_text, "
+            "estimate_co2_per_person, estimate_co2_saved "
+            "FROM carpool_ride WHERE journey_id=? "
+            "RETURNING distance, estimate_co2_saved;",
+            (username, journey_id),
+        )
+        distance, co2_saved = cur.fetchone()
+        helper_stats.update_user_stats(
+            cur,
+            username,
+            carpools_joined=1,
+            distance_carpooled=distance or 0,
+            co2_saved=co2_saved or 0,
+            unpriced_distance=distance or 0,
         )
         # Decrements the number of available seats in the carpool ride.
         cur.execute(
@@ -443,14 +681,31 @@ def add_passenger_to_carpool_journey(journey_id: int, username: str):
 
 
 def estimate_carpool_details(
-    start_point: str, end_point: str, seats: int, filename: str
+    start_point: str,
+    end_point: str,
+    seats: int,
+    start_coords: Optional[Tuple[float, float]] = None,
+    end_coords: Optional[Tuple[float, float]] = None,
 ) -> Tuple[int, str, int, str, str]:
     """
     Fetch the estimated distance, duration, and co2 emissions of a carpooling journey
+
+    The lookup is given up on once the route lookup budget has passed, so a
+    slow Google Maps response can't hold up the request. If the route can't be
+    looked up, it's estimated from the coordinates of the start and end points
+    when they're known.
     """
-    key = helper_general.get_keys(filename).get("google_maps")
-    map_client = helper_routes.generate_client(key)
-    details = helper_routes.run_api(map_client, start_point, end_point, "driving")
+    map_client = helper_registry.registry.get_maps_client()
+    deadline = time.monotonic() + helper_routes.ROUTE_LOOKUP_BUDGET
+    details = helper_routes.get_route_data(
+        map_client, start_point, end_point, "driving", deadline
+    )
+    if start_coords and end_coords:
+        route_data = {"driving": details}
+        helper_routes.fill_route_estimates(
+            route_data, start_point, end_point, start_coords, end_coords
+        )
+        details = route_data["driving"]
     distance = helper_routes.safeget(
         details, "rows", 0, "elements", 0, "distance", "value"
     )
@@ -473,205 +728,110 @@ def estimate_carpool_details(
     return (distance, distance_text, duration, duration_text, co2_pp, co2_saved)
 
 
-def get_passenger_list(journey_id: int) -> list:
+def get_car_fuel(username: str) -> Optional[Tuple[float, str]]:
     """
-    Gets the list of passengers for a carpool journey from the database.
+    Gets the miles per gallon and fuel type of the user's car.
 
     Args:
-        journey_id: The unique identifier for the selected carpool.
+        username: The owner of the car.
 
     Returns:
-        The list of passengers for the carpool.
+        The miles per gallon and fuel type, or None if the user has no car.
     """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT requester FROM carpool_request WHERE journey_id=?;", (journey_id,)
-        )
-        conn.commit()
-        passenger_list = cur.fetchall()
-    return passenger_list
+    try:
+        _, car_mpg, fuel_type, _ = helper_routes.get_car(username)
+    except IndexError:
+        return None
+    return car_mpg, fuel_type
 
 
-def get_total_carpools_joined(username: str) -> int:
+def price_money_saved(
+    username: str, stored_fuel_cost: float, unpriced_distance: float
+) -> float:
     """
-    Gets the total number of carpools joined by the user.
-    Args:
-        username: The user to calculate the statistic for.
-    Returns:
-        The number of carpools joined by the user.
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT COUNT(request_id) FROM carpool_request "
-            "WHERE requester=? AND journey_id IS NOT NULL;",
-            (username,),
-        )
-        total_carpools_joined = cur.fetchone()[0]
-    return total_carpools_joined
-
+    Adds the fuel cost of the distance carpooled without a stored fuel cost to
+    the fuel cost already stored.
 
-def get_total_carpools_drove(username: str) -> int:
-    """
-    Gets the total number of carpools drove by the user.
     Args:
-        username: The user to calculate the statistic for.
-    Returns:
-        The number of carpools drove by the user.
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT COUNT(journey_id) FROM carpool_ride "
-            "WHERE driver=? AND is_complete=1;",
-            (username,),
-        )
-        total_carpools_drove = cur.fetchone()[0]
-    return total_carpools_drove
-
+        username: The user whose car is used to price the distance.
+        stored_fuel_cost: The total fuel cost stored for completed rides.
+        unpriced_distance: The total distance (metres) to price.
 
-def get_total_distance_carpooled(username: str) -> int:
-    """
-    Gets the total distance carpooled (joined and drove) by the user.
-    Args:
-        username: The user to calculate the statistic for.
     Returns:
-        The total distance carpooled by the user.
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        # Gets total distance drove by the user for a carpool.
-        cur.execute(
-            "SELECT SUM(distance) FROM carpool_ride WHERE driver=? AND is_complete=1;",
-            (username,),
-        )
-        total_distance_drove = cur.fetchone()[0]
-        if total_distance_drove:
-            total_distance_drove /= 1000
-        else:
-            total_distance_drove = 0
+        The total fuel money saved, to two decimal places.
+    """
+    # Applies the fuel price and miles per gallon conversion once for the
+    # total distance. The distance can't be priced until the user has a car.
+    unpriced_fuel_cost = 0
+    if unpriced_distance:
+        # TODO: Calculate cost savings based on car used for each trip rather
+        # than just the user's car
+        car = get_car_fuel(username)
+        if car is not None:
+            unpriced_fuel_cost = helper_routes.calculate_total_fuel_cost(
+                unpriced_distance, *car
+            )[1]
+
+    total_money_saved = round(stored_fuel_cost + unpriced_fuel_cost, 2)
 
-        # Gets total distance rode by the user for a carpool that they joined.
-        cur.execute(
-            "SELECT SUM(distance) FROM carpool_request "
-            "WHERE requester=? AND journey_id IS NOT NULL;",
-            (username,),
-        )
-        total_distance_joined = cur.fetchone()[0]
-        if total_distance_joined:
-            total_distance_joined /= 1000
-        else:
-            total_distance_joined = 0
-
-        total_distance_carpooled = round(
-            total_distance_drove + total_distance_joined, 2
-        )
-    return total_distance_carpooled
+    return total_money_saved
 
 
-def get_total_co2_saved(username: str) -> float:
+def complete_carpool_ride(journey_id: int) -> None:
     """
-    Gets the total co2 saved from carpooling (joined and drove) by the user.
-    Args:
-        username: The user to calculate the statistic for.
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        # Gets total distance drove by the user for a carpool.
-        cur.execute(
-            "SELECT SUM(estimate_co2_saved) FROM carpool_ride "
-            "WHERE driver=? AND is_complete=1;",
-            (username,),
-        )
-        total_co2_saved_driver = cur.fetchone()[0]
-        if not total_co2_saved_driver:
-            total_co2_saved_driver = 0
-
-        # Gets total distance rode by the user for a carpool that they joined.
-        cur.execute(
-            "SELECT SUM(estimate_co2_saved) FROM carpool_request "
-            "WHERE requester=? AND journey_id IS NOT NULL;",
-            (username,),
-        )
-        total_co2_saved_passenger = cur.fetchone()[0]
-        if not total_co2_saved_passenger:
-            total_co2_saved_passenger = 0
-
-        total_co2_saved = round(total_co2_saved_driver + total_co2_saved_passenger, 2)
-    return total_co2_saved
+    Marks the carpool ride as complete, storing the fuel cost for the ride so
+    that it doesn't need to be calculated again for profile statistics, and
+    adding the ride to the driver's statistics.
 
+    If the driver has no car, the fuel cost is left unpriced, and is priced
+    with the driver's car when their statistics are shown.
 
-def get_money_saved(username: str) -> float:
-    """
-    Gets an estimate for the total fuel money saved from carpooling (joined and drove) by the user.
     Args:
-        username: The user to calculate the statistic for.
+        journey_id: The unique identifier for the selected carpool.
     """
-    # TODO: Calculate cost savings based on car used for each trip rather than
-    # just the user's car
-    _, car_mpg, fuel_type, _ = helper_routes.get_car(username)
-
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
-        # Gets total distance drove by the user for a carpool.
         cur.execute(
-            "SELECT distance, seats_initial FROM carpool_ride "
-            "WHERE driver=? AND is_complete=1;",
-            (username,),
+            "SELECT driver, seats_initial, distance, estimate_co2_saved "
+            "FROM carpool_ride WHERE journey_id=?;",
+            (journey_id,),
         )
-        carpools_driven = cur.fetchall()
-        money_saved_driving = 0
-        if carpools_driven:
-            for c in carpools_driven:
-                if all(c):
-                    money_saved_driving += helper_routes.calculate_total_fuel_cost(
-                        c[0], car_mpg, fuel_type
-                    )[1]
-
-        # Gets total distance rode by the user for a carpool that they joined.
+        driver, seats_initial, distance, co2_saved = cur.fetchone()
+        car = get_car_fuel(driver)
+        fuel_cost = None
+        if car is not None:
+            fuel_cost = helper_routes.calculate_total_fuel_cost(distance, *car)[1]
         cur.execute(
-            "SELECT distance, num_passengers FROM carpool_request "
-            "WHERE requester=? AND journey_id IS NOT NULL;",
-            (username,),
+            "UPDATE carpool_ride SET is_complete=1, fuel_cost=? "
+            "WHERE journey_id=? AND is_complete=0;",
+            (fuel_cost, journey_id),
         )
-        carpools_joined = cur.fetchall()
-        money_saved_joining = 0
-        if carpools_joined:
-            for c in carpools_joined:
-                if all(c):
-                    money_saved_joining += helper_routes.calculate_total_fuel_cost(
-                        c[0], car_mpg, fuel_type
-                    )[1]
-
-    total_money_saved = round(money_saved_driving + money_saved_joining, 2)
-
-    return total_money_saved
-
-
-def get_datetime_obj(t: str) -> object:
-    """
-    Return a datetime object from a datetime string
-    """
-    return datetime.strptime(t, "%Y-%m-%d %H:%M:%S")
+        # Only counts the ride once if it's completed twice at the same time.
+        if cur.rowcount:
+            helper_stats.update_user_stats(
+                cur,
+                driver,
+                carpools_driven=1,
+                distance_carpooled=distance or 0,
+                co2_saved=co2_saved or 0,
+                fuel_cost_saved=(fuel_cost or 0) if seats_initial else 0,
+                unpriced_distance=(
+                    (distance or 0) if seats_initial and fuel_cost is None else 0
+                ),
+            )
+        conn.commit()
 
 
-def format_start_time(start_time: object) -> str:
+def get_end_epoch(start_epoch: int, duration: Optional[int]) -> int:
     """
-    Return hours and minutes from a datetime object
+    Return the estimated end epoch based on the start epoch and duration in
+    seconds, rounded to the minute like get_end_time_obj
     """
-    return datetime.strftime(start_time, "%e/%m %H:%M")
+    return start_epoch + round((duration or 0) / 60) * 60
 
 
 def get_end_time_obj(start_time: object, duration: int) -> object:
     """
     Return the estimated end time object based on the start time and duration in seconds
     """
-    return start_time + timedelta(seconds=round(duration / 60) * 60)
-
-
-def get_end_time(emd_time_obj: object) -> str:
-    """
-    Return the estimated end time string
-    """
-    return datetime.strftime(emd_time_obj, "%e/%m %H:%M")
+    return start_time + timedelta(seconds=round((duration or 0) / 60) * 60)
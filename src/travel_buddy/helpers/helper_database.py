@@ -0,0 +1,174 @@
+"""
+Helper functions for connecting to the database, which reuse connections
+rather than opening a new one for every query.
+
+Within a request, every helper shares one connection taken from a small pool,
+which is returned to the pool once the request has finished. Outside of a
+request, such as in background threads, each thread keeps its own connection.
+"""
+
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+from typing import Optional
+
+from flask import g, has_app_context
+
+# Applied to every connection when it's opened.
+# - WAL mode lets readers continue while another connection is writing.
+# - NORMAL synchronisation is safe in WAL mode, and avoids an fsync per commit.
+# - mmap_size and cache_size are in bytes and kibibytes (when negative).
+# - busy_timeout (milliseconds) waits for a lock instead of failing at once.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA mmap_size=268435456;",
+    "PRAGMA cache_size=-16000;",
+    "PRAGMA busy_timeout=5000;",
+)
+# The number of prepared statements cached by each connection.
+STATEMENT_CACHE_SIZE = 256
+# The number of idle connections kept for requests to the same database.
+POOL_SIZE = 8
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_database_path() -> str:
+    """
+    Gets the directory path to the database.
+
+    Returns:
+        The directory path to the SQLite3 database.
+    """
+    # Gets the root directory of the project, 'travel-buddy'.
+    BASE_DIR = pathlib.Path(__file__).parent.parent.parent.parent
+    DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
+    return DB_PATH
+
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    Applies the pragmas used for every connection.
+
+    Args:
+        conn: The connection to configure.
+
+    Returns:
+        The configured connection.
+    """
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def open_connection(db_path: str, check_same_thread: bool = True):
+    """
+    Opens a new, configured connection to the database.
+
+    Args:
+        db_path: The path to the database.
+        check_same_thread: Whether only the thread which opened the connection
+                           may use it.
+
+    Returns:
+        The connection to the database.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+    )
+    return configure_connection(conn)
+
+
+class ConnectionPool:
+    """
+    A small pool of connections to a database, where each connection is only
+    used by one request at a time.
+    """
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Takes an idle connection from the pool, or opens a new one if there
+        are none.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            # Requests are handled in different threads, so connections must
+            # be usable from whichever thread takes them from the pool.
+            return open_connection(self.db_path, check_same_thread=False)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """
+        Returns a connection to the pool, closing it if the pool is full.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """
+    Gets the connection pool for the database, creating it on first use.
+    """
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Gets the connection to the database for the current request, or for the
+    current thread if not handling a request.
+
+    The connection supports the same 'with' block as sqlite3.connect, which
+    commits the transaction at the end of the block.
+
+    Args:
+        db_path: The path to the database, which defaults to the main one.
+
+    Returns:
+        The connection to the database.
+    """
+    db_path = db_path or get_database_path()
+    if has_app_context():
+        connections = g.setdefault("db_connections", {})
+        if db_path not in connections:
+            connections[db_path] = get_pool(db_path).acquire()
+        return connections[db_path]
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if db_path not in connections:
+        connections[db_path] = open_connection(db_path)
+    return connections[db_path]
+
+
+def release_connections(exception=None) -> None:
+    """
+    Returns the connections used by the request to their pools.
+    """
+    for db_path, conn in g.pop("db_connections", {}).items():
+        get_pool(db_path).release(conn)
+
+
+def init_app(app) -> None:
+    """
+    Returns connections to their pools at the end of every request.
+    """
+    app.teardown_appcontext(release_connections)
@@ -0,0 +1,282 @@
+"""
+Helper functions for estimating the distance and duration of routes from the
+coordinates of their ends, without calling the Google Maps API.
+
+The straight line (great circle) distance is scaled by a circuity factor for
+each mode of transport, as roads and paths rarely run straight, and divided
+by a typical speed. Both are calibrated from the Distance Matrix results
+seen for routes whose coordinates were known.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import src.travel_buddy.helpers.helper_cache as helper_cache
+import src.travel_buddy.helpers.helper_database as helper_database
+
+# The mean radius (metres) of the Earth.
+EARTH_RADIUS = 6371008.8
+# The number of samples needed for a mode before its profile is calibrated
+# from them rather than using the default.
+MIN_CALIBRATION_SAMPLES = 20
+# The most recent samples used for calibrating each mode.
+MAX_CALIBRATION_SAMPLES = 5000
+
+Coordinates = Tuple[float, float]
+
+
+class SpeedProfile(NamedTuple):
+    """
+    How a mode of transport's route distance and duration relate to the
+    straight line distance.
+    """
+
+    # The route distance divided by the straight line distance.
+    circuity: float
+    # The average speed (metres per second) along the route.
+    speed: float
+
+
+DEFAULT_PROFILES = {
+    "walking": SpeedProfile(1.3, 1.35),
+    "bicycling": SpeedProfile(1.3, 4.5),
+    "driving": SpeedProfile(1.35, 12),
+    "transit": SpeedProfile(1.4, 7),
+}
+
+
+def parse_coordinates(value: Optional[str]) -> Optional[Coordinates]:
+    """
+    Parses coordinates submitted as "latitude,longitude".
+
+    Returns:
+        The latitude and longitude in degrees, or None if they're missing or
+        invalid.
+    """
+    try:
+        lat, lng = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def haversine(origin: Coordinates, destination: Coordinates) -> float:
+    """
+    Calculates the great circle distance (metres) between two points.
+    """
+    lat1, lng1 = map(math.radians, origin)
+    lat2, lng2 = map(math.radians, destination)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def format_distance(metres: float) -> str:
+    """
+    Formats a distance in the same way as the Distance Matrix API.
+    """
+    if metres < 1000:
+        return f"{round(metres)} m"
+    return f"{round(metres / 1000, 1)} km"
+
+
+def format_duration(seconds: float) -> str:
+    """
+    Formats a duration in the same way as the Distance Matrix API.
+    """
+    minutes = max(1, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours > 1 else ''}")
+    if minutes or not hours:
+        parts.append(f"{minutes} min{'s' if minutes > 1 else ''}")
+    return " ".join(parts)
+
+
+class DistanceEstimator:
+    """
+    Estimates route distances and durations from coordinates, with a speed
+    profile for each mode of transport.
+
+    Samples of real route distances and durations are stored in the cache
+    database, which the profiles are calibrated from.
+    """
+
+    def __init__(self, path: str = helper_cache.CACHE_PATH):
+        self.path = path
+        self.profiles: Dict[str, SpeedProfile] = dict(DEFAULT_PROFILES)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Opens the cache database on first use, creating the table if needed.
+        """
+        if self._conn is None:
+            self._conn = helper_database.open_connection(
+                self.path, check_same_thread=False
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS distance_sample ("
+                "origin VARCHAR NOT NULL, destination VARCHAR NOT NULL, "
+                "mode VARCHAR NOT NULL, straight_distance REAL NOT NULL, "
+                "distance INTEGER NOT NULL, duration INTEGER NOT NULL, "
+                "recorded_at REAL NOT NULL, "
+                "PRIMARY KEY (origin, destination, mode));"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_distance_sample_mode_recorded_at "
+                "ON distance_sample (mode, recorded_at);"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def estimate(
+        self, origin: Coordinates, destination: Coordinates, mode: str
+    ) -> Tuple[int, int]:
+        """
+        Estimates the distance and duration of a route.
+
+        Args:
+            origin: The coordinates of the starting point.
+            destination: The coordinates of the end point.
+            mode: The mode of transport.
+
+        Returns:
+            The distance (metres) and duration (seconds) of the route.
+        """
+        profile = self.profiles[mode]
+        distance = haversine(origin, destination) * profile.circuity
+        return round(distance), round(distance / profile.speed)
+
+    def estimate_response(
+        self,
+        origin: Coordinates,
+        destination: Coordinates,
+        mode: str,
+        origin_address: str,
+        destination_address: str,
+    ) -> dict:
+        """
+        Estimates a route in the same format as a Distance Matrix response,
+        marked with "estimated", to use in its place.
+        """
+        distance, duration = self.estimate(origin, destination, mode)
+        return {
+            "status": "OK",
+            "estimated": True,
+            "origin_addresses": [origin_address],
+            "destination_addresses": [destination_address],
+            "rows": [
+                {
+                    "elements": [
+                        {
+                            "status": "OK",
+                            "distance": {
+                                "value": distance,
+                                "text": format_distance(distance),
+                            },
+                            "duration": {
+                                "value": duration,
+                                "text": format_duration(duration),
+                            },
+                        }
+                    ]
+                }
+            ],
+        }
+
+    def record_samples(
+        self,
+        origins: str,
+        destinations: str,
+        origin: Coordinates,
+        destination: Coordinates,
+        route_data: Dict[str, dict],
+    ) -> None:
+        """
+        Stores the real distance and duration of a route for each mode of
+        transport to calibrate with, replacing any earlier sample of the same
+        route so that popular routes don't dominate.
+
+        Args:
+            origins: The starting point of the route.
+            destinations: The end point of the route.
+            origin: The coordinates of the starting point.
+            destination: The coordinates of the end point.
+            route_data: The Distance Matrix response for each mode.
+        """
+        straight_distance = haversine(origin, destination)
+        key = (
+            helper_cache.normalise_location(origins),
+            helper_cache.normalise_location(destinations),
+        )
+        now = time.time()
+        rows = []
+        for mode, response in route_data.items():
+            if response.get("estimated"):
+                continue
+            try:
+                element = response["rows"][0]["elements"][0]
+                distance = element["distance"]["value"]
+                duration = element["duration"]["value"]
+            except (KeyError, IndexError):
+                continue
+            if distance and duration:
+                rows.append((*key, mode, straight_distance, distance, duration, now))
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO distance_sample (origin, destination, mode, "
+                "straight_distance, distance, duration, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                rows,
+            )
+            conn.commit()
+
+    def calibrate(self) -> Dict[str, SpeedProfile]:
+        """
+        Fits the profile of each mode with enough samples, keeping the
+        default profile for the others.
+
+        The circuity is the least squares fit of the route distance against
+        the straight line distance, and the speed is the total route distance
+        over the total duration.
+
+        Returns:
+            The profile of each mode.
+        """
+        profiles = dict(DEFAULT_PROFILES)
+        with self._lock:
+            conn = self._get_connection()
+            for mode in DEFAULT_PROFILES:
+                row = conn.execute(
+                    "SELECT COUNT(*), TOTAL(straight_distance * distance), "
+                    "TOTAL(straight_distance * straight_distance), "
+                    "TOTAL(distance), TOTAL(duration) FROM ("
+                    "SELECT * FROM distance_sample WHERE mode=? "
+                    "AND straight_distance > 0 ORDER BY recorded_at DESC LIMIT ?);",
+                    (mode, MAX_CALIBRATION_SAMPLES),
+                ).fetchone()
+                count, cross, squares, distance, duration = row
+                if count >= MIN_CALIBRATION_SAMPLES and squares and duration:
+                    profiles[mode] = SpeedProfile(
+                        max(1.0, cross / squares), distance / duration
+                    )
+        self.profiles = profiles
+        logging.info(f"Calibrated distance estimates - {profiles}")
+        return profiles
+
+
+distance_estimator = DistanceEstimator()
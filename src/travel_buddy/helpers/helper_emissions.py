@@ -0,0 +1,239 @@
+"""
+Helper functions for estimating carbon emissions locally from a table of
+emission factors, rather than calling the Climatiq API for every estimate.
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_registry as helper_registry
+
+DB_PATH = helper_general.get_database_path()
+# Emissions (kg of CO2e) per kilometre for each vehicle type, fuel source and
+# engine size class.
+# Source: UK Government GHG Conversion Factors for Company Reporting 2023,
+# passenger vehicles by size.
+DEFAULT_EMISSION_FACTORS = {
+    ("car", "petrol", "small"): 0.14308,
+    ("car", "petrol", "medium"): 0.17474,
+    ("car", "petrol", "large"): 0.26828,
+    ("car", "petrol", "na"): 0.16272,
+    ("car", "diesel", "small"): 0.13721,
+    ("car", "diesel", "medium"): 0.16637,
+    ("car", "diesel", "large"): 0.20419,
+    ("car", "diesel", "na"): 0.16984,
+    ("car", "na", "na"): 0.16800,
+}
+# The upper bound (litres) of the small and medium engine size classes.
+ENGINE_SIZE_CLASSES = {"petrol": (1.4, 2.0), "diesel": (1.7, 2.0)}
+
+
+def get_fuel_source(fuel: str) -> str:
+    """
+    Gets the fuel source that emission factors are stored under.
+    """
+    fuel = (fuel or "").lower()
+    return fuel if fuel in ("petrol", "diesel") else "na"
+
+
+def get_engine_size_class(fuel_source: str, engine_size: Optional[float]) -> str:
+    """
+    Gets the engine size class (small, medium, or large) for the fuel source,
+    or 'na' if the engine size is unknown.
+    """
+    if fuel_source not in ENGINE_SIZE_CLASSES or not engine_size or engine_size <= 0:
+        return "na"
+    small, medium = ENGINE_SIZE_CLASSES[fuel_source]
+    if engine_size <= small:
+        return "small"
+    if engine_size <= medium:
+        return "medium"
+    return "large"
+
+
+def get_climatiq_emission_factor_id(key: Tuple[str, str, str]) -> str:
+    """
+    Gets the Climatiq emission factor ID for a key in the emission factor
+    table.
+    """
+    vehicle_type, fuel_source, _ = key
+    # Climatiq can't find emission factors with the engine size specified.
+    return (
+        f"passenger_vehicle-vehicle_type_{vehicle_type}-fuel_source_{fuel_source}"
+        "-engine_size_na-vehicle_age_na-vehicle_weight_na"
+    )
+
+
+def get_co2_emissions_from_api(payload: str, api_key: str) -> int:
+    """
+    Use derived emission query to find carbon emission data for route
+    """
+    url = "https://beta2.api.climatiq.io/estimate"
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    r = helper_http.request("climatiq", "POST", url, headers=headers, json=payload)
+    return r.json()
+
+
+class EmissionFactorTable:
+    """
+    The emission factors used for estimates, starting from the defaults and
+    overridden by any factors synced from Climatiq into the
+    'emission_factor' table.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._factors: Optional[Dict[Tuple[str, str, str], float]] = None
+        self._lock = threading.Lock()
+
+    def get_factors(self) -> Dict[Tuple[str, str, str], float]:
+        """
+        Gets the emission factors, loading the synced factors on first use.
+        """
+        if self._factors is None:
+            with self._lock:
+                if self._factors is None:
+                    self._factors = self.load_factors()
+        return self._factors
+
+    def load_factors(self) -> Dict[Tuple[str, str, str], float]:
+        """
+        Loads the default emission factors, overridden by the synced factors.
+        """
+        factors = dict(DEFAULT_EMISSION_FACTORS)
+        try:
+            with helper_database.get_connection(self.db_path) as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT vehicle_type, fuel_source, engine_size, "
+                    "kg_co2e_per_km FROM emission_factor;"
+                )
+                for vehicle_type, fuel_source, engine_size, factor in cur:
+                    factors[(vehicle_type, fuel_source, engine_size)] = factor
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to load synced emission factors - {e}")
+        return factors
+
+    def reload(self) -> None:
+        """
+        Reloads the emission factors, such as after a sync.
+        """
+        with self._lock:
+            self._factors = self.load_factors()
+
+    def get_factor(
+        self, fuel: str, engine_size: Optional[float] = None, vehicle_type="car"
+    ) -> float:
+        """
+        Gets the emission factor for a vehicle, falling back to less specific
+        factors if there isn't one for its engine size or fuel source.
+
+        Args:
+            fuel: The fuel type of the vehicle.
+            engine_size: The engine size (litres) of the vehicle.
+            vehicle_type: The type of vehicle.
+
+        Returns:
+            The emissions (kg of CO2e) per kilometre.
+        """
+        factors = self.get_factors()
+        fuel_source = get_fuel_source(fuel)
+        engine_size_class = get_engine_size_class(fuel_source, engine_size)
+        for key in (
+            (vehicle_type, fuel_source, engine_size_class),
+            (vehicle_type, fuel_source, "na"),
+            (vehicle_type, "na", "na"),
+        ):
+            if key in factors:
+                return factors[key]
+        raise KeyError(f"No emission factor for vehicle type '{vehicle_type}'")
+
+    def sync(self, api_key: str) -> int:
+        """
+        Refreshes the emission factors from the Climatiq API as a batch job,
+        storing them so that estimates never call the API.
+
+        Args:
+            api_key: The API key for Climatiq.
+
+        Returns:
+            The number of emission factors synced.
+        """
+        synced = {}
+        # Engine size classes share a factor on Climatiq, so only the factors
+        # without an engine size are synced.
+        for key in [k for k in DEFAULT_EMISSION_FACTORS if k[2] == "na"]:
+            # Estimates the emissions for one kilometre to get the factor.
+            payload = {
+                "emission_factor": get_climatiq_emission_factor_id(key),
+                "parameters": {"distance": 1, "distance_unit": "km"},
+            }
+            try:
+                co2e = get_co2_emissions_from_api(payload, api_key).get("co2e")
+            except Exception as e:
+                logging.warning(f"Failed to sync emission factor for {key} - {e}")
+                continue
+            if co2e is not None:
+                synced[key] = co2e
+
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT OR REPLACE INTO emission_factor (vehicle_type, "
+                "fuel_source, engine_size, kg_co2e_per_km, updated_at) "
+                "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP);",
+                [(*key, factor) for key, factor in synced.items()],
+            )
+            conn.commit()
+        self.reload()
+        return len(synced)
+
+
+emission_factors = EmissionFactorTable()
+
+
+def estimate_co2(
+    distance: int, fuel: str, engine_size: Optional[float] = None
+) -> float:
+    """
+    Estimates the CO2 emissions for driving a distance in a car.
+
+    Args:
+        distance: The distance (metres) driven.
+        fuel: The fuel type of the car.
+        engine_size: The engine size (litres) of the car.
+
+    Returns:
+        The CO2 emissions (kg) for the distance.
+    """
+    return estimate_co2_batch([distance], fuel, engine_size)[0]
+
+
+def estimate_co2_batch(
+    distances: Iterable[int], fuel: str, engine_size: Optional[float] = None
+) -> List[float]:
+    """
+    Estimates the CO2 emissions for driving each of the distances in a car,
+    looking up the emission factor once for all of them.
+
+    Args:
+        distances: The distances (metres) driven.
+        fuel: The fuel type of the car.
+        engine_size: The engine size (litres) of the car.
+
+    Returns:
+        The CO2 emissions (kg) for each distance.
+    """
+    factor_per_metre = emission_factors.get_factor(fuel, engine_size) / 1000
+    return [factor_per_metre * distance for distance in distances]
+
+
+if __name__ == "__main__":
+    keys = helper_registry.registry.get_keys()
+    print(f"Synced {emission_factors.sync(keys['carbon_emissions'])} emission factors.")
@@ -0,0 +1,227 @@
+"""
+Helper functions for the catalog of electric cars, which is scraped in the
+background into the 'ev_catalog' table and served from memory so that no
+request waits on the scrape.
+"""
+
+import logging
+import random
+import re
+import threading
+from typing import List, NamedTuple, Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_http as helper_http
+from lxml import html
+
+DB_PATH = helper_general.get_database_path()
+EV_DATABASE_URL = "https://ev-database.uk/#sort:path~type~order=.rank~number~desc|range-slider-range:prev~next=0~600|range-slider-towweight:prev~next=0~2500|range-slider-acceleration:prev~next=2~23|range-slider-fastcharge:prev~next=0~1100|range-slider-lease:prev~next=150~2500|range-slider-topspeed:prev~next=60~260|paging:currentPage=0|paging:number=9"
+# The XPath of each field of the cars listed on the EV database.
+EV_XPATHS = {
+    "make": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[2]/h2/a/span[1]/text()',
+    "model": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[2]/h2/a/span[2]/text()',
+    "price": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[5]/span/span[1]/text()',
+    "efficiency": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[4]/p[4]/span[2]/text()',
+    "range": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[4]/p[1]/span[2]/text()',
+    "image": '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[1]/a/img/@data-src',
+}
+# How often (seconds) the background thread scrapes the catalog.
+REFRESH_INTERVAL = 24 * 60 * 60
+# The number of cars recommended on the trends page.
+EV_SAMPLE_SIZE = 10
+
+
+class ElectricCar(NamedTuple):
+    """
+    An electric car in the catalog.
+    """
+
+    make: str
+    model: str
+    # The price (£), if it's listed.
+    price: Optional[float]
+    # The energy used (watt hours) per mile.
+    efficiency: int
+    image: str
+    # The range (miles), if it's listed.
+    range_miles: Optional[int]
+
+
+def parse_number(text: Optional[str]) -> Optional[float]:
+    """
+    Parses the first number in text such as "£32,990" or "172 Wh/mi".
+
+    Returns:
+        The number, or None if there isn't one.
+    """
+    match = re.search(r"\d[\d,]*(\.\d+)?", text or "")
+    return float(match.group().replace(",", "")) if match else None
+
+
+def scrape_electric_cars() -> List[ElectricCar]:
+    """
+    Collects the electric cars listed on the EV database, with their prices,
+    efficiencies, and ranges parsed into numbers.
+
+    Returns:
+        The cars which have an efficiency listed.
+    """
+    page = helper_http.request("ev_database", "GET", EV_DATABASE_URL)
+    tree = html.fromstring(page.content)
+    fields = {name: tree.xpath(xpath) for name, xpath in EV_XPATHS.items()}
+    count = len(fields["make"])
+    # Ranges are only used if every car has one, so they can't be misaligned.
+    if len(fields["range"]) != count:
+        fields["range"] = [None] * count
+
+    cars = []
+    for make, model, price, efficiency, range_miles, image in zip(
+        fields["make"],
+        fields["model"],
+        fields["price"],
+        fields["efficiency"],
+        fields["range"],
+        fields["image"],
+    ):
+        efficiency = parse_number(efficiency)
+        if not efficiency:
+            continue
+        range_miles = parse_number(range_miles)
+        cars.append(
+            ElectricCar(
+                make.strip(),
+                model.strip(),
+                parse_number(price),
+                int(efficiency),
+                "https://ev-database.uk" + image,
+                int(range_miles) if range_miles else None,
+            )
+        )
+    return cars
+
+
+def get_best_efficiency_electric(cars: List[ElectricCar]) -> List[ElectricCar]:
+    """
+    Sorts cars from the most efficient (the least energy per mile).
+    """
+    return sorted(cars, key=lambda car: car.efficiency)
+
+
+class EVCatalog:
+    """
+    Keeps a snapshot of the electric car catalog in memory, backed by the
+    'ev_catalog' table.
+
+    A background thread refreshes the catalog, and if a scrape fails, the
+    last stored catalog continues to be served.
+    """
+
+    def __init__(
+        self, db_path: str = DB_PATH, refresh_interval: int = REFRESH_INTERVAL
+    ):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._cars: Optional[List[ElectricCar]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_cars(self) -> List[ElectricCar]:
+        """
+        Gets every car in the catalog.
+
+        Only the first call reads the database, and the catalog is never
+        scraped in the request - it's empty until the first refresh.
+        """
+        cars = self._cars
+        if cars is None:
+            with self._lock:
+                if self._cars is None:
+                    self._cars = self.load_cars()
+                cars = self._cars
+        return cars
+
+    def find(self, make: str, model: str) -> Optional[ElectricCar]:
+        """
+        Gets a car in the catalog by its make and model, or None if it isn't
+        in the catalog.
+        """
+        for car in self.get_cars():
+            if car.make == make and car.model == model:
+                return car
+        return None
+
+    def sample(self, k: int = EV_SAMPLE_SIZE) -> List[ElectricCar]:
+        """
+        Gets up to k cars picked at random from the catalog.
+        """
+        cars = self.get_cars()
+        return random.sample(cars, min(k, len(cars)))
+
+    def load_cars(self) -> List[ElectricCar]:
+        """
+        Loads the stored catalog.
+        """
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT make, model, price, efficiency, image, range_miles "
+                "FROM ev_catalog ORDER BY ev_id;"
+            )
+            return [ElectricCar(*row) for row in cur.fetchall()]
+
+    def refresh(self) -> int:
+        """
+        Scrapes the catalog, and replaces the stored catalog with it.
+
+        Returns:
+            The number of cars in the catalog.
+        """
+        cars = scrape_electric_cars()
+        if not cars:
+            raise ValueError("No electric cars were found")
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM ev_catalog;")
+            cur.executemany(
+                "INSERT INTO ev_catalog (make, model, price, efficiency, image, "
+                "range_miles, fetched_at) VALUES (?, ?, ?, ?, ?, ?, "
+                "CURRENT_TIMESTAMP) ON CONFLICT (make, model) DO NOTHING;",
+                cars,
+            )
+            conn.commit()
+        self._cars = self.load_cars()
+        return len(self._cars)
+
+    def start(self) -> None:
+        """
+        Starts the background thread which refreshes the catalog.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="ev-catalog-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(
+                    f"Failed to refresh the EV catalog, keeping the last "
+                    f"stored catalog - {e}"
+                )
+            self._stop.wait(self.refresh_interval)
+
+
+ev_catalog = EVCatalog()
@@ -0,0 +1,195 @@
+"""
+Helper functions for UK fuel prices, which are scraped in the background and
+served from memory so that no request waits on the scrape.
+"""
+
+import logging
+import threading
+from typing import Dict, Tuple
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_singleflight as helper_singleflight
+from lxml import html
+
+DB_PATH = helper_general.get_database_path()
+FUEL_TYPES = ("petrol", "diesel")
+# How often (seconds) the background thread scrapes new prices.
+REFRESH_INTERVAL = 6 * 60 * 60
+# The prices (£ per litre) served until a price has been scraped.
+DEFAULT_PRICES = {"petrol": 1.45, "diesel": 1.50}
+# How long (days) scraped prices are kept for, after which they're pruned.
+PRICE_RETENTION_DAYS = 30
+
+
+def scrape_fuel_price(fuel_type: str) -> float:
+    """
+    Collects the current UK petrol or diesel prices from an online source.
+
+    Args:
+        fuel_type: The type of fuel (petrol or diesel).
+
+    Returns:
+        The price (£) of petrol or diesel per litre.
+    """
+    if fuel_type.lower() == "diesel":
+        url = "https://www.globalpetrolprices.com/United-Kingdom/diesel_prices/"
+    else:
+        url = "https://www.globalpetrolprices.com/United-Kingdom/gasoline_prices/"
+    page = helper_http.request("fuel_prices", "GET", url)
+    tree = html.fromstring(page.content)
+    price = float(
+        tree.xpath('//*[@id="graphPageLeft"]/table/tbody/tr[1]/td[1]/text()')[0]
+    )
+    return price
+
+
+def get_price_fuel_type(fuel_type: str) -> str:
+    """
+    Gets the fuel type that a price is stored under - anything other than
+    diesel is priced as petrol.
+    """
+    return "diesel" if fuel_type.lower() == "diesel" else "petrol"
+
+
+class FuelPriceService:
+    """
+    Keeps a snapshot of the latest fuel prices in memory, backed by
+    timestamped prices in the 'fuel_price' table.
+
+    A background thread refreshes the prices, and if a scrape fails, the last
+    known price continues to be served. Until a price has ever been scraped,
+    a default price is served.
+    """
+
+    def __init__(
+        self, db_path: str = DB_PATH, refresh_interval: int = REFRESH_INTERVAL
+    ):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        # Maps the fuel type to its latest price and the time it was fetched.
+        self._prices: Dict[str, Tuple[float, str]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Collapses concurrent scrapes for the same fuel type.
+        self.scrapes = helper_singleflight.SingleFlight("fuel price scrapes")
+
+    def get_price(self, fuel_type: str) -> float:
+        """
+        Gets the latest known price for the fuel type.
+
+        Only the first call reads the database, and the price is never scraped
+        in the request.
+
+        Args:
+            fuel_type: The type of fuel (petrol or diesel).
+
+        Returns:
+            The price (£) of the fuel per litre, or the default price if no
+            price has been stored yet.
+        """
+        fuel_type = get_price_fuel_type(fuel_type)
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load_latest_prices()
+                    self._loaded = True
+        snapshot = self._prices.get(fuel_type)
+        if snapshot is None:
+            return DEFAULT_PRICES[fuel_type]
+        return snapshot[0]
+
+    def load_latest_prices(self) -> None:
+        """
+        Loads the most recently stored price for each fuel type into memory.
+        """
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            for fuel_type in FUEL_TYPES:
+                cur.execute(
+                    "SELECT price, fetched_at FROM fuel_price WHERE fuel_type=? "
+                    "ORDER BY fetched_at DESC LIMIT 1;",
+                    (fuel_type,),
+                )
+                row = cur.fetchone()
+                if row:
+                    self._prices[fuel_type] = row
+
+    def refresh(self, fuel_type: str) -> float:
+        """
+        Scrapes the current price for the fuel type, and stores it.
+
+        A refresh which starts while another for the same fuel type is in
+        flight shares its result.
+
+        Args:
+            fuel_type: The type of fuel (petrol or diesel).
+
+        Returns:
+            The price (£) of the fuel per litre.
+        """
+        return self.scrapes.do(fuel_type, self._refresh, fuel_type)
+
+    def _refresh(self, fuel_type: str) -> float:
+        price = scrape_fuel_price(fuel_type)
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO fuel_price (fuel_type, price, fetched_at) "
+                "VALUES (?, ?, CURRENT_TIMESTAMP);",
+                (fuel_type, price),
+            )
+            cur.execute(
+                "SELECT fetched_at FROM fuel_price WHERE rowid=?;", (cur.lastrowid,)
+            )
+            self._prices[fuel_type] = (price, cur.fetchone()[0])
+            # Prunes old prices, which always keeps the one just stored.
+            cur.execute(
+                "DELETE FROM fuel_price WHERE fuel_type=? AND fetched_at < "
+                "datetime('now', ?);",
+                (fuel_type, f"-{PRICE_RETENTION_DAYS} days"),
+            )
+        return price
+
+    def refresh_all(self) -> None:
+        """
+        Refreshes the price of every fuel type, keeping the last known price
+        for any that fail.
+        """
+        for fuel_type in FUEL_TYPES:
+            try:
+                self.refresh(fuel_type)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to refresh {fuel_type} price, keeping the last "
+                    f"known price - {e}"
+                )
+
+    def start(self) -> None:
+        """
+        Starts the background thread which refreshes the prices.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="fuel-price-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._stop.wait(self.refresh_interval)
+
+
+fuel_prices = FuelPriceService()
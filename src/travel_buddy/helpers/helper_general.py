@@ -2,20 +2,22 @@
 Handles helper functions for general use cases, such as getting database path.
 """
 
+import calendar
 import datetime
 import json
-import os
-import pathlib
+import time
 import uuid
 from base64 import b64decode
-from typing import List, Tuple
-import requests
-from lxml import html
-import sqlite3
+from typing import Iterable, List, Tuple
 
-import random
+import src.travel_buddy.helpers.helper_avatars as helper_avatars
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
 
-from PIL import Image
+# The price (£) and CO2 emissions (kg) of each watt hour used by an electric
+# car.
+EV_PRICE_PER_WATT_HOUR = 0.000163
+EV_CO2_PER_WATT_HOUR = 0.000233
 
 
 def get_keys(file_name: str) -> dict:
@@ -36,10 +38,7 @@ def get_database_path() -> str:
     Returns:
         The directory path to the SQLite3 database.
     """
-    # Gets the root directory of the project, 'travel-buddy'.
-    BASE_DIR = pathlib.Path(__file__).parent.parent.parent.parent
-    DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
-    return DB_PATH
+    return helper_database.get_database_path()
 
 
 def string_to_date(date_string: str) -> datetime:
@@ -55,6 +54,37 @@ def string_to_date(date_string: str) -> datetime:
     return datetime.datetime.strptime(date_string, "%Y-%m-%dT%H:%M")
 
 
+def datetime_to_epoch(date: datetime.datetime) -> int:
+    """
+    Converts a datetime to the integer epoch it's stored as in the database.
+
+    Datetimes are stored as their wall-clock time in seconds since the Unix
+    epoch (treating them as UTC), matching SQLite's strftime('%s', ...).
+
+    Args:
+        date: The datetime to convert.
+
+    Returns:
+        The number of seconds since the Unix epoch.
+    """
+    return calendar.timegm(date.timetuple())
+
+
+def format_epochs(epochs: Iterable[int], date_format: str) -> List[str]:
+    """
+    Formats integer epochs from the database as strings, without creating a
+    datetime object for each one.
+
+    Args:
+        epochs: The epochs to format.
+        date_format: The strftime format to use.
+
+    Returns:
+        The formatted epochs, in the same order.
+    """
+    return [time.strftime(date_format, time.gmtime(epoch)) for epoch in epochs]
+
+
 def is_allowed_image_file(file_name) -> bool:
     """
     Checks if the file is an allowed type.
@@ -77,6 +107,9 @@ def hash_image(file) -> Tuple[bool, List[str], str]:
     """
     Hashes the file to avoid duplicate names for storage in the database.
 
+    The upload is checked to be an image, and then stored as it is, to be
+    processed by a background job.
+
     Args:
         file: The file uploaded by the user.
 
@@ -87,15 +120,12 @@ def hash_image(file) -> Tuple[bool, List[str], str]:
     valid = True
     message = []
 
-    # Hashes the name of the file and resizes it.
-    if is_allowed_image_file(file.filename):
+    # Hashes the name of the file.
+    if is_allowed_image_file(file.filename) and helper_avatars.is_valid_image(
+        file.stream
+    ):
         file_name_hashed = str(uuid.uuid4()) + ".jpg"
-        directory = pathlib.Path(__file__).parent.parent
-        file_path = os.path.join(f"{directory}/static/avatars/", file_name_hashed)
-        img = Image.open(file)
-        img = img.resize((1000, 1000))
-        img = img.convert("RGB")
-        img.save(file_path)
+        file.save(helper_avatars.get_upload_path(file_name_hashed))
     elif file:
         valid = False
         message.append("Your file must be an image.")
@@ -114,14 +144,8 @@ def get_user_avatar(username):
     Returns:
         The avatar url
     """
-
-    DB_PATH = get_database_path()
-
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT photo FROM profile WHERE username = ?", (username,))
-        avatar = cursor.fetchone()
-        return avatar[0]
+    card = helper_user_cards.user_cards.load_one(username)
+    return card.avatar if card else None
 
 
 def is_user_verified(username):
@@ -134,13 +158,8 @@ def is_user_verified(username):
     Returns:
         True if verified, False otherwise
     """
-    DB_PATH = get_database_path()
-
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT verified FROM profile WHERE username = ?", (username,))
-        verified = cursor.fetchone()
-        return verified[0] == 1
+    card = helper_user_cards.user_cards.load_one(username)
+    return bool(card and card.verified)
 
 
 def get_user_rating(username):
@@ -153,48 +172,11 @@ def get_user_rating(username):
     Returns:
         The average user rating, in range [1,5] and amount of ratings
     """
-    DB_PATH = get_database_path()
-
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT AVG(rating_given), COUNT(rating_given) FROM rating WHERE rated_username = ?",
-            (username,),
-        )
-        rating = cursor.fetchone()
-
-        if rating[0] is None:
-            return 0, 0
-
-        return rating[0], rating[1]
-
-
-def get_electric_cars():
-    page = requests.get(
-        "https://ev-database.uk/#sort:path~type~order=.rank~number~desc|range-slider-range:prev~next=0~600|range-slider-towweight:prev~next=0~2500|range-slider-acceleration:prev~next=2~23|range-slider-fastcharge:prev~next=0~1100|range-slider-lease:prev~next=150~2500|range-slider-topspeed:prev~next=60~260|paging:currentPage=0|paging:number=9"
-    )
-    tree = html.fromstring(page.content)
-    efficiencies = tree.xpath(
-        '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[4]/p[4]/span[2]/text()'
-    )
-    models = tree.xpath(
-        '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[2]/h2/a/span[2]/text()'
-    )
-    make = tree.xpath(
-        '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[2]/h2/a/span[1]/text()'
-    )
-    price = tree.xpath(
-        '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[5]/span/span[1]/text()'
-    )
-    images = [
-        "https://ev-database.uk" + img
-        for img in tree.xpath(
-            '//*[@id="evdb"]/main/div[2]/div[3]/div/div/div[1]/a/img/@data-src'
-        )
-    ]
-    cars = list(zip(make, models, price, efficiencies, images))
-
-    return random.sample(cars, 10)
+    card = helper_user_cards.user_cards.load_one(username)
+    if card is None or not card.rating_count:
+        return 0, 0
+
+    return card.rating_average, card.rating_count
 
 
 def get_watts_required(wpm, distance):
@@ -205,22 +187,15 @@ def get_ev_cost_1_month(wpm, distance):
     """
     Sourece: https://www.papernest.co.uk/energy/tariffs/kwh-cost/
     """
-    price_per_watt = 0.000163
     watts_required = wpm * distance
-    return price_per_watt * watts_required
+    return EV_PRICE_PER_WATT_HOUR * watts_required
 
 
 def get_ev_co2_1_month(watts):
     """
     Source: https://bulb.co.uk/carbon-tracker/
     """
-    co2_kg_per_w = 0.000233
-    return co2_kg_per_w * watts
-
-
-def get_best_efficiency_electric(cars):
-    sorted_efficiency = sorted(cars, key=lambda tup: tup[3], reverse=True)
-    return sorted_efficiency
+    return EV_CO2_PER_WATT_HOUR * watts
 
 
 def get_autocomplete_query(**kwargs):
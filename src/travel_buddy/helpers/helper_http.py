@@ -0,0 +1,389 @@
+"""
+Helper functions for calling external services, so that a slow or failing
+service can't tie up every worker thread.
+
+Each service (dependency) has its own timeouts and retries, and a circuit
+breaker which fails calls straight away while the service is unhealthy.
+Callers can also pass a deadline, after which no more time is spent on the
+call.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, NamedTuple, Optional
+
+import googlemaps
+import requests
+import src.travel_buddy.helpers.helper_registry as helper_registry
+
+
+class DependencyConfig(NamedTuple):
+    """
+    How calls to an external service are made.
+    """
+
+    # Seconds to wait to connect, and then for each read of the response.
+    connect_timeout: float
+    read_timeout: float
+    # The number of extra attempts after a failure, and the base delay
+    # (seconds) of the exponential backoff between them.
+    retries: int
+    backoff: float
+    # The number of consecutive failures which open the circuit, and how
+    # long (seconds) it stays open before a trial call is allowed.
+    failure_threshold: int
+    reset_timeout: float
+
+
+DEPENDENCIES = {
+    # The Google Maps client retries by itself, within its retry timeout.
+    "google_maps": DependencyConfig(
+        helper_registry.MAPS_CONNECT_TIMEOUT,
+        helper_registry.MAPS_READ_TIMEOUT,
+        0,
+        0,
+        5,
+        30,
+    ),
+    "fuel_prices": DependencyConfig(3.05, 10, 2, 0.5, 3, 5 * 60),
+    "climatiq": DependencyConfig(3.05, 10, 2, 0.5, 3, 60),
+    "ev_database": DependencyConfig(3.05, 10, 1, 0.5, 3, 5 * 60),
+}
+# The Google Maps errors which mean the service, rather than the request, is
+# at fault.
+MAPS_FAILURE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+# The threads which run client calls with a deadline, so the caller can stop
+# waiting at the deadline even though the client keeps retrying.
+CALL_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="http-call")
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a service whose circuit is open.
+    """
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised instead of calling a service once the caller's deadline has
+    passed.
+    """
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a service.
+
+    The circuit opens after too many consecutive failures, and calls fail
+    straight away while it's open. Once the reset timeout has passed a
+    single trial call is allowed through (half open), which either closes
+    the circuit or opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Checks whether a call may be made, counting it as rejected if not.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.reset_timeout:
+                    self.state = self.HALF_OPEN
+                    self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            if self.state == self.CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                logging.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+
+    def release(self) -> None:
+        """
+        Ends a call which failed for a reason unrelated to the health of the
+        service, such as a bug, letting another trial call through if it was
+        one.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logging.warning(f"Circuit for {self.name} opened")
+
+    def get_stats(self) -> dict:
+        """
+        Gets the state of the circuit and the number of calls made.
+        """
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name, config.failure_threshold, config.reset_timeout)
+    for name, config in DEPENDENCIES.items()
+}
+
+
+def get_remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    Gets the number of seconds left until the deadline (from time.monotonic),
+    or None if there is no deadline.
+    """
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def get_backoff(config: DependencyConfig, attempt: int) -> float:
+    """
+    Gets the delay before retrying, using exponential backoff with full
+    jitter so that retries from many threads don't arrive together.
+    """
+    return random.uniform(0, config.backoff * 2**attempt)
+
+
+def is_service_response(error: Exception) -> bool:
+    """
+    Checks whether a failed call got an error response from the service, which
+    shows the service is reachable even if the request was at fault.
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None
+    return isinstance(
+        error,
+        (googlemaps.exceptions.HTTPError, googlemaps.exceptions.ApiError),
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Checks whether a failed call is worth retrying and counts against the
+    health of the service - client errors (4xx), and Google Maps errors caused
+    by the request (such as INVALID_REQUEST or NOT_FOUND), are neither.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    if isinstance(error, googlemaps.exceptions.HTTPError):
+        return error.status_code >= 500 or error.status_code == 429
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status in MAPS_FAILURE_STATUSES
+    return isinstance(
+        error,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            googlemaps.exceptions.TransportError,
+            googlemaps.exceptions.Timeout,
+        ),
+    )
+
+
+def request(
+    dependency: str,
+    method: str,
+    url: str,
+    deadline: Optional[float] = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Makes an HTTP request to an external service with the shared session.
+
+    Args:
+        dependency: The name of the service in DEPENDENCIES.
+        method: The HTTP method.
+        url: The URL to request.
+        deadline: The time (from time.monotonic) to give up at.
+        kwargs: Passed on to requests.
+
+    Returns:
+        The successful response.
+
+    Raises:
+        CircuitOpenError: If the service is unhealthy.
+        DeadlineExceededError: If the deadline passed before a response.
+        requests.RequestException: If the request failed.
+    """
+    config = DEPENDENCIES[dependency]
+    breaker = breakers[dependency]
+    session = helper_registry.registry.get_http_session()
+    attempt = 0
+    while True:
+        remaining = get_remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Deadline passed before calling {dependency}")
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {dependency} is open")
+
+        read_timeout = config.read_timeout
+        if remaining is not None:
+            read_timeout = min(read_timeout, remaining)
+        try:
+            response = session.request(
+                method,
+                url,
+                timeout=(config.connect_timeout, read_timeout),
+                **kwargs,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if not is_retryable(e):
+                if is_service_response(e):
+                    # The service is healthy, the request was at fault.
+                    breaker.record_success()
+                else:
+                    breaker.release()
+                raise
+            breaker.record_failure()
+            delay = get_backoff(config, attempt)
+            remaining = get_remaining(deadline)
+            if (
+                attempt >= config.retries
+                or breaker.state == CircuitBreaker.OPEN
+                or (remaining is not None and delay >= remaining)
+            ):
+                raise
+            logging.warning(f"Retrying {dependency} in {delay:.2f}s - {e}")
+            attempt += 1
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return response
+
+
+def call(
+    dependency: str,
+    fn: Callable,
+    *args,
+    deadline: Optional[float] = None,
+    on_late_result: Optional[Callable] = None,
+    **kwargs,
+):
+    """
+    Calls a client for an external service which makes its own HTTP requests
+    (and sets its own timeouts), through the service's circuit breaker.
+
+    With a deadline, the call runs in another thread, and is given up on at
+    the deadline even if the client is still retrying. The call carries on in
+    the background, and if it then succeeds, its result is passed to
+    on_late_result so that it isn't wasted.
+
+    Only errors from the service itself count towards its health - other
+    errors, such as bugs in the caller, are neither successes nor failures.
+
+    Args:
+        dependency: The name of the service in DEPENDENCIES.
+        fn: The client function to call.
+        args: The positional arguments for the function.
+        deadline: The time (from time.monotonic) to give up at.
+        on_late_result: Called with the result of a call which succeeds
+            after the deadline, such as to cache it.
+        kwargs: The keyword arguments for the function.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        CircuitOpenError: If the service is unhealthy.
+        DeadlineExceededError: If the deadline passed before a result.
+    """
+    remaining = get_remaining(deadline)
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError(f"Deadline passed before calling {dependency}")
+    breaker = breakers[dependency]
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit for {dependency} is open")
+
+    def run():
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            elif is_service_response(e):
+                # The service is healthy, the request was at fault.
+                breaker.record_success()
+            else:
+                breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+    if remaining is None:
+        return run()
+    future = CALL_EXECUTOR.submit(run)
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeoutError:
+        if on_late_result is not None:
+            future.add_done_callback(
+                lambda done: handle_late_result(dependency, done, on_late_result)
+            )
+        raise DeadlineExceededError(f"Deadline passed while calling {dependency}")
+
+
+def handle_late_result(dependency: str, future: Future, on_late_result: Callable):
+    """
+    Passes the result of a call which finished after its deadline to the
+    caller's handler, if the call succeeded.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        on_late_result(future.result())
+    except Exception as e:
+        logging.warning(f"Failed to handle a late result from {dependency} - {e}")
+
+
+def get_health() -> Dict[str, dict]:
+    """
+    Gets the health of each external service, keyed by its name.
+    """
+    return {name: breaker.get_stats() for name, breaker in breakers.items()}
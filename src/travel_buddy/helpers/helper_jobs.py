@@ -0,0 +1,271 @@
+"""
+A durable queue for slow work, stored in the database so that queued jobs
+survive restarts and no separate broker is needed.
+
+Requests enqueue a job and return straight away, and worker threads run it
+in the background, writing its results back to the database. Failed jobs are
+retried with backoff, and once they've used every attempt they're moved to
+the dead letter table so that they can be inspected.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+
+# The number of worker threads running jobs.
+WORKER_COUNT = 2
+# How long (seconds) idle workers wait before checking for jobs again, if
+# they aren't woken by a job being enqueued.
+POLL_INTERVAL = 5
+# How long (seconds) a worker may run a job before it's assumed the worker
+# died, and the job is run again.
+LEASE_DURATION = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# The base delay (seconds) before retrying, doubled after each attempt.
+RETRY_BACKOFF = 5
+
+
+class Job(NamedTuple):
+    """
+    A job claimed by a worker.
+    """
+
+    job_id: int
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    """
+    Runs jobs from the 'job' table in worker threads.
+
+    Each kind of job has a handler, which is called with the job's payload
+    as keyword arguments. The queue is kept in the main database unless
+    another is given.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        worker_count: int = WORKER_COUNT,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.db_path = db_path
+        self.worker_count = worker_count
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Callable] = {}
+        self.dead_letter_handlers: Dict[str, Callable] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def register(
+        self, kind: str, handler: Callable, on_dead_letter: Optional[Callable] = None
+    ) -> Callable:
+        """
+        Registers the handler which runs a kind of job.
+
+        Args:
+            kind: The kind of job.
+            handler: Runs the job, called with its payload.
+            on_dead_letter: Called with the job's payload once it has used
+                            every attempt, such as to clean up after it.
+
+        Returns:
+            The handler.
+        """
+        self.handlers[kind] = handler
+        if on_dead_letter is not None:
+            self.dead_letter_handlers[kind] = on_dead_letter
+        return handler
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Optional[dict] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        delay: float = 0,
+    ) -> int:
+        """
+        Adds a job to the queue, committing it before returning.
+
+        Args:
+            kind: The kind of job, which must have a handler.
+            payload: The keyword arguments for the handler, which must be
+                serialisable as JSON.
+            max_attempts: The number of times the job is tried before it's
+                moved to the dead letter table.
+            delay: How long (seconds) to wait before running the job.
+
+        Returns:
+            The id of the job.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler is registered for '{kind}' jobs")
+        now = time.time()
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO job (kind, payload, max_attempts, run_after, "
+                "created_epoch) VALUES (?, ?, ?, ?, ?);",
+                (kind, json.dumps(payload or {}), max_attempts, now + delay, now),
+            )
+            job_id = cur.lastrowid
+        self._wake.set()
+        return job_id
+
+    def claim(self) -> Optional[Job]:
+        """
+        Claims the next job which is due, including jobs whose worker's lease
+        has expired.
+
+        Returns:
+            The job, or None if no jobs are due.
+        """
+        now = time.time()
+        conn = helper_database.get_connection(self.db_path)
+        # Takes the write lock first, so two workers can't claim the same job.
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            row = conn.execute(
+                "SELECT job_id, kind, payload, attempts, max_attempts FROM job "
+                "WHERE (status='queued' AND run_after<=?) "
+                "OR (status='running' AND locked_until<=?) "
+                "ORDER BY run_after LIMIT 1;",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            conn.execute(
+                "UPDATE job SET status='running', attempts=attempts+1, "
+                "locked_until=? WHERE job_id=?;",
+                (now + LEASE_DURATION, row[0]),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        job_id, kind, payload, attempts, max_attempts = row
+        return Job(job_id, kind, json.loads(payload), attempts + 1, max_attempts)
+
+    def run_one(self) -> bool:
+        """
+        Claims and runs the next job which is due.
+
+        Returns:
+            Whether there was a job to run.
+        """
+        job = self.claim()
+        if job is None:
+            return False
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise ValueError(f"No handler is registered for '{job.kind}' jobs")
+            handler(**job.payload)
+        except Exception as e:
+            logging.warning(f"Job {job.job_id} ({job.kind}) failed - {e}")
+            self.fail(job, repr(e))
+        else:
+            with helper_database.get_connection(self.db_path) as conn:
+                conn.execute("DELETE FROM job WHERE job_id=?;", (job.job_id,))
+        return True
+
+    def fail(self, job: Job, error: str) -> None:
+        """
+        Schedules a failed job to be retried with backoff, or moves it to the
+        dead letter table if it has used every attempt.
+        """
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            if job.attempts < job.max_attempts:
+                # Full jitter, so that jobs which failed together spread out.
+                delay = random.uniform(0, RETRY_BACKOFF * 2**job.attempts)
+                cur.execute(
+                    "UPDATE job SET status='queued', run_after=?, "
+                    "locked_until=NULL, last_error=? WHERE job_id=?;",
+                    (time.time() + delay, error, job.job_id),
+                )
+                return
+            cur.execute(
+                "INSERT INTO job_dead_letter (job_id, kind, payload, attempts, "
+                "last_error, created_epoch, failed_epoch) SELECT job_id, kind, "
+                "payload, attempts, ?, created_epoch, ? FROM job WHERE job_id=?;",
+                (error, time.time(), job.job_id),
+            )
+            cur.execute("DELETE FROM job WHERE job_id=?;", (job.job_id,))
+
+        on_dead_letter = self.dead_letter_handlers.get(job.kind)
+        if on_dead_letter is not None:
+            try:
+                on_dead_letter(**job.payload)
+            except Exception as e:
+                logging.warning(
+                    f"Cleaning up after job {job.job_id} ({job.kind}) failed - {e}"
+                )
+
+    def run_pending(self) -> int:
+        """
+        Runs jobs until none are due.
+
+        Returns:
+            The number of jobs run.
+        """
+        count = 0
+        while self.run_one():
+            count += 1
+        return count
+
+    def get_stats(self) -> dict:
+        """
+        Gets the number of queued, running, and dead jobs.
+        """
+        with helper_database.get_connection(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT status, COUNT(*) FROM job GROUP BY status;")
+            stats = {"queued": 0, "running": 0, **dict(cur.fetchall())}
+            cur.execute("SELECT COUNT(*) FROM job_dead_letter;")
+            stats["dead"] = cur.fetchone()[0]
+        return stats
+
+    def start(self) -> None:
+        """
+        Starts the worker threads.
+        """
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.worker_count)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the worker threads once they've finished their current jobs.
+        """
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except Exception as e:
+                logging.warning(f"Failed to claim a job - {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+job_queue = JobQueue()
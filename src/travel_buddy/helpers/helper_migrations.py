@@ -0,0 +1,439 @@
+"""
+Helper functions for applying versioned schema changes to the database at
+startup.
+
+Each migration is a function which makes its changes with the cursor it's
+given. Migrations are applied in order, each in its own transaction, and the
+version of the database schema is stored in its 'user_version' pragma.
+"""
+
+import logging
+from typing import Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+
+# The number of most searched routes stored for each user.
+TOP_ROUTES_STORED = 10
+
+
+def add_column(cur, table: str, column: str, definition: str) -> None:
+    """
+    Adds a column to a table, unless the table already has it.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        table: The table to add the column to.
+        column: The name of the column.
+        definition: The type and constraints of the column.
+    """
+    cur.execute(f"PRAGMA table_info({table});")
+    if column not in [row[1] for row in cur.fetchall()]:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+
+def add_fuel_price_and_emission_factor_tables(cur) -> None:
+    """
+    Adds the fuel price snapshots, the fuel cost of completed rides, and the
+    synced emission factors.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS fuel_price (fuel_type VARCHAR NOT NULL "
+        'CHECK (fuel_type IN ("petrol", "diesel")), price REAL NOT NULL, '
+        "fetched_at TIMESTAMP NOT NULL DEFAULT (CURRENT_TIMESTAMP));"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fuel_price_fuel_type_fetched_at "
+        "ON fuel_price (fuel_type, fetched_at);"
+    )
+    add_column(cur, "carpool_ride", "fuel_cost", "REAL")
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS emission_factor (vehicle_type VARCHAR NOT "
+        "NULL, fuel_source VARCHAR NOT NULL, engine_size VARCHAR NOT NULL, "
+        "kg_co2e_per_km REAL NOT NULL, updated_at TIMESTAMP NOT NULL DEFAULT "
+        "(CURRENT_TIMESTAMP), PRIMARY KEY (vehicle_type, fuel_source, "
+        "engine_size));"
+    )
+
+
+def add_query_indexes(cur) -> None:
+    """
+    Adds the indexes used by the carpool listings, profile statistics,
+    ratings, carpool interest, and route lookups.
+    """
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_ride_is_complete_pickup_datetime "
+        "ON carpool_ride (is_complete, pickup_datetime);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_ride_driver_is_complete "
+        "ON carpool_ride (driver, is_complete);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rating_rated_username "
+        "ON rating (rated_username);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_request_requester "
+        "ON carpool_request (requester);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_request_journey_id "
+        "ON carpool_request (journey_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_interest_username "
+        "ON carpool_interest (username);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_interest_journey_id "
+        "ON carpool_interest (journey_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_route_origin_destination "
+        "ON route (origin, destination);"
+    )
+
+
+def add_rating_summary(cur) -> None:
+    """
+    Adds the total, count, and average of the ratings each user has received,
+    which are kept up to date by triggers on the rating table.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS rating_summary (username VARCHAR PRIMARY KEY "
+        "NOT NULL REFERENCES account (username), rating_sum INTEGER NOT NULL, "
+        "rating_count INTEGER NOT NULL, rating_average REAL NOT NULL);"
+    )
+    cur.execute(
+        "INSERT OR REPLACE INTO rating_summary SELECT rated_username, "
+        "SUM(rating_given), COUNT(rating_given), AVG(rating_given) FROM rating "
+        "GROUP BY rated_username;"
+    )
+    # Adding and removing a rating are each written once, and an update is
+    # handled as removing the old rating then adding the new one.
+    add_rating = (
+        "INSERT INTO rating_summary VALUES (NEW.rated_username, "
+        "NEW.rating_given, 1, NEW.rating_given) ON CONFLICT (username) DO UPDATE "
+        "SET rating_sum=rating_sum + excluded.rating_sum, "
+        "rating_count=rating_count + 1, "
+        "rating_average=(rating_sum + excluded.rating_sum) * 1.0 "
+        "/ (rating_count + 1);"
+    )
+    remove_rating = (
+        "UPDATE rating_summary SET rating_sum=rating_sum - OLD.rating_given, "
+        "rating_count=rating_count - 1, "
+        "rating_average=COALESCE((rating_sum - OLD.rating_given) * 1.0 "
+        "/ NULLIF(rating_count - 1, 0), 0) "
+        "WHERE username=OLD.rated_username; "
+        "DELETE FROM rating_summary WHERE username=OLD.rated_username "
+        "AND rating_count=0;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS rating_summary_insert AFTER INSERT ON "
+        f"rating BEGIN {add_rating} END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS rating_summary_update AFTER UPDATE OF "
+        f"rated_username, rating_given ON rating BEGIN {remove_rating} "
+        f"{add_rating} END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS rating_summary_delete AFTER DELETE ON "
+        f"rating BEGIN {remove_rating} END;"
+    )
+
+
+def add_user_stats(cur) -> None:
+    """
+    Adds the statistics shown on each user's profile, calculated from the
+    existing carpools and route searches.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS user_stats (username VARCHAR PRIMARY KEY "
+        "NOT NULL REFERENCES account (username), "
+        "carpools_joined INTEGER NOT NULL DEFAULT (0), "
+        "carpools_driven INTEGER NOT NULL DEFAULT (0), "
+        "distance_carpooled INTEGER NOT NULL DEFAULT (0), "
+        "co2_saved REAL NOT NULL DEFAULT (0), "
+        "fuel_cost_saved REAL NOT NULL DEFAULT (0), "
+        "unpriced_distance INTEGER NOT NULL DEFAULT (0), "
+        "routes_searched INTEGER NOT NULL DEFAULT (0), "
+        "unique_routes_searched INTEGER NOT NULL DEFAULT (0));"
+    )
+    # The statistics as they were calculated when this migration was added,
+    # so that later changes to how they're calculated don't change it.
+    cur.execute(
+        "INSERT OR REPLACE INTO user_stats (username, carpools_joined, "
+        "carpools_driven, distance_carpooled, co2_saved, fuel_cost_saved, "
+        "unpriced_distance, routes_searched, unique_routes_searched) "
+        "SELECT a.username, "
+        "(SELECT COUNT(request_id) FROM carpool_request "
+        "WHERE requester=a.username AND journey_id IS NOT NULL), "
+        "(SELECT COUNT(journey_id) FROM carpool_ride "
+        "WHERE driver=a.username AND is_complete=1), "
+        "(SELECT TOTAL(distance) FROM carpool_ride "
+        "WHERE driver=a.username AND is_complete=1) + "
+        "(SELECT TOTAL(distance) FROM carpool_request "
+        "WHERE requester=a.username AND journey_id IS NOT NULL), "
+        "(SELECT TOTAL(estimate_co2_saved) FROM carpool_ride "
+        "WHERE driver=a.username AND is_complete=1) + "
+        "(SELECT TOTAL(estimate_co2_saved) FROM carpool_request "
+        "WHERE requester=a.username AND journey_id IS NOT NULL), "
+        "(SELECT TOTAL(fuel_cost) FROM carpool_ride WHERE driver=a.username "
+        "AND is_complete=1 AND seats_initial AND fuel_cost IS NOT NULL), "
+        "(SELECT TOTAL(distance) FROM carpool_ride WHERE driver=a.username "
+        "AND is_complete=1 AND seats_initial AND fuel_cost IS NULL) + "
+        "(SELECT TOTAL(distance) FROM carpool_request WHERE requester=a.username "
+        "AND journey_id IS NOT NULL AND num_passengers), "
+        "(SELECT TOTAL(search_count) FROM route_search WHERE username=a.username), "
+        "(SELECT COUNT(route_id) FROM route_search WHERE username=a.username) "
+        "FROM account a;"
+    )
+
+
+def add_epoch_columns(cur) -> None:
+    """
+    Adds integer epoch copies of the carpool pickup datetimes and route search
+    timestamps, so they can be compared and formatted without parsing text.
+    """
+    add_column(cur, "carpool_ride", "pickup_epoch", "INTEGER")
+    cur.execute(
+        "UPDATE carpool_ride SET "
+        "pickup_epoch=CAST(strftime('%s', pickup_datetime) AS INTEGER);"
+    )
+    # The listings now search by the epoch rather than the text datetime.
+    cur.execute("DROP INDEX IF EXISTS idx_carpool_ride_is_complete_pickup_datetime;")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_carpool_ride_is_complete_pickup_epoch "
+        "ON carpool_ride (is_complete, pickup_epoch);"
+    )
+    add_column(cur, "route_search", "last_searched_epoch", "INTEGER")
+    add_column(cur, "route_search", "last_updated_epoch", "INTEGER")
+    cur.execute(
+        "UPDATE route_search SET "
+        "last_searched_epoch=CAST(strftime('%s', last_searched_timestamp) "
+        "AS INTEGER), "
+        "last_updated_epoch=CAST(strftime('%s', last_updated_timestamp) "
+        "AS INTEGER);"
+    )
+
+
+def add_route_search_event(cur) -> None:
+    """
+    Adds a view which records a route search with a single insert, creating
+    the route if needed and counting the search unless the user already
+    searched the route in the last five minutes.
+
+    The route search statistics in user_stats are kept up to date by
+    triggers, so that batches of searches can be inserted at once.
+    """
+    # Routes are looked up by origin and destination, so each pair must only
+    # be stored once.
+    cur.execute("DROP INDEX IF EXISTS idx_route_origin_destination;")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_route_origin_destination "
+        "ON route (origin, destination);"
+    )
+    cur.execute(
+        "CREATE VIEW IF NOT EXISTS route_search_event AS SELECT s.username, "
+        "r.origin, r.destination, s.last_searched_epoch AS searched_epoch "
+        "FROM route_search s JOIN route r ON s.route_id = r.route_id;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS route_search_event_insert INSTEAD OF "
+        "INSERT ON route_search_event BEGIN "
+        "INSERT INTO route (origin, destination) "
+        "VALUES (NEW.origin, NEW.destination) "
+        "ON CONFLICT (origin, destination) DO NOTHING; "
+        "INSERT INTO route_search (username, route_id, search_count, "
+        "last_searched_timestamp, last_updated_timestamp, last_searched_epoch, "
+        "last_updated_epoch) "
+        "SELECT NEW.username, route_id, 1, "
+        "datetime(NEW.searched_epoch, 'unixepoch'), "
+        "datetime(NEW.searched_epoch, 'unixepoch'), "
+        "NEW.searched_epoch, NEW.searched_epoch FROM route "
+        "WHERE origin=NEW.origin AND destination=NEW.destination "
+        "ON CONFLICT (username, route_id) DO UPDATE SET "
+        "search_count=search_count + (COALESCE(last_updated_epoch, 0) "
+        "< excluded.last_updated_epoch - 300), "
+        "last_updated_timestamp=CASE WHEN COALESCE(last_updated_epoch, 0) "
+        "< excluded.last_updated_epoch - 300 "
+        "THEN excluded.last_updated_timestamp ELSE last_updated_timestamp END, "
+        "last_updated_epoch=CASE WHEN COALESCE(last_updated_epoch, 0) "
+        "< excluded.last_updated_epoch - 300 "
+        "THEN excluded.last_updated_epoch ELSE last_updated_epoch END, "
+        "last_searched_timestamp=excluded.last_searched_timestamp, "
+        "last_searched_epoch=excluded.last_searched_epoch; "
+        "END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS user_stats_route_search_insert AFTER "
+        "INSERT ON route_search BEGIN "
+        "INSERT INTO user_stats (username, routes_searched, "
+        "unique_routes_searched) VALUES (NEW.username, NEW.search_count, 1) "
+        "ON CONFLICT (username) DO UPDATE SET "
+        "routes_searched=routes_searched + excluded.routes_searched, "
+        "unique_routes_searched=unique_routes_searched + 1; "
+        "END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS user_stats_route_search_update AFTER "
+        "UPDATE OF search_count ON route_search "
+        "WHEN NEW.search_count != OLD.search_count BEGIN "
+        "UPDATE user_stats SET routes_searched=routes_searched "
+        "+ NEW.search_count - OLD.search_count WHERE username=NEW.username; "
+        "END;"
+    )
+
+
+def add_user_top_route(cur) -> None:
+    """
+    Adds each user's most searched routes, ordered by search count and then
+    how recently they were searched, which are kept up to date by triggers
+    on route_search.
+
+    Search counts and times only increase, so a route which drops out of a
+    user's top routes can only return when it's searched again, which the
+    triggers handle.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS user_top_route (username VARCHAR NOT NULL "
+        "REFERENCES account (username), route_id INTEGER NOT NULL "
+        "REFERENCES route (route_id), search_count INTEGER NOT NULL, "
+        "last_searched_epoch INTEGER NOT NULL, PRIMARY KEY (username, route_id));"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_top_route_username_rank "
+        "ON user_top_route (username, search_count DESC, "
+        "last_searched_epoch DESC);"
+    )
+    keep_top_routes = (
+        "INSERT INTO user_top_route VALUES (NEW.username, NEW.route_id, "
+        "NEW.search_count, COALESCE(NEW.last_searched_epoch, 0)) "
+        "ON CONFLICT (username, route_id) DO UPDATE SET "
+        "search_count=excluded.search_count, "
+        "last_searched_epoch=excluded.last_searched_epoch; "
+        "DELETE FROM user_top_route WHERE username=NEW.username "
+        "AND route_id NOT IN (SELECT route_id FROM user_top_route "
+        "WHERE username=NEW.username ORDER BY search_count DESC, "
+        f"last_searched_epoch DESC, route_id LIMIT {TOP_ROUTES_STORED});"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS user_top_route_insert AFTER INSERT ON "
+        f"route_search BEGIN {keep_top_routes} END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS user_top_route_update AFTER UPDATE OF "
+        "search_count, last_searched_epoch ON route_search BEGIN "
+        f"{keep_top_routes} END;"
+    )
+    cur.execute(
+        "INSERT OR REPLACE INTO user_top_route SELECT username, route_id, "
+        "search_count, COALESCE(last_searched_epoch, 0) FROM ("
+        "SELECT *, ROW_NUMBER() OVER (PARTITION BY username ORDER BY "
+        "search_count DESC, last_searched_epoch DESC, route_id) AS rank "
+        f"FROM route_search) WHERE rank <= {TOP_ROUTES_STORED};"
+    )
+
+
+def add_ev_catalog(cur) -> None:
+    """
+    Adds the catalog of electric cars, with their prices, efficiencies, and
+    ranges stored as numbers so they never need parsing again.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS ev_catalog (ev_id INTEGER PRIMARY KEY, "
+        "make VARCHAR NOT NULL, model VARCHAR NOT NULL, price REAL, "
+        "efficiency INTEGER NOT NULL, image VARCHAR NOT NULL, range_miles INTEGER, "
+        "fetched_at TIMESTAMP NOT NULL, UNIQUE (make, model));"
+    )
+
+
+def add_job_queue(cur) -> None:
+    """
+    Adds the queue of background jobs, and the dead letter table which jobs
+    are moved to once they've used every attempt.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS job (job_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "kind VARCHAR NOT NULL, payload TEXT NOT NULL, "
+        "status VARCHAR NOT NULL DEFAULT 'queued', "
+        "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+        "run_after REAL NOT NULL, locked_until REAL, last_error TEXT, "
+        "created_epoch REAL NOT NULL);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_job_status_run_after "
+        "ON job (status, run_after);"
+    )
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS job_dead_letter (job_id INTEGER PRIMARY KEY, "
+        "kind VARCHAR NOT NULL, payload TEXT NOT NULL, attempts INTEGER NOT NULL, "
+        "last_error TEXT, created_epoch REAL NOT NULL, failed_epoch REAL NOT NULL);"
+    )
+
+
+def queue_avatar_backfill(cur) -> None:
+    """
+    Queues the job which writes every size of the avatars uploaded before
+    avatars were processed, so that it only runs once.
+    """
+    cur.execute(
+        "INSERT INTO job (kind, payload, max_attempts, run_after, created_epoch) "
+        "VALUES ('backfill_avatars', '{}', 3, strftime('%s', 'now'), "
+        "strftime('%s', 'now'));"
+    )
+
+
+# The schema version after each migration is its position in the list.
+MIGRATIONS = [
+    add_fuel_price_and_emission_factor_tables,
+    add_query_indexes,
+    add_rating_summary,
+    add_user_stats,
+    add_epoch_columns,
+    add_route_search_event,
+    add_user_top_route,
+    add_ev_catalog,
+    add_job_queue,
+    queue_avatar_backfill,
+]
+
+
+def get_schema_version(conn) -> int:
+    """
+    Gets the version of the database schema.
+    """
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate(db_path: Optional[str] = None) -> int:
+    """
+    Applies the migrations which haven't been applied to the database yet.
+
+    Args:
+        db_path: The path to the database, which defaults to the main one.
+
+    Returns:
+        The version of the database schema after migrating.
+    """
+    conn = helper_database.open_connection(
+        db_path or helper_database.get_database_path()
+    )
+    try:
+        version = get_schema_version(conn)
+        for version, migration in enumerate(MIGRATIONS[version:], version + 1):
+            cur = conn.cursor()
+            cur.execute("BEGIN;")
+            try:
+                migration(cur)
+                # Pragmas can't take parameters, but the version is an int.
+                cur.execute(f"PRAGMA user_version={version};")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logging.info(f"Migrated database to version {version}")
+        return get_schema_version(conn)
+    finally:
+        conn.close()
@@ -2,10 +2,10 @@
 Helper functions for the user registration system and related functionality.
 """
 
-import sqlite3
 from typing import List, Tuple
 
 import bcrypt
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
 
 DB_PATH = helper_general.get_database_path()
@@ -55,7 +55,7 @@ def validate_registration(
         valid = False
 
     # Checks that the username hasn't already been registered.
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM account WHERE username=?;", (username,))
         if cur.fetchone() is not None:
@@ -124,7 +124,7 @@ def register_user(
         first_name: The first name input by the user in the form.
         last_name: The last name input by the user in the form.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         # Creates the user account in the database.
         cur.execute(
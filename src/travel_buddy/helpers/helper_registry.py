@@ -0,0 +1,105 @@
+"""
+Holds the process-wide configuration and API clients, so that API keys are
+only read once and connections are reused between requests.
+"""
+
+import logging
+import signal
+import threading
+from typing import Optional
+
+import googlemaps
+import requests
+import src.travel_buddy.helpers.helper_general as helper_general
+from requests.adapters import HTTPAdapter
+
+API_KEY_FILE = "keys.json"
+# The number of connections kept alive for each host.
+HTTP_POOL_SIZE = 20
+# Seconds to wait to connect to Google Maps, to wait for each read, and to
+# spend retrying a request in total.
+MAPS_CONNECT_TIMEOUT = 3.05
+MAPS_READ_TIMEOUT = 5
+MAPS_RETRY_TIMEOUT = 10
+
+
+class Registry:
+    """
+    Lazily loads the API keys and creates the shared API clients, which are
+    safe to use from multiple threads.
+    """
+
+    def __init__(self, key_file: str = API_KEY_FILE):
+        self.key_file = key_file
+        self._keys = None
+        self._maps_client = None
+        self._http_session = None
+        self._lock = threading.RLock()
+
+    def get_keys(self) -> dict:
+        """
+        Gets the decoded API keys, reading the key file on first use.
+        """
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self._keys = helper_general.get_keys(self.key_file)
+        return self._keys
+
+    def reload(self) -> None:
+        """
+        Reads the key file again, and recreates the Google Maps API client
+        with the new key when it's next used.
+        """
+        with self._lock:
+            self._keys = helper_general.get_keys(self.key_file)
+            self._maps_client = None
+        logging.info("Reloaded API keys")
+
+    def get_http_session(self) -> requests.Session:
+        """
+        Gets the shared HTTP session, which keeps connections alive between
+        requests to the same host.
+        """
+        if self._http_session is None:
+            with self._lock:
+                if self._http_session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._http_session = session
+        return self._http_session
+
+    def get_maps_client(self) -> Optional[googlemaps.Client]:
+        """
+        Gets the shared Google Maps API client, or None if it couldn't be
+        created.
+        """
+        if self._maps_client is None:
+            with self._lock:
+                if self._maps_client is None:
+                    try:
+                        self._maps_client = googlemaps.Client(
+                            self.get_keys()["google_maps"],
+                            requests_session=self.get_http_session(),
+                            connect_timeout=MAPS_CONNECT_TIMEOUT,
+                            read_timeout=MAPS_READ_TIMEOUT,
+                            retry_timeout=MAPS_RETRY_TIMEOUT,
+                        )
+                    except Exception as e:
+                        logging.warning(f"Failed to generate google maps client - {e}")
+        return self._maps_client
+
+    def install_reload_handler(self) -> None:
+        """
+        Reloads the API keys when the process receives SIGHUP, where the
+        platform supports it.
+        """
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload())
+
+
+registry = Registry()
@@ -1,30 +1,74 @@
+import atexit
 import logging
-import sqlite3
-from datetime import datetime, timedelta
-from time import sleep
-from typing import Tuple
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
 from flask import session
 import googlemaps
-import requests
+import src.travel_buddy.helpers.helper_cache as helper_cache
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_distance as helper_distance
+import src.travel_buddy.helpers.helper_emissions as helper_emissions
+import src.travel_buddy.helpers.helper_fuel as helper_fuel
 import src.travel_buddy.helpers.helper_general as helper_general
-from lxml import html
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+import src.travel_buddy.helpers.helper_singleflight as helper_singleflight
 
 DB_PATH = helper_general.get_database_path()
+# The maximum number of seconds a route analysis waits for its upstream calls.
+ROUTE_LOOKUP_BUDGET = 10
+# Shared between requests so that a slow upstream call never holds up the
+# response that started it - it simply finishes in the background.
+LOOKUP_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="lookup")
+route_cache = helper_cache.DistanceMatrixCache()
+# Collapses concurrent Distance Matrix lookups for the same route and mode.
+route_lookups = helper_singleflight.SingleFlight("route lookups")
+# The number of routes shown in the user's frequent routes.
+TOP_ROUTES_LIMIT = 5
+# How often (milliseconds) buffered route searches are recorded.
+ROUTE_SEARCH_FLUSH_INTERVAL = 500
 
 
-def get_most_frequent_route():
-    with sqlite3.connect(DB_PATH) as conn:
+def get_top_routes(username: str, limit: int = TOP_ROUTES_LIMIT) -> List[tuple]:
+    """
+    Gets the routes the user has searched the most, from the top routes
+    stored for each user.
+
+    Args:
+        username: The user to get the routes for.
+        limit: The maximum number of routes to get.
+
+    Returns:
+        A list of tuples containing the route ID, origin, destination, and
+        search count, ordered by search count and then the most recently
+        searched.
+    """
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            "SELECT route_id, origin, destination FROM route WHERE route_id=(SELECT route_id FROM route_search WHERE search_count=(SELECT MAX(search_count) FROM route_search WHERE username=?) AND username=?);",
-            (session["username"], session["username"]),
+            "SELECT t.route_id, r.origin, r.destination, t.search_count "
+            "FROM user_top_route t JOIN route r ON t.route_id = r.route_id "
+            "WHERE t.username=? ORDER BY t.search_count DESC, "
+            "t.last_searched_epoch DESC, t.route_id LIMIT ?;",
+            (username, limit),
         )
-        row = cur.fetchone()
-        return row
+        return cur.fetchall()
+
+
+def get_most_frequent_route(username: Optional[str] = None):
+    """
+    Gets the route the user has searched the most, or None if they haven't
+    searched any routes. The user defaults to the one logged in.
+    """
+    top_routes = get_top_routes(username or session["username"], 1)
+    return top_routes[0][:3] if top_routes else None
 
 
 def get_home_and_work():
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT home, work FROM profile WHERE username=?;", (session["username"],)
@@ -44,28 +88,254 @@ def generate_client(api_key: str) -> object:
         return None
 
 
-def run_api(map_client: object, origins: str, destinations: str, mode: str) -> dict:
+def run_api(
+    map_client: object,
+    origins: str,
+    destinations: str,
+    mode: str,
+    deadline: Optional[float] = None,
+    on_late_result: Optional[Callable[[dict], None]] = None,
+) -> dict:
     """
     Run Google Maps API using information on route origin, destination, and
     mode of transport.
 
+    The call fails straight away if the deadline (from time.monotonic) has
+    passed or Google Maps is unhealthy. A response which arrives after the
+    deadline is passed to on_late_result.
+
     Returns:
         API response as a dictionary of route data.
     """
     try:
-        response = map_client.distance_matrix(origins, destinations, mode=mode)
-        next_page_token = response.get("next_page_token")
-        while next_page_token:
-            sleep(2)
-            response = map_client.distance_matrix(origins, destinations, mode=mode)
-            next_page_token = response.get("next_page_token")
+        return helper_http.call(
+            "google_maps",
+            map_client.distance_matrix,
+            origins,
+            destinations,
+            mode=mode,
+            deadline=deadline,
+            on_late_result=on_late_result,
+        )
     except Exception as e:
         logging.warning(f"Api Error - {e}")
         return {}
 
+
+def get_route_data(
+    map_client: object,
+    origins: str,
+    destinations: str,
+    mode: str,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    Gets the route data from the cache if possible, otherwise runs the Google
+    Maps API and caches the result if it was successful.
+
+    Concurrent lookups for the same route and mode share a single API call.
+    If the cached result has expired, it's returned straight away, marked
+    with "stale", while it's refreshed in the background.
+
+    Returns:
+        API response as a dictionary of route data.
+    """
+    key = (
+        helper_cache.normalise_location(origins),
+        helper_cache.normalise_location(destinations),
+        mode,
+    )
+    entry = route_cache.get_entry(origins, destinations, mode)
+    if entry is not None:
+        response, is_stale = entry
+        if not is_stale:
+            return response
+        if map_client is not None:
+            LOOKUP_EXECUTOR.submit(
+                route_lookups.do,
+                key,
+                fetch_route_data,
+                map_client,
+                origins,
+                destinations,
+                mode,
+            )
+        return {**response, "stale": True}
+
+    return route_lookups.do(
+        key, fetch_route_data, map_client, origins, destinations, mode, deadline
+    )
+
+
+def fetch_route_data(
+    map_client: object,
+    origins: str,
+    destinations: str,
+    mode: str,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    Runs the Google Maps API and caches the result if it was successful,
+    including if it arrives after the deadline, so the next lookup for the
+    route doesn't call the API again.
+
+    Returns:
+        API response as a dictionary of route data.
+    """
+
+    def cache_response(response: dict) -> None:
+        if response.get("status") == "OK":
+            route_cache.set(origins, destinations, mode, response)
+
+    response = run_api(
+        map_client, origins, destinations, mode, deadline, cache_response
+    )
+    cache_response(response)
     return response
 
 
+def run_route_lookups(
+    map_client: object,
+    origins: str,
+    destinations: str,
+    modes: Iterable[str],
+    fuel_type: str,
+    engine_size: float,
+    budget: float = ROUTE_LOOKUP_BUDGET,
+) -> Tuple[dict, Optional[float], float]:
+    """
+    Runs the external lookups for a route analysis concurrently, rather than
+    one after another.
+
+    The Distance Matrix lookups for each mode and the fuel price lookup all
+    start at once, and the driving emissions lookup starts as soon as the
+    driving distance is known. Any lookup which hasn't finished within the
+    budget is given up on and replaced with the value used for a failure:
+    None for the fuel price, and -1 for the driving emissions, which are
+    also unknown if the driving distance is.
+
+    Args:
+        map_client: The Google Maps API client.
+        origins: The starting point of the route.
+        destinations: The end point of the route.
+        modes: The modes of transport to get route data for.
+        fuel_type: The fuel type of the user's car.
+        engine_size: The engine size of the user's car.
+        budget: The maximum number of seconds to wait for all the lookups.
+
+    Returns:
+        The API response for each mode of transport, the fuel price (£) per
+        litre or None if it's unavailable, and the CO2 emissions (kg) for
+        driving the route.
+    """
+    deadline = time.monotonic() + budget
+    route_futures = {
+        m: LOOKUP_EXECUTOR.submit(
+            get_route_data, map_client, origins, destinations, m, deadline
+        )
+        for m in modes
+    }
+    fuel_price_future = LOOKUP_EXECUTOR.submit(get_fuel_price, fuel_type)
+
+    # Chains the emissions lookup onto the driving lookup instead of holding a
+    # worker thread while waiting for it.
+    co2_future = Future()
+
+    def lookup_driving_co2(driving_future: Future) -> None:
+        try:
+            distance = safeget(
+                driving_future.result(),
+                "rows",
+                0,
+                "elements",
+                0,
+                "distance",
+                "value",
+            )
+            if distance is None:
+                co2_future.set_result(-1)
+                return
+            co2_future.set_result(
+                generate_co2_emissions(distance, "driving", fuel_type, engine_size)
+            )
+        except Exception as e:
+            co2_future.set_exception(e)
+
+    if "driving" in route_futures:
+        route_futures["driving"].add_done_callback(lookup_driving_co2)
+    else:
+        co2_future.set_result(0)
+
+    route_data = {
+        m: get_lookup_result(future, deadline, {}, f"route data ({m})")
+        for m, future in route_futures.items()
+    }
+    fuel_price = get_lookup_result(fuel_price_future, deadline, None, "fuel price")
+    driving_co2 = get_lookup_result(co2_future, deadline, -1, "driving CO2")
+    return route_data, fuel_price, driving_co2
+
+
+def fill_route_estimates(
+    route_data: dict,
+    origins: str,
+    destinations: str,
+    origin: helper_distance.Coordinates,
+    destination: helper_distance.Coordinates,
+) -> bool:
+    """
+    Replaces the route data of any mode whose lookup failed or ran out of
+    time with a local estimate from the coordinates, and records the others
+    to calibrate the estimates with.
+
+    Args:
+        route_data: The API response for each mode of transport, which is
+                    updated in place.
+        origins: The starting point of the route.
+        destinations: The end point of the route.
+        origin: The coordinates of the starting point.
+        destination: The coordinates of the end point.
+
+    Returns:
+        Whether any mode was estimated.
+    """
+    estimator = helper_distance.distance_estimator
+    estimated = False
+    for mode, response in route_data.items():
+        # Modes which Google Maps has no route for aren't estimated.
+        if response.get("status", "OK") != "OK" or not response.get("rows"):
+            route_data[mode] = estimator.estimate_response(
+                origin, destination, mode, origins, destinations
+            )
+            estimated = True
+    try:
+        estimator.record_samples(origins, destinations, origin, destination, route_data)
+    except Exception as e:
+        logging.warning(f"Failed to record distance samples - {e}")
+    return estimated
+
+
+def get_lookup_result(future: Future, deadline: float, default, name: str):
+    """
+    Waits for the result of a lookup until the deadline has passed.
+
+    Args:
+        future: The pending lookup.
+        deadline: The time (from time.monotonic) to stop waiting at.
+        default: The value to use if the lookup failed or ran out of time.
+        name: The name of the lookup for logging.
+
+    Returns:
+        The result of the lookup, or the default value.
+    """
+    try:
+        return future.result(timeout=max(0, deadline - time.monotonic()))
+    except TimeoutError:
+        logging.warning(f"Lookup for {name} exceeded the latency budget")
+    except Exception as e:
+        logging.warning(f"Lookup for {name} failed - {e}")
+    return default
+
+
 def safeget(dct: dict, *keys):
     """
     Safely gets key from possibly nested dictionary with error trapping and
@@ -114,15 +384,18 @@ def convert_gallons_to_litres(gallons: float) -> float:
     return gallons * 4.54609
 
 
-def calculate_total_fuel_cost(driving_distance, car_mpg, fuel_type):
+def calculate_total_fuel_cost(driving_distance, car_mpg, fuel_type, fuel_price=None):
     """
     Fetches the user's car information and calculates the fuel cost and
     consumption for the journey.
+
+    The fuel price is looked up unless it has already been fetched.
     """
     # initialise values to prevent crash later
     fuel_used_driving = 0
     fuel_cost_driving = 0.0
-    fuel_price = get_fuel_price(fuel_type)
+    if fuel_price is None:
+        fuel_price = get_fuel_price(fuel_type)
     if driving_distance is not None:
         driving_distance = float(driving_distance / 1000)
         distance_miles = convert_km_to_miles(driving_distance)
@@ -133,7 +406,8 @@ def calculate_total_fuel_cost(driving_distance, car_mpg, fuel_type):
 
 def get_fuel_price(fuel_type: str) -> float:
     """
-    Collects the current UK petrol or diesel prices from an online source.
+    Gets the latest UK petrol or diesel prices, which are kept up to date in
+    the background.
 
     Args:
         fuel_type: The type of fuel (petrol or diesel).
@@ -141,16 +415,7 @@ def get_fuel_price(fuel_type: str) -> float:
     Returns:
         The price (£) of petrol or diesel per litre.
     """
-    if fuel_type.lower() == "diesel":
-        url = "https://www.globalpetrolprices.com/United-Kingdom/diesel_prices/"
-    else:
-        url = "https://www.globalpetrolprices.com/United-Kingdom/gasoline_prices/"
-    page = requests.get(url)
-    tree = html.fromstring(page.content)
-    price = float(
-        tree.xpath('//*[@id="graphPageLeft"]/table/tbody/tr[1]/td[1]/text()')[0]
-    )
-    return price
+    return helper_fuel.fuel_prices.get_price(fuel_type)
 
 
 def calculate_fuel_used(distance_miles: float, mpg: float) -> float:
@@ -191,7 +456,7 @@ def get_car(username) -> Tuple[str, float, str, float]:
         car.
     """
     # Gets the user's details from the database.
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT make, mpg, fuel_type, engine_size FROM car WHERE owner=?;",
@@ -217,53 +482,19 @@ def get_distance_range(sorted_keys, details) -> str:
         return f"{lowest} - {highest}"
 
 
-def get_co2_emissions_from_api(payload: str, api_key: str) -> int:
-    """
-    Use derived emission query to find carbon emission data for route
-    """
-    url = "https://beta2.api.climatiq.io/estimate"
-    headers = {"Authorization": f"Bearer {api_key}"}
-
-    r = requests.post(url, headers=headers, json=payload)
-    return r.json()
-
-
 def generate_co2_emissions(
     distance: int, mode: str, fuel: str = "na", engine_size: float = -1
 ) -> float:
     """
-    Prepares data in format suitable for carbon emissions api to calculate and
-    returns carbon emission value.
+    Estimates the carbon emissions (kg) for the route from local emission
+    factors for the mode of transport.
     """
 
     if distance is None:
         return 0
 
-    file_name = "keys.json"
-    keys = helper_general.get_keys(file_name)
-
     if mode == "driving":
-        query = "passenger_vehicle-vehicle_type_car-fuel_source_"
-        if fuel in ("petrol", "diesel"):
-            query += fuel
-        else:
-            query += "na"
-        query += "-engine_size_"
-        # TODO: query fails with engine size specified - cannot find format to use
-        # if engine_size > 0:
-        #    query += str(engine_size)
-        # else:
-        query += "na"
-        query += "-vehicle_age_na-vehicle_weight_na"
-
-        payload = {
-            "emission_factor": query,
-            "parameters": {"distance": distance, "distance_unit": "m"},
-        }
-        carbon = get_co2_emissions_from_api(payload, keys["carbon_emissions"]).get(
-            "co2e", -1
-        )
-        return carbon
+        return helper_emissions.estimate_co2(distance, fuel, engine_size)
 
     elif mode == "public transport":
         """
@@ -330,7 +561,7 @@ def get_recommendations(
     route_details: dict,
     co2_list: dict,
     calories: dict,
-    fuel_cost: float,
+    fuel_cost: Optional[float],
     fuel_type: str,
 ) -> list:
     """
@@ -448,7 +679,8 @@ def get_recommendations(
         co2_excess_over_transit = round(
             co2_list["driving"] - co2_list["public transport"], 2
         )
-        cost = format(fuel_cost, ".2f")
+        # The fuel savings are left out if the fuel price is unavailable.
+        cost = format(fuel_cost, ".2f") if fuel_cost is not None else None
         walk_distance = safeget(route_details, "walking", "distance", "value")
         if walk_distance is not None:
             if walk_distance > 40000:
@@ -456,8 +688,8 @@ def get_recommendations(
                     body.append(
                         "Planning to drive? This is a long journey! If you could travel "
                         "with public transport instead you would save about "
-                        f"<b>{co2_excess_over_transit} kg</b> of CO2 as well as "
-                        f"<b>£{cost}</b> of fuel!"
+                        f"<b>{co2_excess_over_transit} kg</b> of CO2"
+                        + (f" as well as <b>£{cost}</b> of fuel!" if cost else "!")
                     )
 
             elif walk_distance > 20000:
@@ -468,11 +700,17 @@ def get_recommendations(
                         "transport instead of driving!"
                     )
                 body.append(append_cycle_walk_str(time_cycling, time_driving, "cycle"))
-                body[-1] += (
-                    f"you would save about <b>{co2_list['driving']} kg</b> of CO2 and "
-                    f"would save <b>£{cost}</b> of fuel, as well as burning about "
-                    f"<b>{calories['cycling']} kcal</b>!"
-                )
+                if cost:
+                    body[-1] += (
+                        f"you would save about <b>{co2_list['driving']} kg</b> of CO2 "
+                        f"and would save <b>£{cost}</b> of fuel, as well as burning "
+                        f"about <b>{calories['cycling']} kcal</b>!"
+                    )
+                else:
+                    body[-1] += (
+                        f"you would save about <b>{co2_list['driving']} kg</b> of CO2 "
+                        f"and would burn about <b>{calories['cycling']} kcal</b>!"
+                    )
 
             else:
                 extra_time = 60 * round((time_cycling - time_driving) / 60)
@@ -495,7 +733,7 @@ def get_recommendations(
                 trees = helper_general.co2_to_trees(
                     round(co2_list["driving"] * 40, 2), 30
                 )
-                cost = format((fuel_cost * 40), ".2f")
+                cost = format((fuel_cost or 0) * 40, ".2f")
                 print(float(trees), float(cost), round(co2_list["driving"] * 40, 2))
                 if (
                     float(trees) >= 1
@@ -510,7 +748,7 @@ def get_recommendations(
                         "trees offset in a month! "
                         "(<a href='https://www.viessmann.co.uk/heating-advice/how-much-co2-does-tree-absorb' target='_blank'>Source</a>)"
                     )
-            if fuel_type.lower() != "electric":
+            if fuel_type.lower() != "electric" and fuel_cost is not None:
                 body.append(
                     append_ev_recommendation(
                         safeget(route_details, "driving", "distance", "value"),
@@ -583,108 +821,114 @@ def append_ev_recommendation(distance, petrol_cost, petrol_co2) -> str:
 def save_route(username: str, origin: str, destination: str):
     """
     Save a specific route search to a user
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        route_id = get_route_id(conn, origin, destination)
-        if not route_id:
-            route_id = register_route(conn, origin, destination)
-            logging.debug(f"Registered new route with ID - {route_id}")
 
-        add_route_to_user(conn, username, route_id)
+    If the search buffer is running, the search is recorded in the background
+    so that it never delays the response.
+    """
+    event = (username, origin, destination, int(time.time()))
+    if not search_buffer.add(event):
+        record_route_searches([event])
 
 
-def get_route_id(conn, origin: str, destination: str) -> int:
+def record_route_searches(events: Iterable[Tuple[str, str, str, int]]) -> None:
     """
-    Get route ID if exists, else return None
+    Records route searches, each with a single insert into the
+    route_search_event view, which creates the route if needed and only
+    counts a repeated search once it's outside of the debounce window.
+
+    Args:
+        events: The username, origin, destination, and epoch of each search.
     """
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT route_id FROM route WHERE origin=? AND destination=?;",
-        (origin, destination),
-    )
-    id = cur.fetchone()
-    if id:
-        return id[0]
-    return None
+    with helper_database.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO route_search_event (username, origin, destination, "
+            "searched_epoch) VALUES (?, ?, ?, ?);",
+            events,
+        )
 
 
-def register_route(conn, origin: str, destination: str):
+class RouteSearchBuffer:
     """
-    Register a route in the databse
+    Buffers route searches in memory and records them in batches from a
+    background thread, so that requests don't wait for the database write.
+
+    Searches are only buffered while the buffer is running.
     """
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO route (origin, destination) VALUES (?, ?);",
-        (origin, destination),
-    )
-    conn.commit()
-    return get_route_id(conn, origin, destination)
 
+    def __init__(self, flush_interval: int = ROUTE_SEARCH_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._events = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
 
-def add_route_to_user(conn, username: str, route_id: int):
-    """
-    Increment count of searches for this route on a user,
-    or add a new row if the user has not searched this before
-    """
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT search_count, last_updated_timestamp FROM route_search "
-        "WHERE route_id=?;",
-        (route_id,),
-    )
-    route_search = cur.fetchone()
-    if route_search:
-        if datetime.strptime(
-            route_search[1], "%Y-%m-%d %H:%M:%S"
-        ) < datetime.now() - timedelta(minutes=5):
-            cur.execute(
-                "UPDATE route_search "
-                "SET search_count=?, last_searched_timestamp=CURRENT_TIMESTAMP, "
-                "last_updated_timestamp=CURRENT_TIMESTAMP "
-                "WHERE username=? AND route_id=?;",
-                (route_search[0] + 1, username, route_id),
-            )
-        else:
-            cur.execute(
-                "UPDATE route_search "
-                "SET last_searched_timestamp=CURRENT_TIMESTAMP "
-                "WHERE username=? AND route_id=?;",
-                (username, route_id),
-            )
-    else:
-        cur.execute(
-            "INSERT INTO route_search (username, route_id, search_count, "
-            "last_searched_timestamp, last_updated_timestamp) "
-            "VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP);",
-            (username, route_id, 1),
-        )
-        conn.commit()
+    def add(self, event: Tuple[str, str, str, int]) -> bool:
+        """
+        Adds a search to the buffer.
 
+        Args:
+            event: The username, origin, destination, and epoch of the search.
 
-def get_total_routes_searched(username: str) -> Tuple[int, int]:
-    """
-    Gets the number of routes searched by the user (unique and total).
-    Args:
-        username: The user to calculate the statistic for.
-    Returns:
-        The unique and total number of routes searched by the user.
-    """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        # Queries the total unique routes searched.
-        cur.execute(
-            "SELECT COUNT(route_id) FROM route_search WHERE username=?;",
-            (username,),
-        )
-        total_unique_routes_searched = cur.fetchone()[0]
-        # Prevents 0, None from being returned when there are no routes searched.
-        if total_unique_routes_searched == 0:
-            return 0, 0
+        Returns:
+            Whether the search was buffered, which it isn't if the buffer
+            isn't running.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        with self._lock:
+            self._events.append(event)
+        return True
 
-        # Queries the total number of routes searched.
-        cur.execute(
-            "SELECT SUM(search_count) FROM route_search WHERE username=?;",
-            (username,),
+    def flush(self) -> int:
+        """
+        Records the buffered searches in a single transaction. If that fails,
+        they're queued as a job, so they're retried rather than lost.
+
+        Returns:
+            The number of searches recorded.
+        """
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            try:
+                record_route_searches(events)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to record {len(events)} route searches, queueing "
+                    f"them to retry - {e}"
+                )
+                helper_jobs.job_queue.enqueue(
+                    "record_route_searches", {"events": events}
+                )
+        return len(events)
+
+    def start(self) -> None:
+        """
+        Starts the background thread which flushes the buffer.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="route-search-buffer", daemon=True
         )
-        total_routes_searched = cur.fetchone()[0]
-    return total_routes_searched, total_unique_routes_searched
+        self._thread.start()
+        # Records anything still buffered when the application exits.
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Stops the background thread once it has flushed the buffer.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval / 1000):
+            self.flush()
+        self.flush()
+
+
+search_buffer = RouteSearchBuffer()
+helper_jobs.job_queue.register("record_route_searches", record_route_searches)
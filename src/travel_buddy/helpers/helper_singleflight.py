@@ -0,0 +1,75 @@
+"""
+Helper functions for collapsing concurrent identical lookups into a single
+call, so that many users searching the same route at once don't each call
+the upstream API.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Runs at most one call at a time for each key.
+
+    Callers which ask for a key while a call for it is already in flight wait
+    for that call and share its result (or exception), rather than making
+    their own.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """
+        Calls the function, unless a call for the same key is in flight, in
+        which case its result is waited for instead.
+
+        Args:
+            key: Identifies calls which would give the same result.
+            fn: The function to call.
+            args: The positional arguments for the function.
+            kwargs: The keyword arguments for the function.
+
+        Returns:
+            The result of the function.
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def get_stats(self) -> dict:
+        """
+        Gets the number of calls made, and how many of them were collapsed
+        into a call which was already in flight.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._in_flight),
+            }
@@ -0,0 +1,212 @@
+"""
+Helper functions for the statistics shown on user profiles, which are stored
+per user and updated as carpools and route searches happen, rather than being
+recalculated every time a profile is viewed.
+"""
+
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+
+# The statistics stored for each user.
+# - Distances are in metres and CO2 is in kg.
+# - fuel_cost_saved is the stored fuel cost of completed rides, whereas
+#   unpriced_distance is the distance which is priced when it's displayed.
+USER_STATS_COLUMNS = (
+    "carpools_joined",
+    "carpools_driven",
+    "distance_carpooled",
+    "co2_saved",
+    "fuel_cost_saved",
+    "unpriced_distance",
+    "routes_searched",
+    "unique_routes_searched",
+)
+# Calculates the statistics of users from scratch, in the same order as
+# USER_STATS_COLUMNS.
+USER_STATS_QUERY = (
+    "SELECT a.username, "
+    "(SELECT COUNT(request_id) FROM carpool_request "
+    "WHERE requester=a.username AND journey_id IS NOT NULL), "
+    "(SELECT COUNT(journey_id) FROM carpool_ride "
+    "WHERE driver=a.username AND is_complete=1), "
+    "(SELECT TOTAL(distance) FROM carpool_ride "
+    "WHERE driver=a.username AND is_complete=1) + "
+    "(SELECT TOTAL(distance) FROM carpool_request "
+    "WHERE requester=a.username AND journey_id IS NOT NULL), "
+    "(SELECT TOTAL(estimate_co2_saved) FROM carpool_ride "
+    "WHERE driver=a.username AND is_complete=1) + "
+    "(SELECT TOTAL(estimate_co2_saved) FROM carpool_request "
+    "WHERE requester=a.username AND journey_id IS NOT NULL), "
+    "(SELECT TOTAL(fuel_cost) FROM carpool_ride WHERE driver=a.username "
+    "AND is_complete=1 AND seats_initial AND fuel_cost IS NOT NULL), "
+    "(SELECT TOTAL(distance) FROM carpool_ride WHERE driver=a.username "
+    "AND is_complete=1 AND seats_initial AND fuel_cost IS NULL) + "
+    "(SELECT TOTAL(distance) FROM carpool_request WHERE requester=a.username "
+    "AND journey_id IS NOT NULL AND num_passengers), "
+    "(SELECT TOTAL(search_count) FROM route_search WHERE username=a.username), "
+    "(SELECT COUNT(route_id) FROM route_search WHERE username=a.username) "
+    "FROM account a"
+)
+# The number of threads used to rebuild the statistics.
+REBUILD_WORKERS = 8
+# The most users whose statistics are calculated in one query, which keeps
+# the usernames bound to it under SQLite's limit on variables.
+MAX_QUERY_USERNAMES = 500
+
+
+def update_user_stats(cur, username: str, **changes: float) -> None:
+    """
+    Adds to the statistics of a user, creating their row if needed.
+
+    This should be called with the cursor that made the change, so that the
+    statistics are committed in the same transaction.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose statistics have changed.
+        changes: The amount to add to each statistic.
+    """
+    columns = [column for column in USER_STATS_COLUMNS if column in changes]
+    if len(columns) != len(changes):
+        raise ValueError(f"Unknown user statistics: {set(changes) - set(columns)}")
+    if not columns:
+        return
+    cur.execute(
+        f"INSERT INTO user_stats (username, {', '.join(columns)}) "
+        f"VALUES (?{', ?' * len(columns)}) ON CONFLICT (username) DO UPDATE SET "
+        + ", ".join(f"{column}={column} + excluded.{column}" for column in columns)
+        + ";",
+        (username, *[changes[column] for column in columns]),
+    )
+
+
+def get_user_stats(username: str) -> Dict[str, float]:
+    """
+    Gets the statistics of a user.
+
+    Args:
+        username: The user to get the statistics for.
+
+    Returns:
+        The value of each statistic, which are all 0 if the user has no
+        statistics yet.
+    """
+    with helper_database.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT {', '.join(USER_STATS_COLUMNS)} FROM user_stats WHERE username=?;",
+            (username,),
+        )
+        row = cur.fetchone()
+    return dict(zip(USER_STATS_COLUMNS, row or [0] * len(USER_STATS_COLUMNS)))
+
+
+def compute_user_stats(usernames: List[str], db_path: Optional[str] = None) -> list:
+    """
+    Calculates the statistics of users from scratch.
+
+    Args:
+        usernames: The users to calculate the statistics for.
+        db_path: The path to the database, which defaults to the main one.
+
+    Returns:
+        A list of tuples containing the username and each statistic.
+    """
+    conn = helper_database.get_connection(db_path)
+    cur = conn.cursor()
+    rows = []
+    for i in range(0, len(usernames), MAX_QUERY_USERNAMES):
+        chunk = usernames[i : i + MAX_QUERY_USERNAMES]
+        cur.execute(
+            f"{USER_STATS_QUERY} WHERE a.username IN ({', '.join('?' * len(chunk))});",
+            chunk,
+        )
+        rows.extend(cur.fetchall())
+    return rows
+
+
+def rebuild_one_user_stats(username: str, db_path: Optional[str] = None) -> None:
+    """
+    Recalculates the statistics of a user, in the same transaction as they're
+    written, so that no change made in between is lost.
+
+    Args:
+        username: The user whose statistics are rebuilt.
+        db_path: The path to the database, which defaults to the main one.
+    """
+    conn = helper_database.get_connection(db_path)
+    # Takes the write lock first, so the user's carpools and route searches
+    # can't change between reading and writing their statistics.
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        rows = compute_user_stats([username], db_path)
+        conn.execute("DELETE FROM user_stats WHERE username=?;", (username,))
+        conn.executemany(
+            f"INSERT INTO user_stats (username, {', '.join(USER_STATS_COLUMNS)}) "
+            f"VALUES (?{', ?' * len(USER_STATS_COLUMNS)});",
+            rows,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def rebuild_user_stats(
+    db_path: Optional[str] = None, workers: int = REBUILD_WORKERS
+) -> int:
+    """
+    Recalculates the statistics of every user, such as to repair them if they
+    no longer match the carpools and route searches.
+
+    The users are split between threads, and each user's statistics are
+    calculated and written in their own transaction.
+
+    Args:
+        db_path: The path to the database, which defaults to the main one.
+        workers: The number of threads to calculate the statistics with.
+
+    Returns:
+        The number of users whose statistics were rebuilt.
+    """
+    conn = helper_database.get_connection(db_path)
+    usernames = [row[0] for row in conn.execute("SELECT username FROM account;")]
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="user-stats"
+    ) as executor:
+        list(
+            executor.map(rebuild_one_user_stats, usernames, [db_path] * len(usernames))
+        )
+
+    with conn:
+        conn.execute(
+            "DELETE FROM user_stats WHERE username NOT IN (SELECT username FROM account);"
+        )
+    logging.info(f"Rebuilt statistics for {len(usernames)} users")
+    return len(usernames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manages the statistics of users.")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="recalculate the statistics of every user from scratch",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=REBUILD_WORKERS,
+        help="the number of threads to rebuild the statistics with",
+    )
+    args = parser.parse_args()
+    if args.rebuild:
+        print(
+            f"Rebuilt statistics for {rebuild_user_stats(workers=args.workers)} users."
+        )
+    else:
+        parser.print_help()
@@ -0,0 +1,233 @@
+"""
+Helper functions for projecting the fuel cost and CO2 emissions of cars over
+time, for many cars and time horizons at once.
+
+Projections are NumPy matrices with a row for each car and a column for each
+time horizon, calculated by broadcasting the monthly figures of every car
+against the horizons rather than looping over either.
+"""
+
+import functools
+from typing import NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import src.travel_buddy.helpers.helper_ev as helper_ev
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_routes as helper_routes
+
+# The time horizons (months) which projections are made for.
+HORIZONS = (1, 3, 6, 12, 60, 120)
+DEFAULT_MONTHLY_MILES = 1000
+MAX_MONTHLY_MILES = 20000
+METRES_PER_MILE = 1609
+# The most time horizons, and the longest (months), a comparison can be for.
+MAX_HORIZONS = 12
+MAX_HORIZON = 600
+# The number of monthly comparisons remembered.
+COMPARISON_CACHE_SIZE = 1024
+
+
+class Projection(NamedTuple):
+    """
+    The projected fuel cost (£) and CO2 emissions (kg) of each car (rows)
+    over each time horizon (columns).
+    """
+
+    costs: np.ndarray
+    co2: np.ndarray
+
+
+def parse_monthly_miles(value: Optional[str]) -> int:
+    """
+    Parses the monthly mileage chosen by the user.
+
+    Returns:
+        The mileage, or the default if it's missing or out of range.
+    """
+    try:
+        monthly_miles = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_MONTHLY_MILES
+    if not 0 < monthly_miles <= MAX_MONTHLY_MILES:
+        return DEFAULT_MONTHLY_MILES
+    return monthly_miles
+
+
+def parse_horizons(value: Optional[str]) -> Tuple[int, ...]:
+    """
+    Parses the time horizons (months) chosen by the user, given as a comma
+    separated list.
+
+    Returns:
+        The horizons, or the default horizons if any are invalid.
+    """
+    try:
+        horizons = tuple(int(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return HORIZONS
+    if not 0 < len(horizons) <= MAX_HORIZONS or not all(
+        0 < h <= MAX_HORIZON for h in horizons
+    ):
+        return HORIZONS
+    return horizons
+
+
+def project(
+    monthly_costs: Sequence[float],
+    monthly_co2: Sequence[float],
+    horizons: Sequence[int] = HORIZONS,
+) -> Projection:
+    """
+    Projects the monthly fuel cost and CO2 emissions of each car over each
+    time horizon.
+
+    Args:
+        monthly_costs: The monthly cost (£) of each car.
+        monthly_co2: The monthly CO2 emissions (kg) of each car.
+        horizons: The time horizons (months) to project over.
+
+    Returns:
+        The cost and CO2 emissions matrices, of shape (cars, horizons).
+    """
+    horizons = np.asarray(horizons, dtype=float)
+    return Projection(
+        np.asarray(monthly_costs, dtype=float)[:, np.newaxis] * horizons,
+        np.asarray(monthly_co2, dtype=float)[:, np.newaxis] * horizons,
+    )
+
+
+def project_evs(
+    efficiencies: Sequence[int],
+    monthly_miles: Union[float, Sequence[float]],
+    horizons: Sequence[int] = HORIZONS,
+) -> Projection:
+    """
+    Projects the electricity cost and CO2 emissions of electric cars.
+
+    Args:
+        efficiencies: The energy used (watt hours) per mile by each car.
+        monthly_miles: The miles driven each month, either by every car or
+            by each car.
+        horizons: The time horizons (months) to project over.
+
+    Returns:
+        The projected cost and CO2 emissions of each car over each horizon.
+    """
+    # A single mileage is broadcast to every car.
+    watt_hours = np.asarray(efficiencies, dtype=float) * np.asarray(
+        monthly_miles, dtype=float
+    )
+    return project(
+        watt_hours * helper_general.EV_PRICE_PER_WATT_HOUR,
+        watt_hours * helper_general.EV_CO2_PER_WATT_HOUR,
+        horizons,
+    )
+
+
+def project_fuel_car(
+    mpg: float,
+    fuel_price: float,
+    fuel_type: str,
+    engine_size: float,
+    monthly_miles: float,
+    horizons: Sequence[int] = HORIZONS,
+) -> Projection:
+    """
+    Projects the fuel cost and CO2 emissions of a petrol or diesel car.
+
+    Args:
+        mpg: The miles per gallon of the car.
+        fuel_price: The price (£) of its fuel per litre.
+        fuel_type: The fuel type of the car.
+        engine_size: The engine size (litres) of the car.
+        monthly_miles: The miles driven each month.
+        horizons: The time horizons (months) to project over.
+
+    Returns:
+        The projected cost and CO2 emissions of the car over each horizon, as
+        a single row.
+    """
+    fuel_used = helper_routes.calculate_fuel_used(monthly_miles, mpg) if mpg else 0
+    return project(
+        [helper_routes.calculate_fuel_cost(fuel_used, fuel_price)],
+        [
+            helper_routes.generate_co2_emissions(
+                METRES_PER_MILE * monthly_miles, "driving", fuel_type, engine_size
+            )
+        ],
+        horizons,
+    )
+
+
+@functools.lru_cache(maxsize=COMPARISON_CACHE_SIZE)
+def compare_monthly(
+    car: helper_ev.ElectricCar,
+    mpg: float,
+    fuel_type: str,
+    engine_size: float,
+    monthly_miles: int,
+    fuel_price: float,
+) -> Tuple[float, float, float, float]:
+    """
+    Calculates the monthly cost and CO2 emissions of an electric car and of
+    the user's car, remembering the most recent comparisons.
+
+    The fuel price is part of the key so that comparisons are recalculated
+    when it changes.
+
+    Returns:
+        The monthly cost and CO2 emissions of the electric car, and then of
+        the user's car.
+    """
+    ev = project_evs([car.efficiency], monthly_miles, (1,))
+    user = project_fuel_car(
+        mpg, fuel_price, fuel_type, engine_size, monthly_miles, (1,)
+    )
+    return (
+        float(ev.costs[0, 0]),
+        float(ev.co2[0, 0]),
+        float(user.costs[0, 0]),
+        float(user.co2[0, 0]),
+    )
+
+
+def compare_ev(
+    car: helper_ev.ElectricCar,
+    mpg: float,
+    fuel_type: str,
+    engine_size: float,
+    monthly_miles: int,
+    horizons: Sequence[int] = HORIZONS,
+) -> dict:
+    """
+    Compares the projected cost and CO2 emissions of an electric car with
+    the user's car.
+
+    Args:
+        car: The electric car from the catalog.
+        mpg: The miles per gallon of the user's car.
+        fuel_type: The fuel type of the user's car.
+        engine_size: The engine size (litres) of the user's car.
+        monthly_miles: The miles driven each month.
+        horizons: The time horizons (months) to project over.
+
+    Returns:
+        The cost (£) and CO2 emissions (kg) of each car over each horizon.
+    """
+    ev_cost, ev_co2, user_cost, user_co2 = compare_monthly(
+        car,
+        mpg,
+        fuel_type,
+        engine_size,
+        monthly_miles,
+        helper_routes.get_fuel_price(fuel_type),
+    )
+    projection = project([ev_cost, user_cost], [ev_co2, user_co2], horizons)
+    costs = np.round(projection.costs, 2).tolist()
+    co2 = np.round(projection.co2, 2).tolist()
+    return {
+        "monthly_miles": monthly_miles,
+        "horizons": list(horizons),
+        "ev": {"costs": costs[0], "co2": co2[0]},
+        "user": {"costs": costs[1], "co2": co2[1]},
+    }
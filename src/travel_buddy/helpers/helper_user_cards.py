@@ -0,0 +1,138 @@
+"""
+Helper functions for loading the details shown on user cards (avatar,
+verified badge, and rating) for many users at once, rather than querying the
+database once per user.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import src.travel_buddy.helpers.helper_database as helper_database
+from flask import g, has_app_context
+
+# The number of user cards kept between requests, and how long (seconds) they
+# stay fresh - ratings change without the user editing their profile.
+USER_CARD_CACHE_SIZE = 512
+USER_CARD_TTL = 60
+
+
+class UserCard(NamedTuple):
+    """
+    The details shown alongside a user's name.
+    """
+
+    avatar: str
+    verified: bool
+    rating_average: float
+    rating_count: int
+
+
+class UserCardLoader:
+    """
+    Loads user cards in a single query for each set of users.
+
+    Cards are remembered for the rest of the request, and the most recently
+    used cards are kept between requests until they expire or the user
+    changes their profile.
+    """
+
+    def __init__(
+        self, max_entries: int = USER_CARD_CACHE_SIZE, ttl: float = USER_CARD_TTL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_memo(self) -> dict:
+        """
+        Gets the cards already loaded for the current request.
+        """
+        if has_app_context():
+            return g.setdefault("user_cards", {})
+        return {}
+
+    def load(self, usernames: Iterable[str]) -> Dict[str, UserCard]:
+        """
+        Gets the cards of users, querying the database at most once for the
+        users which aren't cached.
+
+        Args:
+            usernames: The users to get the cards for.
+
+        Returns:
+            The card of each user, keyed by username. Users who don't exist
+            are left out.
+        """
+        memo = self._get_memo()
+        cards = {}
+        missing = set()
+        now = time.monotonic()
+        with self._lock:
+            for username in set(usernames):
+                if username in memo:
+                    cards[username] = memo[username]
+                elif username in self._cache and now < self._cache[username][1]:
+                    self._cache.move_to_end(username)
+                    cards[username] = self._cache[username][0]
+                else:
+                    missing.add(username)
+
+        if missing:
+            conn = helper_database.get_connection()
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT p.username, p.photo, p.verified, "
+                "COALESCE(r.rating_average, 0), COALESCE(r.rating_count, 0) "
+                "FROM profile p LEFT JOIN rating_summary r "
+                "ON p.username = r.username "
+                f"WHERE p.username IN ({', '.join('?' * len(missing))});",
+                list(missing),
+            )
+            loaded = {
+                row[0]: UserCard(row[1], row[2] == 1, row[3], row[4])
+                for row in cur.fetchall()
+            }
+            with self._lock:
+                for username, card in loaded.items():
+                    self._cache[username] = (card, now + self.ttl)
+                    self._cache.move_to_end(username)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            cards.update(loaded)
+
+        memo.update(cards)
+        return cards
+
+    def load_one(self, username: str) -> Optional[UserCard]:
+        """
+        Gets the card of a user, or None if the user doesn't exist.
+        """
+        return self.load([username]).get(username)
+
+    def prime(self, cards: Dict[str, UserCard]) -> None:
+        """
+        Remembers cards which were loaded by another query for the rest of
+        the request.
+        """
+        self._get_memo().update(cards)
+
+    def invalidate(self, username: str) -> None:
+        """
+        Forgets the card of a user, such as after they change their profile.
+        """
+        with self._lock:
+            self._cache.pop(username, None)
+        self._get_memo().pop(username, None)
+
+    def clear(self) -> None:
+        """
+        Forgets every cached card.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+user_cards = UserCardLoader()
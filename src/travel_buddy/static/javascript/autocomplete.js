@@ -1,3 +1,26 @@
+/**
+ * Stores the coordinates of the chosen place in the hidden input with the
+ * given ID (if the page has one), or clears them.
+ */
+function setCoordinates(id, place) {
+  const coords = document.getElementById(id);
+  if (!coords) {
+    return;
+  }
+  if (place && place.geometry && place.geometry.location) {
+    coords.value = place.geometry.location.lat() + "," + place.geometry.location.lng();
+  } else {
+    coords.value = "";
+  }
+}
+
+/**
+ * Clears the stored coordinates when the user types a different place.
+ */
+function clearCoordinatesOnInput(input, id) {
+  input.addEventListener("input", () => setCoordinates(id, null));
+}
+
 function initMap() {
     const map = new google.maps.Map(document.getElementById("map"), {
       center: { lat: 50.7184, lng: 3.5339 },
@@ -14,6 +37,8 @@ function initMap() {
   
     const autocomplete1 = new google.maps.places.Autocomplete(input1, options);
     const autocomplete2 = new google.maps.places.Autocomplete(input2, options);
+    clearCoordinatesOnInput(input1, "coords-1");
+    clearCoordinatesOnInput(input2, "coords-2");
   
     autocomplete1.bindTo("bounds", map);
     autocomplete2.bindTo("bounds", map);
@@ -28,6 +53,7 @@ function initMap() {
       marker.setVisible(false);
 
       const place = autocomplete1.getPlace();
+      setCoordinates("coords-1", place);
   
       if (!place.geometry || !place.geometry.location) {
         window.alert("No details available for input: '" + place.name + "'. A close match will be displayed.");
@@ -51,6 +77,7 @@ function initMap() {
       marker.setVisible(false);
   
       const place = autocomplete2.getPlace();
+      setCoordinates("coords-2", place);
   
       if (!place.geometry || !place.geometry.location) {
         // User entered the name of a Place that was not suggested and
@@ -87,10 +114,13 @@ function autocomplete_no_map() {
 
   const autocomplete1 = new google.maps.places.Autocomplete(input1, options);
   const autocomplete2 = new google.maps.places.Autocomplete(input2, options);
+  clearCoordinatesOnInput(input1, "coords-1");
+  clearCoordinatesOnInput(input2, "coords-2");
 
   autocomplete1.addListener("place_changed", () => {
 
     const place = autocomplete1.getPlace();
+    setCoordinates("coords-1", place);
 
     if (!place.geometry || !place.geometry.location) {
       window.alert("No details available for input: '" + place.name + "'. A close match will be displayed.");
@@ -102,6 +132,7 @@ function autocomplete_no_map() {
   autocomplete2.addListener("place_changed", () => {
 
     const place = autocomplete2.getPlace();
+    setCoordinates("coords-2", place);
 
     if (!place.geometry || !place.geometry.location) {
       // User entered the name of a Place that was not suggested and
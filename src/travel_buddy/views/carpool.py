@@ -5,12 +5,15 @@ of carpools participated in.
 """
 
 import src.travel_buddy.helpers.helper_carpool as helper_carpool
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_distance as helper_distance
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_registry as helper_registry
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
 
 from flask import Blueprint, redirect, render_template, request, session
 from src.travel_buddy.helpers.helper_limiter import limiter
 
-import sqlite3
 
 carpool_blueprint = Blueprint(
     "carpool", __name__, static_folder="static", template_folder="templates"
@@ -36,29 +39,28 @@ def show_available_carpools():
         return redirect("/")
 
     autocomplete_query = helper_general.get_autocomplete_query(
-        filename="keys.json", func="autocomplete_no_map"
+        key=helper_registry.registry.get_keys().get("google_maps"),
+        func="autocomplete_no_map",
     )
 
     interested_list = helper_carpool.get_user_interested_carpools(session["username"])
 
+    after = helper_carpool.decode_carpool_cursor(request.args.get("after"))
+    page_size = request.args.get("limit", helper_carpool.CARPOOL_PAGE_SIZE, type=int)
+
     if request.method == "GET":
-        incomplete_carpools = [
-            list(c) for c in helper_carpool.get_incomplete_carpools()
-        ]
-        for i, c in enumerate(incomplete_carpools):
-            incomplete_carpools[i][6] = format(c[6], ".2f")
-            start_time_obj = helper_carpool.get_datetime_obj(c[5])
-            incomplete_carpools[i][5] = helper_carpool.format_start_time(start_time_obj)
-            incomplete_carpools[i].append(
-                helper_carpool.get_end_time(
-                    helper_carpool.get_end_time_obj(start_time_obj, c[10])
-                )
-            )
+        incomplete_carpools, next_cursor = helper_carpool.get_incomplete_carpools(
+            after, page_size
+        )
 
         return render_template(
             "carpools.html",
             username=session.get("username"),
-            carpools=incomplete_carpools,
+            carpools=helper_carpool.format_carpool_listings(incomplete_carpools),
+            user_cards=helper_user_cards.user_cards.load(
+                c[1] for c in incomplete_carpools
+            ),
+            next_cursor=next_cursor,
             autocomplete_query=autocomplete_query,
             interested_list=interested_list,
         )
@@ -66,21 +68,17 @@ def show_available_carpools():
     if request.method == "POST":
         starting_point = request.form["location-from"].strip()
         destination = request.form["location-to"].strip()
+        start_coords = helper_distance.parse_coordinates(
+            request.form.get("location-from-coords")
+        )
+        end_coords = helper_distance.parse_coordinates(
+            request.form.get("location-to-coords")
+        )
         # Converts from date string input to date object.
         pickup_datetime = helper_general.string_to_date(request.form["date-from"])
         price = int(request.form["price"])
         description = request.form["description"]
         num_seats = int(request.form["seats"])
-        (
-            distance,
-            distance_text,
-            duration,
-            duration_text,
-            co2_pp,
-            co2_saved,
-        ) = helper_carpool.estimate_carpool_details(
-            starting_point, destination, num_seats + 1, "keys.json"
-        )
 
         valid, errors = helper_carpool.validate_carpool_ride(
             session["username"],
@@ -90,24 +88,26 @@ def show_available_carpools():
             pickup_datetime,
             price,
             description,
-            distance,
-            duration,
-            co2_saved,
         )
-        incomplete_carpools = helper_carpool.get_incomplete_carpools()
+        incomplete_carpools, next_cursor = helper_carpool.get_incomplete_carpools(
+            after, page_size
+        )
 
-        # Displays errors if the submitted carpool ride is invalid.
+        # Estimates the route once the rest of the ride is valid, and rejects
+        # rides whose route can't be found or estimated.
         if valid:
-            (
-                distance,
-                distance_text,
-                duration,
-                duration_text,
-                co2_pp,
-                co2_saved,
-            ) = helper_carpool.estimate_carpool_details(
-                starting_point, destination, num_seats + 1, "keys.json"
+            details = helper_carpool.estimate_carpool_details(
+                starting_point, destination, num_seats + 1, start_coords, end_coords
             )
+            if details[0] is None:
+                valid = False
+                errors.append(
+                    "We couldn't find a driving route between the starting point "
+                    "and the destination."
+                )
+
+        # Displays errors if the submitted carpool ride is invalid.
+        if valid:
             helper_carpool.add_carpool_ride(
                 session["username"],
                 num_seats,
@@ -116,19 +116,18 @@ def show_available_carpools():
                 pickup_datetime,
                 price,
                 description,
-                distance,
-                distance_text,
-                duration,
-                duration_text,
-                co2_pp,
-                co2_saved,
+                *details,
             )
             return redirect("/carpools")
         return render_template(
             "carpools.html",
             username=session.get("username"),
             errors=errors,
-            carpools=incomplete_carpools,
+            carpools=helper_carpool.format_carpool_listings(incomplete_carpools),
+            user_cards=helper_user_cards.user_cards.load(
+                c[1] for c in incomplete_carpools
+            ),
+            next_cursor=next_cursor,
             autocomplete_query=autocomplete_query,
             interested_list=interested_list,
         )
@@ -149,7 +148,7 @@ def toggle_carpool_interest(id):
     if "username" not in session:
         return "null"
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM carpool_interest WHERE journey_id=?", (id,))
         interested = cursor.fetchone()
@@ -180,72 +179,53 @@ def view_carpool_journey(journey_id: int):
     Returns:
         The web page for viewing the selected carpool journey.
     """
-    carpool_details = helper_carpool.get_carpool_details(journey_id)
+    carpool = helper_carpool.get_carpool_detail(journey_id)
 
     # Gets the carpool details if the journey ID exists, otherwise returns
     # an error.
-    if not carpool_details:
+    if carpool is None:
         session["error"] = "Carpool journey does not exist."
         return render_template("view_carpool.html")
 
-    (
-        driver,
-        is_complete,
-        seats_initial,
-        seats_available,
-        starting_point,
-        destination,
-        pickup_datetime,
-        price,
-        description,
-        distance_text,
-        duration,
-        duration_text,
-        co2_pp,
-        co2_saved,
-    ) = carpool_details
-
-    pickup_datetime_obj = helper_carpool.get_datetime_obj(pickup_datetime)
+    pickup_datetime_obj = carpool.pickup_datetime
     if 4 <= pickup_datetime_obj.day <= 20 or 24 <= pickup_datetime_obj.day <= 30:
         suffix = "th"
     else:
         suffix = ["st", "nd", "rd"][pickup_datetime_obj.day % 10 - 1]
-    end_datetime = helper_carpool.get_end_time_obj(pickup_datetime_obj, duration)
+    end_datetime = helper_carpool.get_end_time_obj(
+        pickup_datetime_obj, carpool.duration
+    )
     end_hour, end_minute = end_datetime.hour, end_datetime.minute
     pickup_datetime = pickup_datetime_obj.strftime(
         f"%e{suffix} %B %Y %H:%M - {end_hour}:{end_minute}"
     )
 
     # Displays price with two decimal places.
-    price = format(price, ".2f")
-
-    # Gets the list of passengers for the carpool.
-    passenger_list = helper_carpool.get_passenger_list(journey_id)
-
-    average_rating, total_ratings = helper_general.get_user_rating(driver)
+    price = format(carpool.price, ".2f")
 
     return render_template(
         "view_carpool.html",
         username=session.get("username"),
-        driver=driver,
-        is_complete=is_complete,
-        seats_initial=seats_initial,
-        seats_available=seats_available,
-        starting_point=starting_point,
-        destination=destination,
+        driver=carpool.driver,
+        is_complete=carpool.is_complete,
+        seats_initial=carpool.seats_initial,
+        seats_available=carpool.seats_available,
+        starting_point=carpool.starting_point,
+        destination=carpool.destination,
         pickup_datetime=pickup_datetime,
         price=price,
-        description=description,
-        distance_text=distance_text,
-        duration_text=duration_text,
-        co2_pp=co2_pp,
-        co2_saved=co2_saved,
-        passenger_list=passenger_list,
+        description=carpool.description,
+        distance_text=carpool.distance_text,
+        duration_text=carpool.duration_text,
+        co2_pp=carpool.co2_pp,
+        co2_saved=carpool.co2_saved,
+        passengers=carpool.passengers,
         journey_id=journey_id,
-        avatar=helper_general.get_user_avatar(driver),
-        rating_average=average_rating,
-        rating_count=total_ratings,
-        icons=helper_carpool.get_icons(description),
+        avatar=carpool.driver_card.avatar,
+        is_verified=carpool.driver_card.verified,
+        rating_average=carpool.driver_card.rating_average,
+        rating_count=carpool.driver_card.rating_count,
+        icons=helper_carpool.get_icons(carpool.description),
     )
 
 
@@ -275,3 +255,29 @@ def join_carpool_journey(journey_id: int):
     helper_carpool.add_passenger_to_carpool_journey(journey_id, username)
 
     return redirect("/carpools/{journey_id}/")
+
+
+@carpool_blueprint.route("/carpools/<journey_id>/complete", methods=["POST"])
+@limiter.limit("15/minute")
+def complete_carpool_journey(journey_id: int):
+    """
+    Marks the carpool journey as complete, if the user is its driver.
+
+    Args:
+        journey_id: The unique identifier for the selected carpool.
+
+    Returns:
+        Redirection to the updated view of the carpool journey.
+    """
+    if "username" not in session:
+        return redirect("/")
+
+    carpool_details = helper_carpool.get_carpool_details(journey_id)
+    if not carpool_details:
+        session["error"] = "Carpool journey does not exist."
+    elif carpool_details[0] != session["username"]:
+        session["error"] = "Only the driver can complete this carpool."
+    elif not carpool_details[1]:
+        helper_carpool.complete_carpool_ride(journey_id)
+
+    return redirect(f"/carpools/{journey_id}")
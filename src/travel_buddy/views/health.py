@@ -0,0 +1,42 @@
+"""
+Handles the view for checking the health of the external services the
+application depends on, and how well their results are being reused.
+"""
+
+import src.travel_buddy.helpers.helper_fuel as helper_fuel
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_routes as helper_routes
+from flask import Blueprint
+from src.travel_buddy.helpers.helper_limiter import limiter
+
+health_blueprint = Blueprint(
+    "health", __name__, static_folder="static", template_folder="templates"
+)
+
+
+@health_blueprint.route("/health", methods=["GET"])
+@limiter.limit("60/minute")
+def health():
+    """
+    Shows the circuit state and call counts of each external service, how
+    many lookups were collapsed into one already in flight, and the hit rate
+    of the route cache.
+
+    Returns:
+        The health of each service as JSON, with a 503 status if any of their
+        circuits are open.
+    """
+    dependencies = helper_http.get_health()
+    healthy = all(
+        stats["state"] != helper_http.CircuitBreaker.OPEN
+        for stats in dependencies.values()
+    )
+    return {
+        "healthy": healthy,
+        "dependencies": dependencies,
+        "collapsed_lookups": {
+            "route_lookups": helper_routes.route_lookups.get_stats(),
+            "fuel_price_scrapes": helper_fuel.fuel_prices.scrapes.get_stats(),
+        },
+        "route_cache": helper_routes.route_cache.get_stats(),
+    }, 200 if healthy else 503
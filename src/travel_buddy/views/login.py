@@ -2,8 +2,7 @@
 Handles the view for the user login system and related functionality.
 """
 
-import sqlite3
-
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
 import src.travel_buddy.helpers.helper_login as helper_login
 from flask import Blueprint, redirect, render_template, request, session
@@ -47,7 +46,7 @@ def login() -> object:
     username = request.form["username"].lower()
     password = request.form["password"]
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         # Gets user from database using username.
         cur.execute("SELECT password FROM account WHERE username=?;", (username,))
@@ -2,13 +2,13 @@
 Handles the view for user profiles and related functionality.
 """
 
-import sqlite3
 from typing import List, Tuple
 from datetime import datetime
 
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
 import src.travel_buddy.helpers.helper_carpool as helper_carpool
-import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_stats as helper_stats
 from flask import Blueprint, redirect, render_template, request, session
 from src.travel_buddy.helpers.helper_limiter import limiter
 
@@ -27,7 +27,6 @@ def my_profile() -> object:
         Redirection to their profile if they're logged in.
     """
     if "username" in session:
-        helper_general.get_electric_cars()
         return redirect("/profile/" + session["username"])
 
     return redirect("/")
@@ -53,7 +52,7 @@ def profile(username: str) -> object:
     message = []
 
     # Gets the user's details from the database.
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         profile_data, message = get_profile(conn, username, message)
         if message:
             # TODO: Add HTML template for error page.
@@ -66,15 +65,18 @@ def profile(username: str) -> object:
     else:
         suffix = ["st", "nd", "rd"][join_date.day % 10 - 1]
     join_date = join_date.strftime(f"%e{suffix} %B %Y")
-    carpools_joined = helper_carpool.get_total_carpools_joined(username)
-    carpools_driven = helper_carpool.get_total_carpools_drove(username)
-    distance_travelled = helper_carpool.get_total_distance_carpooled(username)
-    co2_saved = helper_carpool.get_total_co2_saved(username)
-    fuel_money_saved = helper_carpool.get_money_saved(username)
-    tree_offset = helper_general.co2_to_trees(co2_saved, 365)
-    routes_searched, unique_routes_searched = helper_routes.get_total_routes_searched(
-        username
+    # The statistics are kept up to date as they change, so are read at once.
+    stats = helper_stats.get_user_stats(username)
+    carpools_joined = stats["carpools_joined"]
+    carpools_driven = stats["carpools_driven"]
+    distance_travelled = round(stats["distance_carpooled"] / 1000, 2)
+    co2_saved = round(stats["co2_saved"], 2)
+    fuel_money_saved = helper_carpool.price_money_saved(
+        username, stats["fuel_cost_saved"], stats["unpriced_distance"]
     )
+    tree_offset = helper_general.co2_to_trees(co2_saved, 365)
+    routes_searched = stats["routes_searched"]
+    unique_routes_searched = stats["unique_routes_searched"]
 
     return render_template(
         "profile.html",
@@ -4,7 +4,9 @@ Handles the view for the route details check functionality
 
 import logging
 
+import src.travel_buddy.helpers.helper_distance as helper_distance
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_registry as helper_registry
 import src.travel_buddy.helpers.helper_routes as helper_routes
 from flask import Blueprint, render_template, request, session, redirect
 from src.travel_buddy.helpers.helper_limiter import limiter
@@ -27,8 +29,7 @@ def routes() -> object:
     if "username" not in session:
         return redirect("/")
 
-    api_key_file = "keys.json"
-    keys = helper_general.get_keys(api_key_file)
+    keys = helper_registry.registry.get_keys()
     autocomplete_query = helper_general.get_autocomplete_query(
         key=keys["google_maps"], func="initMap"
     )
@@ -38,12 +39,12 @@ def routes() -> object:
             f"https://www.google.com/maps/embed/v1/view"
             f"?key={keys['google_maps']}&center=50.9,-1.4&zoom=8"
         )
-        most_frequent_route = helper_routes.get_most_frequent_route()
+        frequent_routes = helper_routes.get_top_routes(session["username"])
         home_and_work = helper_routes.get_home_and_work()
         return render_template(
             "routes.html",
             username=session.get("username"),
-            most_frequent_route=most_frequent_route,
+            frequent_routes=frequent_routes,
             map_query=map_query,
             autocomplete_query=autocomplete_query,
             route_exists=False,
@@ -54,6 +55,14 @@ def routes() -> object:
         origins = request.form["start_point"].strip()
         destinations = request.form["destination"].strip()
         travel_mode_full = request.form["mode"]
+        # Coordinates from the autocomplete, used to estimate routes locally
+        # if the lookups fail.
+        origin_coords = helper_distance.parse_coordinates(
+            request.form.get("start_coords")
+        )
+        destination_coords = helper_distance.parse_coordinates(
+            request.form.get("destination_coords")
+        )
 
         if travel_mode_full == "bicycling":
             travel_mode_simple = "cycling"
@@ -64,18 +73,44 @@ def routes() -> object:
 
         # Generates the Google Maps API client to get data on routes using
         # different modes of transport.
-        map_client = helper_routes.generate_client(keys["google_maps"])
+        # Cached routes are still shown if the client can't be generated.
+        map_client = helper_registry.registry.get_maps_client()
         if map_client is None:
-            # TODO error
-            logging.warning(f"Failed to generate maps api client")
-            return
+            logging.warning("Failed to generate maps api client")
         modes = ("walking", "driving", "bicycling", "transit")
 
-        # Gets the distances and durations for each mode of transport.
-        route_data = {
-            m: helper_routes.run_api(map_client, origins, destinations, m)
-            for m in modes
-        }
+        car_make, car_mpg, fuel_type, engine_size = helper_routes.get_car(
+            session["username"]
+        )
+
+        # Gets the distances and durations for each mode of transport, along
+        # with the fuel price and driving emissions, in parallel.
+        route_data, fuel_price, driving_co2 = helper_routes.run_route_lookups(
+            map_client, origins, destinations, modes, fuel_type, engine_size
+        )
+        estimated = False
+        if origin_coords and destination_coords:
+            estimated = helper_routes.fill_route_estimates(
+                route_data, origins, destinations, origin_coords, destination_coords
+            )
+            if driving_co2 < 0 and route_data["driving"].get("estimated"):
+                driving_co2 = helper_routes.generate_co2_emissions(
+                    helper_routes.safeget(
+                        route_data,
+                        "driving",
+                        "rows",
+                        0,
+                        "elements",
+                        0,
+                        "distance",
+                        "value",
+                    ),
+                    "driving",
+                    fuel_type,
+                    engine_size,
+                )
+        # Expired route data is shown while it's refreshed in the background.
+        out_of_date = any(data.get("stale") for data in route_data.values())
         details = {
             "origin": helper_routes.safeget(
                 route_data, "walking", "origin_addresses", 0
@@ -158,30 +193,28 @@ def routes() -> object:
             details, "modes", "driving", "distance", "value"
         )
 
-        car_make, car_mpg, fuel_type, engine_size = helper_routes.get_car(
-            session["username"]
-        )
-
-        (
-            fuel_used_driving,
-            fuel_cost_driving,
-            fuel_price,
-        ) = helper_routes.calculate_total_fuel_cost(
-            driving_distance, car_mpg, fuel_type
+        # The fuel cost is unknown if the fuel price was unavailable.
+        fuel_used_driving, fuel_cost_driving, _ = (
+            helper_routes.calculate_total_fuel_cost(
+                driving_distance, car_mpg, fuel_type, fuel_price or 0
+            )
         )
+        if fuel_price is None:
+            fuel_cost_driving = None
 
         fuel_used = fuel_used_driving if travel_mode_full == "driving" else 0
         fuel_cost = fuel_cost_driving if travel_mode_full == "driving" else 0
 
         # Finds carbon emissions for each mode.
         co2_list = {"walking": 0, "cycling": 0, "driving": 0, "public transport": 0}
+        co2_list["driving"] = round(driving_co2, 2)
+        co2_list["public transport"] = round(
+            helper_routes.generate_co2_emissions(
+                distances.get("public transport"), "public transport"
+            ),
+            2,
+        )
         for m in ("driving", "public transport"):
-            co2_list[m] = round(
-                helper_routes.generate_co2_emissions(
-                    distances.get(m), m, fuel_type, engine_size
-                ),
-                2,
-            )
             if co2_list[m] < 0:
                 logging.warning(f"Failed to find CO2 emission for {m}")
                 co2_list[m] = "Unknown"
@@ -197,7 +230,7 @@ def routes() -> object:
         )
 
         helper_routes.save_route(session.get("username", "unknown"), address1, address2)
-        most_frequent_route = helper_routes.get_most_frequent_route()
+        frequent_routes = helper_routes.get_top_routes(session["username"])
         home_and_work = helper_routes.get_home_and_work()
         return render_template(
             "routes.html",
@@ -210,14 +243,18 @@ def routes() -> object:
             map_query=map_query,
             autocomplete_query=autocomplete_query,
             route_exists=True,
-            most_frequent_route=most_frequent_route,
+            out_of_date=out_of_date,
+            estimated=estimated,
+            frequent_routes=frequent_routes,
             co2_emissions=co2,
             fuel_used=fuel_used,
-            fuel_cost=format(fuel_cost, ".2f"),
+            fuel_cost=format(fuel_cost, ".2f") if fuel_cost is not None else "Unknown",
             car_make=car_make,
             car_mpg=car_mpg,
             min_distance=helper_routes.get_min_distance(details),
-            fuel_price=format(fuel_price, ".2f"),
+            fuel_price=format(fuel_price, ".2f")
+            if fuel_price is not None
+            else "Unknown",
             calories=calories,
             recommendations=recommendations,
             home_and_work=home_and_work,
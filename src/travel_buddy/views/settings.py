@@ -2,9 +2,11 @@
 Handles the view for changing user settings and related functionality.
 """
 
-import sqlite3
-
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+import src.travel_buddy.helpers.helper_registry as helper_registry
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
 from flask import Blueprint, redirect, render_template, request, session
 from src.travel_buddy.helpers.helper_limiter import limiter
 
@@ -27,7 +29,7 @@ def settings() -> object:
     if "username" not in session:
         return redirect("/")
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT first_name, last_name, is_driver, bio, photo, verified, home, work "
@@ -50,7 +52,8 @@ def settings() -> object:
         )
         make, mpg, fuel_type, engine_size = cur.fetchone()
         autocomplete_query = helper_general.get_autocomplete_query(
-            filename="keys.json", func="autocomplete_no_map"
+            key=helper_registry.registry.get_keys().get("google_maps"),
+            func="autocomplete_no_map",
         )
     return render_template(
         "settings.html",
@@ -100,7 +103,7 @@ def edit_user_details() -> object:
     if len(new_l_name) > 20 or " " in new_l_name:
         return "405"
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         if new_home is not None and new_work is not None:
             cur.execute(
@@ -119,6 +122,7 @@ def edit_user_details() -> object:
                 "UPDATE profile SET bio=?, first_name=?, last_name=? WHERE username=?;",
                 (new_bio, new_f_name, new_l_name, session["username"]),
             )
+    helper_user_cards.user_cards.invalidate(session["username"])
 
     return "200"
 
@@ -148,7 +152,7 @@ def edit_car_details() -> object:
     if len(mpg) > 3 or " " in mpg:
         return "405"
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with helper_database.get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "UPDATE car SET make=?, mpg=?, fuel_type=?, engine_size=? WHERE owner=?;",
@@ -174,14 +178,12 @@ def edit_avatar() -> object:
     valid, message, file_name_hashed = helper_general.hash_image(file)
 
     if valid:
-        # Adds the user's avatar to the database.
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "UPDATE profile SET photo=? WHERE username=?;",
-                (file_name_hashed, session["username"]),
-            )
-            conn.commit()
+        # Resizes the avatar in the background, which changes the user's
+        # avatar once it's done.
+        helper_jobs.job_queue.enqueue(
+            "process_avatar",
+            {"file_name": file_name_hashed, "username": session["username"]},
+        )
         return "200"
 
     session["error"] = message
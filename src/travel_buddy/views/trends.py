@@ -2,8 +2,10 @@
 Handles the view for long term trends and estimations for a user.
 """
 
-import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_ev as helper_ev
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_trends as helper_trends
 
 from flask import Blueprint, redirect, render_template, request, session, url_for
 from src.travel_buddy.helpers.helper_limiter import limiter
@@ -18,6 +20,14 @@ DB_PATH = helper_general.get_database_path()
 @trends_blueprint.route("/trends", methods=["GET", "POST"])
 @limiter.limit("15/minute")
 def trends():
+    """
+    Displays the projected fuel cost and CO2 emissions of the user's car,
+    alongside those of recommended electric cars, for the user's monthly
+    mileage.
+
+    Returns:
+        The trends page.
+    """
     if "username" not in session:
         return redirect("/")
 
@@ -27,76 +37,31 @@ def trends():
         user_fuel_type,
         user_engine_size,
     ) = helper_routes.get_car(session.get("username"))
-
-    evs = helper_general.get_best_efficiency_electric(
-        helper_general.get_electric_cars()
+    monthly_miles = helper_trends.parse_monthly_miles(
+        request.values.get("monthly_miles")
     )
+    horizons = helper_trends.HORIZONS
 
-    # monthly_miles = request.form.get("monthly_miles")
-    # try:
-    #    monthly_miles = int(monthly_miles)
-    #    if monthly_miles < 0:
-    #        monthly_miles = 1000
-    # except Exception:
-    #    monthly_miles = 1000
-
-    monthly_miles = 1000
-
-    evs_fuel_costs = []
-    evs_co2_emissions = []
-
-    for ev in evs:
-        wpm = int(ev[3][:-5])
-        evs_fuel_costs.append(
-            round(helper_general.get_ev_cost_1_month(wpm, monthly_miles), 2)
-        )
-        watts_required = helper_general.get_watts_required(wpm, monthly_miles)
-        evs_co2_emissions.append(
-            round(helper_general.get_ev_co2_1_month(watts_required), 2)
-        )
-
-    print(evs_fuel_costs)
-    print(evs_co2_emissions)
-
-    denominations = [1, 3, 6, 12, 60, 120]
-    meters_in_1_mile = 1609 * monthly_miles
-
-    user_co2_emissions_1_month = helper_routes.generate_co2_emissions(
-        meters_in_1_mile, "driving", user_fuel_type
-    )
-    fuel_price = helper_routes.get_fuel_price(user_fuel_type)
-    user_fuel_used_1_month = helper_routes.calculate_fuel_used(
-        monthly_miles, float(user_car_mpg)
+    evs = helper_ev.get_best_efficiency_electric(helper_ev.ev_catalog.sample())
+    # Projects every car over every horizon at once. Other cars are compared
+    # in the browser through the compare endpoint.
+    ev_projection = helper_trends.project_evs(
+        [ev.efficiency for ev in evs], monthly_miles, horizons
     )
-    user_fuel_cost_1_month = helper_routes.calculate_fuel_cost(
-        user_fuel_used_1_month, fuel_price
-    )
-
-    user_fuel_costs = [
-        "{:,}".format(round(user_fuel_cost_1_month * x)) for x in denominations
-    ]
-    user_co2_emissions = [
-        "{:,}".format(round(user_co2_emissions_1_month * x)) for x in denominations
-    ]
-
-    # foreach car in evs calculate the co2 emissions and fuel cost and save into a list
-    evs_co2_emissions = []
-    evs_fuel_costs = []
+    # Compares against the most efficient car until the user picks another.
+    fuel_costs = ["{:,}".format(round(c)) for c in next(iter(ev_projection.costs), [])]
+    co2_emissions = ["{:,}".format(round(c)) for c in next(iter(ev_projection.co2), [])]
 
-    for ev in evs:
-        wpm = int(ev[3][:-5])
-
-        watts_required = helper_general.get_watts_required(wpm, 1000)
-        co2_emissions_1_month = helper_general.get_ev_co2_1_month(watts_required)
-
-        fuel_cost_1_month = helper_general.get_ev_cost_1_month(wpm, 1000)
-
-        evs_co2_emissions.append(co2_emissions_1_month)
-        evs_fuel_costs.append(fuel_cost_1_month)
-
-    fuel_cost_1_month = helper_general.get_ev_cost_1_month(wpm, 1000)
-
-    fuel_costs = ["{:,}".format(round(fuel_cost_1_month * x)) for x in denominations]
+    user_projection = helper_trends.project_fuel_car(
+        float(user_car_mpg),
+        helper_routes.get_fuel_price(user_fuel_type),
+        user_fuel_type,
+        user_engine_size,
+        monthly_miles,
+        horizons,
+    )
+    user_fuel_costs = ["{:,}".format(round(cost)) for cost in user_projection.costs[0]]
+    user_co2_emissions = ["{:,}".format(round(co2)) for co2 in user_projection.co2[0]]
 
     return render_template(
         "trends.html",
@@ -110,51 +75,50 @@ def trends():
         user_fuel_costs=user_fuel_costs,
         user_co2_emissions=user_co2_emissions,
         fuel_costs=fuel_costs,
-        evs_co2_emissions=evs_co2_emissions,
-        evs_fuel_costs=evs_fuel_costs,
-        co2_emissions=user_co2_emissions,
+        co2_emissions=co2_emissions,
+        monthly_miles=monthly_miles,
+        horizons=horizons,
+    )
+
+
+@trends_blueprint.route("/trends/compare", methods=["GET"])
+@limiter.limit("60/minute")
+def compare():
+    """
+    Compares the projected cost and CO2 emissions of an electric car in the
+    catalog with the user's car, for the chosen monthly mileage and time
+    horizons.
+
+    Returns:
+        The comparison as JSON.
+    """
+    if "username" not in session:
+        return {"error": "Not logged in"}, 401
+
+    car = helper_ev.ev_catalog.find(
+        request.args.get("make", ""), request.args.get("model", "")
     )
+    if car is None:
+        return {"error": "Car not found"}, 404
 
-    """elif request.method == "POST":
-
-        car = request.form.get("car")
-        wpm = request.form.get("wpm")
-
-        if wpm:
-            wpm = int(wpm[:-5])
-
-        fuel_cost_1_month = helper_general.get_ev_cost_1_month(wpm, monthly_miles)
-
-        fuel_costs = [
-            "{:,}".format(round(fuel_cost_1_month * x)) for x in denominations
-        ]
-
-        watts_required = helper_general.get_watts_required(wpm, monthly_miles)
-        co2_emissions_1_month = helper_general.get_ev_co2_1_month(watts_required)
-
-        print(evs)
-
-        co2_emissions = [
-            "{:,}".format(round(co2_emissions_1_month * x)) for x in denominations
-        ]
-
-        return render_template(
-            "trends.html",
-            username=session.get("username"),
-            comparison=True,
-            evs=evs,
-            user_car_make=user_car_make,
-            user_car_mpg=user_car_mpg,
-            user_fuel_type=user_fuel_type,
-            user_engine_size=user_engine_size,
-            user_fuel_costs=user_fuel_costs,
-            user_co2_emissions=user_co2_emissions,
-            car_make=car,
-            car_wpm=wpm,
-            fuel_costs=fuel_costs,
-            co2_emissions=co2_emissions,
-        )
-            evs_fuel_costs=evs_fuel_costs,
-            evs_co2_emissions=evs_co2_emissions,
-            monthly_miles=monthly_miles,
-        )"""
+    user_car_make, user_car_mpg, user_fuel_type, user_engine_size = (
+        helper_routes.get_car(session["username"])
+    )
+    comparison = helper_trends.compare_ev(
+        car,
+        float(user_car_mpg),
+        user_fuel_type,
+        user_engine_size,
+        helper_trends.parse_monthly_miles(request.args.get("monthly_miles")),
+        helper_trends.parse_horizons(request.args.get("horizons")),
+    )
+    return {
+        "car": car._asdict(),
+        "user_car": {
+            "make": user_car_make,
+            "mpg": user_car_mpg,
+            "fuel_type": user_fuel_type,
+            "engine_size": user_engine_size,
+        },
+        **comparison,
+    }
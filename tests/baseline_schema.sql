@@ -0,0 +1,11 @@
+-- The schema of the database before any migrations were added, which the
+-- migrations are tested against.
+CREATE TABLE rating (rater_username VARCHAR REFERENCES account (username) NOT NULL, rated_username VARCHAR NOT NULL REFERENCES account (username), journey_id INTEGER NOT NULL REFERENCES carpool_ride (journey_id), rating_given INTEGER NOT NULL CHECK (rating_given BETWEEN 1 AND 5), rate_type VARCHAR NOT NULL CHECK (rate_type IN ("driver", "passenger")), PRIMARY KEY (rater_username, rated_username));
+CREATE TABLE car (owner STRING REFERENCES profile (username) NOT NULL, make STRING NOT NULL, mpg DECIMAL, fuel_type STRING, engine_size DECIMAL, PRIMARY KEY (owner, make));
+CREATE TABLE route (route_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, origin VARCHAR NOT NULL, destination VARCHAR NOT NULL);
+CREATE TABLE route_search (username VARCHAR REFERENCES account (username) NOT NULL, route_id INTEGER REFERENCES route (route_id) NOT NULL, search_count INTEGER DEFAULT (0) NOT NULL, last_searched_timestamp TIME NOT NULL, last_updated_timestamp TIME NOT NULL, PRIMARY KEY (username, route_id));
+CREATE TABLE account (username VARCHAR PRIMARY KEY NOT NULL UNIQUE, password VARCHAR NOT NULL);
+CREATE TABLE carpool_ride (journey_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL UNIQUE, is_complete BOOLEAN NOT NULL DEFAULT (0), seats_initial INTEGER, seats_available INTEGER NOT NULL, driver VARCHAR NOT NULL REFERENCES account (username), starting_point VARCHAR NOT NULL, destination VARCHAR NOT NULL, pickup_datetime DATETIME NOT NULL, price REAL NOT NULL, description VARCHAR, distance INTEGER, distance_text VARCHAR, estimate_duration INTEGER, estimate_duration_text VARCHAR, estimate_co2_per_person REAL, estimate_co2_saved REAL);
+CREATE TABLE carpool_request (request_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL UNIQUE, requester VARCHAR NOT NULL REFERENCES account (username), journey_id INTEGER REFERENCES carpool_ride (journey_id), num_passengers INTEGER NOT NULL, starting_point VARCHAR NOT NULL, destination VARCHAR NOT NULL, pickup_datetime DATETIME NOT NULL, desired_price REAL NOT NULL, description VARCHAR, distance INTEGER, distance_text VARCHAR, estimate_duration INTEGER, estimate_duration_text VARCHAR, estimate_co2_per_person REAL, estimate_co2_saved REAL);
+CREATE TABLE carpool_interest (id INTEGER PRIMARY KEY AUTOINCREMENT, username REFERENCES account (username), journey_id REFERENCES carpool_ride (journey_id));
+CREATE TABLE profile (username VARCHAR REFERENCES account (username) PRIMARY KEY NOT NULL UNIQUE, first_name VARCHAR NOT NULL, last_name VARCHAR NOT NULL, is_driver BOOLEAN DEFAULT (0) NOT NULL, bio VARCHAR DEFAULT "This is my bio!" NOT NULL, photo VARCHAR DEFAULT "default.jpg", verified BOOLEAN NOT NULL DEFAULT (0), join_date DATE, home STRING, work STRING);
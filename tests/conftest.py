@@ -0,0 +1,33 @@
+"""
+Shared setup for the tests, which run against a migrated copy of the database
+so that the committed database is never changed by them.
+"""
+
+import os
+import shutil
+import tempfile
+
+import src.travel_buddy.helpers.helper_database as helper_database
+
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="travel-buddy-tests-")
+DB_PATH = os.path.join(TEST_DIRECTORY, "db.sqlite3")
+
+
+def pytest_configure(config):
+    """
+    Copies the database and brings its schema up to date, before the test
+    modules are imported, as the helpers store the database path on import.
+    """
+    shutil.copy(helper_database.get_database_path(), DB_PATH)
+    helper_database.get_database_path = lambda: DB_PATH
+
+    import src.travel_buddy.helpers.helper_migrations as helper_migrations
+
+    helper_migrations.migrate()
+
+
+def pytest_unconfigure(config):
+    """
+    Removes the copy of the database.
+    """
+    shutil.rmtree(TEST_DIRECTORY, ignore_errors=True)
@@ -0,0 +1,120 @@
+"""
+Tests for processing uploaded avatars into every size and format.
+"""
+
+import io
+import os
+import shutil
+
+import pytest
+import src.travel_buddy.helpers.helper_avatars as helper_avatars
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+
+@pytest.fixture
+def avatar_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(helper_avatars, "AVATAR_DIRECTORY", str(tmp_path))
+    return tmp_path
+
+
+def test_generate_avatar_variants(avatar_directory):
+    """
+    Tests that an image is cropped to a square, and written in every size and
+    format, without changing the image itself.
+    """
+    upload_path = str(avatar_directory / "upload.png")
+    Image.new("RGB", (2000, 1200), "red").save(upload_path)
+
+    assert not helper_avatars.has_variants("avatar.jpg")
+    written = helper_avatars.generate_avatar_variants(upload_path, "avatar.jpg")
+    assert written == helper_avatars.get_variant_names("avatar.jpg")
+    assert helper_avatars.has_variants("avatar.jpg")
+    for size in helper_avatars.AVATAR_SIZES:
+        for extension, (image_format, _) in helper_avatars.AVATAR_FORMATS.items():
+            with Image.open(avatar_directory / f"avatar-{size}.{extension}") as img:
+                assert img.size == (size, size)
+                assert img.format == image_format
+    with Image.open(upload_path) as img:
+        assert img.size == (2000, 1200)
+    assert not any(name.endswith(".tmp") for name in os.listdir(avatar_directory))
+
+
+def test_process_avatar(avatar_directory, tmp_path, monkeypatch):
+    """
+    Tests that the user's avatar is only changed once it has been processed,
+    and that avatars are backfilled once, without being changed.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    Image.new("RGB", (1200, 1600), "blue").save(
+        helper_avatars.get_upload_path("new.jpg"), "PNG"
+    )
+
+    helper_avatars.process_avatar("new.jpg", "johndoe")
+    assert helper_general.get_user_avatar("johndoe") == "new.jpg"
+    assert not os.path.exists(helper_avatars.get_upload_path("new.jpg"))
+    with Image.open(avatar_directory / "new.jpg") as img:
+        assert (img.format, img.size) == ("JPEG", (750, 1000))
+    assert helper_avatars.has_variants("new.jpg")
+    assert helper_avatars.backfill_avatars() == []
+
+    Image.new("RGB", (100, 100), "green").save(avatar_directory / "old.jpg")
+    old = (avatar_directory / "old.jpg").read_bytes()
+    assert helper_avatars.backfill_avatars() == ["old.jpg"]
+    assert (avatar_directory / "old.jpg").read_bytes() == old
+    assert (avatar_directory / "old-48.webp").exists()
+    assert helper_avatars.backfill_avatars() == []
+
+
+def test_hash_image_rejects_invalid_images(avatar_directory):
+    """
+    Tests that uploads which aren't images are rejected before they're
+    stored, and that images are stored unchanged.
+    """
+    image = io.BytesIO()
+    Image.new("RGB", (100, 100), "red").save(image, "PNG")
+
+    valid, message, file_name = helper_general.hash_image(
+        FileStorage(io.BytesIO(b"not an image"), "avatar.png")
+    )
+    assert (valid, file_name) == (False, "")
+    assert message == ["Your file must be an image."]
+    assert os.listdir(avatar_directory) == []
+
+    valid, _, file_name = helper_general.hash_image(
+        FileStorage(io.BytesIO(image.getvalue()), "avatar.png")
+    )
+    assert valid
+    with open(helper_avatars.get_upload_path(file_name), "rb") as f:
+        assert f.read() == image.getvalue()
+
+
+def test_failed_upload_is_discarded(avatar_directory, tmp_path, monkeypatch):
+    """
+    Tests that an upload which can't be processed is deleted once its job
+    has used every attempt, without changing the user's avatar.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    with helper_database.get_connection() as conn:
+        conn.execute("DELETE FROM job;")
+    avatar = helper_general.get_user_avatar("johndoe")
+    upload_path = helper_avatars.get_upload_path("broken.jpg")
+    with open(upload_path, "wb") as f:
+        f.write(b"not an image")
+
+    helper_jobs.job_queue.enqueue(
+        "process_avatar",
+        {"file_name": "broken.jpg", "username": "johndoe"},
+        max_attempts=1,
+    )
+    assert helper_jobs.job_queue.run_pending() == 1
+    assert helper_jobs.job_queue.get_stats()["dead"] == 1
+    assert not os.path.exists(upload_path)
+    assert helper_general.get_user_avatar("johndoe") == avatar
@@ -0,0 +1,120 @@
+"""
+Tests for caching Distance Matrix results.
+"""
+
+import src.travel_buddy.helpers.helper_cache as helper_cache
+
+RESPONSE = {"status": "OK", "rows": [{"elements": [{"distance": {"value": 1000}}]}]}
+
+
+def test_normalise_location():
+    """
+    Tests that different spellings of the same location are normalised to the
+    same key.
+    """
+    assert helper_cache.normalise_location(
+        "  Exeter Quay,  Exeter EX2 4BZ "
+    ) == helper_cache.normalise_location("exeter quay exeter ex2 4bz")
+
+
+def test_cache_hit_and_miss(tmp_path):
+    """
+    Tests that a cached route is returned for a normalised key, and that the
+    hit and miss statistics are recorded.
+    """
+    cache = helper_cache.DistanceMatrixCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("Exeter", "Exmouth", "walking") is None
+    cache.set("Exeter", "Exmouth", "walking", RESPONSE)
+    assert cache.get(" exeter", "EXMOUTH ", "walking") == RESPONSE
+    assert cache.get("Exeter", "Exmouth", "driving") is None
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_cache_expiry(tmp_path):
+    """
+    Tests that entries expire after the time to live for their mode.
+    """
+    cache = helper_cache.DistanceMatrixCache(
+        str(tmp_path / "cache.sqlite3"), ttls={"transit": -1}
+    )
+    cache.set("Exeter", "Exmouth", "transit", RESPONSE)
+    cache.set("Exeter", "Exmouth", "walking", RESPONSE)
+    assert cache.get("Exeter", "Exmouth", "transit") is None
+    assert cache.get("Exeter", "Exmouth", "walking") == RESPONSE
+
+
+def test_cache_lru_eviction(tmp_path):
+    """
+    Tests that the least recently used entries are evicted once the cache is
+    over its size cap.
+    """
+    cache = helper_cache.DistanceMatrixCache(
+        str(tmp_path / "cache.sqlite3"), max_entries=2, touch_interval=0
+    )
+    cache.set("A", "B", "walking", RESPONSE)
+    cache.set("C", "D", "walking", RESPONSE)
+    # Uses the first entry so that the second is the least recently used.
+    assert cache.get("A", "B", "walking") == RESPONSE
+    cache.set("E", "F", "walking", RESPONSE)
+
+    assert cache.get("C", "D", "walking") is None
+    assert cache.get("A", "B", "walking") == RESPONSE
+    stats = cache.get_stats()
+    assert (stats["evictions"], stats["entries"]) == (1, 2)
+
+    # Replacing an entry doesn't count it twice, and the count is loaded
+    # when the cache is opened again.
+    cache.set("A", "B", "walking", RESPONSE)
+    assert cache.get_stats()["entries"] == 2
+    reopened = helper_cache.DistanceMatrixCache(cache.path, max_entries=2)
+    assert reopened.get_stats()["entries"] == 2
+
+
+def test_cache_touch_interval(tmp_path):
+    """
+    Tests that an entry is only marked as used again once the touch interval
+    has passed since it was last marked.
+    """
+    cache = helper_cache.DistanceMatrixCache(
+        str(tmp_path / "cache.sqlite3"), touch_interval=60
+    )
+    cache.set("A", "B", "walking", RESPONSE)
+    conn = cache._get_connection()
+    conn.execute("UPDATE distance_matrix_cache SET accessed_at=accessed_at-30;")
+    accessed_at = conn.execute(
+        "SELECT accessed_at FROM distance_matrix_cache;"
+    ).fetchone()[0]
+
+    assert cache.get("A", "B", "walking") == RESPONSE
+    assert (
+        conn.execute("SELECT accessed_at FROM distance_matrix_cache;").fetchone()[0]
+        == accessed_at
+    )
+    conn.execute("UPDATE distance_matrix_cache SET accessed_at=accessed_at-60;")
+    assert cache.get("A", "B", "walking") == RESPONSE
+    assert (
+        conn.execute("SELECT accessed_at FROM distance_matrix_cache;").fetchone()[0]
+        > accessed_at
+    )
+
+
+def test_cache_stale_entries(tmp_path):
+    """
+    Tests that expired entries are only returned when stale entries are
+    allowed, and not once they're too old to serve.
+    """
+    cache = helper_cache.DistanceMatrixCache(
+        str(tmp_path / "cache.sqlite3"), ttls={"transit": -1, "walking": -2}
+    )
+    cache.set("Exeter", "Exmouth", "transit", RESPONSE)
+    cache.set("Exeter", "Exmouth", "driving", RESPONSE)
+    assert cache.get("Exeter", "Exmouth", "transit") is None
+    assert cache.get_entry("Exeter", "Exmouth", "transit") == (RESPONSE, True)
+    assert cache.get_entry("Exeter", "Exmouth", "driving") == (RESPONSE, False)
+
+    cache.max_stale = 0
+    assert cache.get_entry("Exeter", "Exmouth", "transit") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 2)
@@ -3,11 +3,15 @@ Tests for the carpool system and related functionality, such as validating carpo
 requests.
 """
 
+import shutil
 import sqlite3
+import time
 from datetime import datetime
 
 import src.travel_buddy.helpers.helper_carpool as helper_carpool
+import src.travel_buddy.helpers.helper_database as helper_database
 import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_routes as helper_routes
 from pytest_steps import test_steps
 
 DB_PATH = helper_general.get_database_path()
@@ -109,9 +113,6 @@ def test_validate_carpool_ride():
     pickup_datetime = datetime(year=2030, month=1, day=1, hour=1, minute=1, second=1)
     price = 10.0
     description = "This is a test description."
-    distance = 1000
-    duration = 28000
-    co2 = 3.142
 
     # Tests a valid carpool request.
     assert helper_carpool.validate_carpool_ride(
@@ -122,9 +123,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (True, [])
     yield
 
@@ -138,9 +136,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, [f"The driver '{driver}' does not exist."])
     yield
 
@@ -155,9 +150,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, ["Please enter a valid number of seats available (>= 1)."])
     seats_available = 0
     assert helper_carpool.validate_carpool_ride(
@@ -168,9 +160,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, ["Please enter a valid number of seats available (>= 1)."])
     yield
 
@@ -185,9 +174,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, ["The pickup time must be in the future."])
     yield
 
@@ -201,9 +187,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, ["The pickup time must be in the future."])
     yield
 
@@ -218,9 +201,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (False, ["The price must not be a negative number."])
     yield
 
@@ -235,9 +215,6 @@ def test_validate_carpool_ride():
         pickup_datetime,
         price,
         description,
-        distance,
-        duration,
-        co2,
     ) == (
         False,
         [
@@ -274,26 +251,125 @@ def test_validate_joining_carpool():
     yield
 
 
-def test_get_total_carpools_joined():
+def test_price_money_saved(monkeypatch):
     """
-    Tests whether the number of total carpools joined is calculated correctly.
+    Tests that the distance without a stored fuel cost is priced with the
+    user's car, with the fuel price applied once, and added to the stored
+    fuel cost.
     """
-    # The username '@' isn't allowed, so it should have no carpools joined.
-    assert helper_carpool.get_total_carpools_joined("@") == 0
+    monkeypatch.setattr(helper_routes, "get_fuel_price", lambda fuel_type: 1.5)
+    _, car_mpg, fuel_type, _ = helper_routes.get_car("johndoe")
+
+    assert helper_carpool.price_money_saved("johndoe", 2.5, 30000) == round(
+        2.5 + helper_routes.calculate_total_fuel_cost(30000, car_mpg, fuel_type)[1],
+        2,
+    )
+    assert helper_carpool.price_money_saved("johndoe", 2.5, 0) == 2.5
+
+
+def test_get_incomplete_carpools_pages(tmp_path, monkeypatch):
+    """
+    Tests that following the cursors through the pages of incomplete carpools
+    gives every future carpool once, in order of pickup datetime.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(DB_PATH, db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    with sqlite3.connect(db_path) as conn:
+        # Some carpools share a pickup datetime, so must be ordered by ID.
+        conn.executemany(
+            "INSERT INTO carpool_ride (seats_initial, seats_available, driver, "
+            "starting_point, destination, pickup_datetime, pickup_epoch, price) "
+            "VALUES (3, 3, 'johndoe', 'A', 'B', ?1, "
+            "CAST(strftime('%s', ?1) AS INTEGER), 5);",
+            [(f"2099-01-0{i // 2 + 1} 12:00:00",) for i in range(7)],
+        )
+        expected = [
+            row[0]
+            for row in conn.execute(
+                "SELECT journey_id FROM carpool_ride WHERE is_complete=0 "
+                "AND CURRENT_TIMESTAMP < pickup_datetime "
+                "ORDER BY pickup_datetime, journey_id;"
+            )
+        ]
+
+    journey_ids = []
+    cursor = None
+    while True:
+        carpools, cursor = helper_carpool.get_incomplete_carpools(
+            helper_carpool.decode_carpool_cursor(cursor), page_size=3
+        )
+        assert len(carpools) <= 3
+        journey_ids += [carpool[0] for carpool in carpools]
+        if cursor is None:
+            break
+    assert journey_ids == expected
+    assert helper_carpool.decode_carpool_cursor("not a cursor") is None
 
 
-def test_get_total_carpools_drove():
+def test_get_carpool_detail(tmp_path, monkeypatch):
     """
-    Tests whether the number of total carpools drove is calculated correctly.
+    Tests that the details, driver, and passengers of a carpool are loaded in
+    a single query.
     """
-    # The username '@' isn't allowed, so it should have no carpools drove.
-    assert helper_carpool.get_total_carpools_drove("@") == 0
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(DB_PATH, db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    queries = []
+    helper_database.get_connection().set_trace_callback(queries.append)
 
+    carpool = helper_carpool.get_carpool_detail(27)
+    assert len(queries) == 1
+    details = helper_carpool.get_carpool_details(27)
+    assert (
+        carpool.driver,
+        carpool.seats_available,
+        carpool.pickup_datetime,
+        carpool.co2_saved,
+    ) == (
+        details[0],
+        details[3],
+        datetime.strptime(details[6], "%Y-%m-%d %H:%M:%S"),
+        details[13],
+    )
+    assert carpool.driver_card.avatar == helper_general.get_user_avatar("janedoe")
+    assert list(carpool.passengers) == [
+        row[0]
+        for row in helper_database.get_connection().execute(
+            "SELECT requester FROM carpool_request WHERE journey_id=27;"
+        )
+    ]
+    assert helper_carpool.get_carpool_detail(-1) is None
 
-def test_get_total_distance_carpooled():
+
+def test_estimate_carpool_details_has_deadline(monkeypatch):
     """
-    Tests whether the number of total distance carpooled is calculated
-    correctly.
+    Tests that the route lookup for a new carpool is given a deadline within
+    the route lookup budget.
     """
-    # The username '@' isn't allowed, so it should have 0 km carpooled.
-    assert helper_carpool.get_total_distance_carpooled("@") == 0
+    deadlines = []
+
+    def get_route_data(map_client, origins, destinations, mode, deadline=None):
+        deadlines.append(deadline)
+        return {
+            "rows": [
+                {
+                    "elements": [
+                        {
+                            "distance": {"value": 1000, "text": "1 km"},
+                            "duration": {"value": 60, "text": "1 min"},
+                        }
+                    ]
+                }
+            ]
+        }
+
+    monkeypatch.setattr(helper_routes, "get_route_data", get_route_data)
+    monkeypatch.setattr(
+        helper_routes, "generate_co2_emissions", lambda distance, *args: 2
+    )
+    start = time.monotonic()
+    details = helper_carpool.estimate_carpool_details("Exeter", "Exmouth", 2)
+
+    assert details == (1000, "1 km", 60, "1 min", 1, 1)
+    assert start < deadlines[0] <= time.monotonic() + helper_routes.ROUTE_LOOKUP_BUDGET
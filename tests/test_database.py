@@ -0,0 +1,54 @@
+"""
+Tests for connecting to the database.
+"""
+
+import threading
+
+import src.travel_buddy.helpers.helper_database as helper_database
+from flask import Flask
+
+
+def test_connection_pragmas(tmp_path):
+    """
+    Tests that connections are opened in WAL mode with the tuned pragmas.
+    """
+    conn = helper_database.open_connection(str(tmp_path / "db.sqlite3"))
+    assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    # NORMAL synchronisation is stored as 1.
+    assert conn.execute("PRAGMA synchronous;").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout;").fetchone()[0] == 5000
+
+
+def test_connection_reused_per_thread(tmp_path):
+    """
+    Tests that each thread reuses its own connection outside of requests.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    conn = helper_database.get_connection(db_path)
+    assert helper_database.get_connection(db_path) is conn
+
+    other_thread_conns = []
+    thread = threading.Thread(
+        target=lambda: other_thread_conns.append(
+            helper_database.get_connection(db_path)
+        )
+    )
+    thread.start()
+    thread.join()
+    assert other_thread_conns[0] is not conn
+
+
+def test_connection_reused_per_request(tmp_path):
+    """
+    Tests that a request uses one connection, which is returned to the pool
+    for the next request to reuse.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    app = Flask(__name__)
+    helper_database.init_app(app)
+
+    with app.app_context():
+        conn = helper_database.get_connection(db_path)
+        assert helper_database.get_connection(db_path) is conn
+    with app.app_context():
+        assert helper_database.get_connection(db_path) is conn
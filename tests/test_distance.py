@@ -0,0 +1,109 @@
+"""
+Tests for estimating route distances and durations from coordinates.
+"""
+
+import pytest
+import src.travel_buddy.helpers.helper_distance as helper_distance
+import src.travel_buddy.helpers.helper_routes as helper_routes
+
+LONDON = (51.5074, -0.1278)
+PARIS = (48.8566, 2.3522)
+
+
+def test_haversine():
+    """
+    Tests that great circle distances are calculated correctly.
+    """
+    assert helper_distance.haversine(LONDON, PARIS) == pytest.approx(343500, rel=0.01)
+    assert helper_distance.haversine(LONDON, LONDON) == 0
+    assert helper_distance.haversine(PARIS, LONDON) == pytest.approx(343500, rel=0.01)
+
+
+def test_parse_coordinates():
+    """
+    Tests that only valid coordinates are parsed.
+    """
+    assert helper_distance.parse_coordinates("50.72, -3.53") == (50.72, -3.53)
+    assert helper_distance.parse_coordinates("") is None
+    assert helper_distance.parse_coordinates(None) is None
+    assert helper_distance.parse_coordinates("91,0") is None
+    assert helper_distance.parse_coordinates("1,2,3") is None
+
+
+def test_format_distance_and_duration():
+    """
+    Tests that estimates are formatted like the Distance Matrix API.
+    """
+    assert helper_distance.format_distance(850) == "850 m"
+    assert helper_distance.format_distance(12345) == "12.3 km"
+    assert helper_distance.format_duration(20) == "1 min"
+    assert helper_distance.format_duration(900) == "15 mins"
+    assert helper_distance.format_duration(3900) == "1 hour 5 mins"
+    assert helper_distance.format_duration(7200) == "2 hours"
+
+
+def test_calibrate(tmp_path, monkeypatch):
+    """
+    Tests that estimates use the profile calibrated from recorded samples once
+    there are enough of them.
+    """
+    estimator = helper_distance.DistanceEstimator(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(helper_distance, "MIN_CALIBRATION_SAMPLES", 2)
+    straight = helper_distance.haversine(LONDON, PARIS)
+    response = {
+        "rows": [
+            {
+                "elements": [
+                    {
+                        "distance": {"value": round(straight * 1.5)},
+                        "duration": {"value": round(straight * 1.5 / 20)},
+                    }
+                ]
+            }
+        ]
+    }
+    for i in range(2):
+        estimator.record_samples(
+            f"London {i}", "Paris", LONDON, PARIS, {"driving": response}
+        )
+    # Samples of the same route replace each other.
+    estimator.record_samples("London 0", "Paris", LONDON, PARIS, {"driving": response})
+
+    profiles = estimator.calibrate()
+    assert profiles["driving"] == pytest.approx((1.5, 20), rel=0.001)
+    assert profiles["walking"] == helper_distance.DEFAULT_PROFILES["walking"]
+    distance, duration = estimator.estimate(LONDON, PARIS, "driving")
+    assert distance == pytest.approx(straight * 1.5, rel=0.001)
+    assert duration == pytest.approx(straight * 1.5 / 20, rel=0.001)
+
+
+def test_fill_route_estimates(tmp_path, monkeypatch):
+    """
+    Tests that only failed lookups are replaced with estimates, and not modes
+    which have no route.
+    """
+    estimator = helper_distance.DistanceEstimator(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(helper_distance, "distance_estimator", estimator)
+    driving = {
+        "rows": [
+            {"elements": [{"distance": {"value": 1000}, "duration": {"value": 60}}]}
+        ]
+    }
+    route_data = {
+        "driving": driving,
+        "walking": {},
+        "transit": {
+            "status": "OK",
+            "rows": [{"elements": [{"status": "ZERO_RESULTS"}]}],
+        },
+        "bicycling": {"status": "OVER_QUERY_LIMIT"},
+    }
+
+    assert helper_routes.fill_route_estimates(
+        route_data, "London", "Paris", LONDON, PARIS
+    )
+    assert route_data["driving"] is driving
+    assert route_data["walking"]["estimated"]
+    assert route_data["bicycling"]["estimated"]
+    assert "estimated" not in route_data["transit"]
+    assert route_data["walking"]["origin_addresses"] == ["London"]
@@ -0,0 +1,51 @@
+"""
+Tests for estimating carbon emissions from local emission factors.
+"""
+
+import pytest
+import src.travel_buddy.helpers.helper_emissions as helper_emissions
+import src.travel_buddy.helpers.helper_routes as helper_routes
+
+
+def test_get_engine_size_class():
+    """
+    Tests that engine sizes are put in the correct size class for their fuel.
+    """
+    assert helper_emissions.get_engine_size_class("petrol", 1.2) == "small"
+    assert helper_emissions.get_engine_size_class("petrol", 1.6) == "medium"
+    assert helper_emissions.get_engine_size_class("diesel", 1.6) == "small"
+    assert helper_emissions.get_engine_size_class("diesel", 3) == "large"
+    assert helper_emissions.get_engine_size_class("petrol", -1) == "na"
+    assert helper_emissions.get_engine_size_class("na", 1.2) == "na"
+
+
+def test_estimate_co2():
+    """
+    Tests that CO2 emissions are estimated from the emission factor for the
+    car, falling back to less specific factors.
+    """
+    factors = helper_emissions.DEFAULT_EMISSION_FACTORS
+    assert helper_emissions.estimate_co2(0, "petrol") == 0
+    assert helper_emissions.estimate_co2(1000, "petrol", 1.2) == pytest.approx(
+        factors[("car", "petrol", "small")]
+    )
+    assert helper_emissions.estimate_co2(2000, "diesel") == pytest.approx(
+        2 * factors[("car", "diesel", "na")]
+    )
+    assert helper_emissions.estimate_co2(1000, "electric", 1.2) == pytest.approx(
+        factors[("car", "na", "na")]
+    )
+    assert helper_routes.generate_co2_emissions(
+        1000, "driving", "petrol"
+    ) == helper_emissions.estimate_co2(1000, "petrol")
+
+
+def test_estimate_co2_batch():
+    """
+    Tests that a batch of distances gives the same estimates as estimating
+    each distance separately.
+    """
+    distances = [0, 1000, 25000, 123456]
+    assert helper_emissions.estimate_co2_batch(distances, "diesel", 1.8) == [
+        helper_emissions.estimate_co2(distance, "diesel", 1.8) for distance in distances
+    ]
@@ -0,0 +1,99 @@
+"""
+Tests for the electric car catalog.
+"""
+
+import shutil
+
+import pytest
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_ev as helper_ev
+import src.travel_buddy.helpers.helper_http as helper_http
+
+
+class FakePage:
+    def __init__(self, content: str):
+        self.content = content.encode()
+
+
+def make_listing(cars: list) -> str:
+    """
+    Builds an EV database page listing the given (make, model, price,
+    efficiency, range) cars.
+    """
+    listings = "".join(
+        "<div>"
+        f'<div><a><img data-src="/img/{make}.jpg"></a></div>'
+        f"<div><h2><a><span>{make}</span><span>{model}</span></a></h2></div>"
+        "<div></div>"
+        f"<div><p><span></span><span>{range_miles}</span></p><p></p><p></p>"
+        f"<p><span></span><span>{efficiency}</span></p></div>"
+        f"<div><span><span>{price}</span></span></div>"
+        "</div>"
+        for make, model, price, efficiency, range_miles in cars
+    )
+    return (
+        '<html><body><div id="evdb"><main><div></div><div><div></div><div></div>'
+        f"<div><div>{listings}</div></div></div></main></div></body></html>"
+    )
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    return helper_ev.EVCatalog(db_path)
+
+
+def test_parse_number():
+    """
+    Tests that numbers are parsed from the text shown on the EV database.
+    """
+    assert helper_ev.parse_number("£32,990") == 32990
+    assert helper_ev.parse_number("172 Wh/mi") == 172
+    assert helper_ev.parse_number("N/A") is None
+    assert helper_ev.parse_number(None) is None
+
+
+def test_refresh_stores_parsed_catalog(catalog, monkeypatch):
+    """
+    Tests that the scraped catalog is stored with numeric columns, and served
+    from memory until the next refresh.
+    """
+    page = make_listing(
+        [
+            ("Tesla", "Model 3", "£42,990", "238 Wh/mi", "270 mi"),
+            ("Fiat", "500e", "£28,195", "179 Wh/mi", "180 mi"),
+        ]
+    )
+    monkeypatch.setattr(helper_http, "request", lambda *args, **kwargs: FakePage(page))
+
+    assert catalog.get_cars() == []
+    assert catalog.refresh() == 2
+    cars = catalog.get_cars()
+    assert cars[0] == helper_ev.ElectricCar(
+        "Tesla", "Model 3", 42990, 238, "https://ev-database.uk/img/Tesla.jpg", 270
+    )
+    assert [car.model for car in helper_ev.get_best_efficiency_electric(cars)] == [
+        "500e",
+        "Model 3",
+    ]
+    assert len(catalog.sample(10)) == 2
+
+    # A failed refresh keeps the stored catalog.
+    monkeypatch.setattr(
+        helper_http, "request", lambda *args, **kwargs: FakePage("<html></html>")
+    )
+    with pytest.raises(ValueError):
+        catalog.refresh()
+    assert catalog.get_cars() == cars
+    assert helper_ev.EVCatalog(catalog.db_path).get_cars() == cars
+
+
+def test_find(catalog):
+    """
+    Tests that cars are found in the catalog by their make and model.
+    """
+    fiat = helper_ev.ElectricCar("Fiat", "500e", None, 179, "500e.jpg", None)
+    catalog._cars = [fiat]
+    assert catalog.find("Fiat", "500e") == fiat
+    assert catalog.find("Fiat", "Panda") is None
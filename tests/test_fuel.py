@@ -0,0 +1,78 @@
+"""
+Tests for the fuel price service.
+"""
+
+import sqlite3
+
+import pytest
+import src.travel_buddy.helpers.helper_fuel as helper_fuel
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    Creates an empty database with the 'fuel_price' table.
+    """
+    path = str(tmp_path / "db.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE fuel_price (fuel_type VARCHAR NOT NULL, price REAL NOT "
+            "NULL, fetched_at TIMESTAMP NOT NULL DEFAULT (CURRENT_TIMESTAMP));"
+        )
+    return path
+
+
+def test_get_price_never_scrapes(db_path, monkeypatch):
+    """
+    Tests that the default price is served until a price has been scraped in
+    the background, and that the stored price is served afterwards.
+    """
+    scrapes = []
+    monkeypatch.setattr(
+        helper_fuel,
+        "scrape_fuel_price",
+        lambda fuel_type: scrapes.append(fuel_type) or 1.5,
+    )
+    service = helper_fuel.FuelPriceService(db_path)
+    assert service.get_price("petrol") == helper_fuel.DEFAULT_PRICES["petrol"]
+    assert scrapes == []
+
+    service.refresh_all()
+    assert service.get_price("electric") == 1.5
+    # A new service loads the stored price rather than scraping again.
+    assert helper_fuel.FuelPriceService(db_path).get_price("diesel") == 1.5
+    assert scrapes == ["petrol", "diesel"]
+
+
+def test_refresh_prunes_old_prices(db_path, monkeypatch):
+    """
+    Tests that prices older than the retention period are removed when a new
+    price is stored.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO fuel_price VALUES ('petrol', 1.4, datetime('now', ?));",
+            [("-40 days",), ("-1 days",)],
+        )
+    monkeypatch.setattr(helper_fuel, "scrape_fuel_price", lambda fuel_type: 1.6)
+    helper_fuel.FuelPriceService(db_path).refresh("petrol")
+
+    with sqlite3.connect(db_path) as conn:
+        prices = conn.execute("SELECT price FROM fuel_price ORDER BY fetched_at;")
+        assert prices.fetchall() == [(1.4,), (1.6,)]
+
+
+def test_refresh_failure_keeps_last_known_price(db_path, monkeypatch):
+    """
+    Tests that the last known price is kept if a scrape fails.
+    """
+    monkeypatch.setattr(helper_fuel, "scrape_fuel_price", lambda fuel_type: 1.6)
+    service = helper_fuel.FuelPriceService(db_path)
+    service.refresh_all()
+
+    def fail(fuel_type):
+        raise ConnectionError("Unable to reach the fuel price website.")
+
+    monkeypatch.setattr(helper_fuel, "scrape_fuel_price", fail)
+    service.refresh_all()
+    assert service.get_price("diesel") == 1.6
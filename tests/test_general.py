@@ -14,3 +14,18 @@ def test_string_to_date():
     string_date = "2020-01-01T23:00"
     datetime_date = helper_general.string_to_date(string_date)
     assert datetime.datetime.strftime(datetime_date, "%Y-%m-%dT%H:%M") == string_date
+
+
+def test_format_epochs():
+    """
+    Tests that epochs are formatted the same as the datetimes they were
+    converted from.
+    """
+    dates = [
+        datetime.datetime(2022, 3, 5, 9, 7, 0),
+        datetime.datetime(2030, 12, 25, 23, 59, 59),
+    ]
+    epochs = [helper_general.datetime_to_epoch(date) for date in dates]
+    assert helper_general.format_epochs(epochs, "%e/%m %H:%M") == [
+        date.strftime("%e/%m %H:%M") for date in dates
+    ]
@@ -0,0 +1,42 @@
+"""
+Tests for the health check endpoint.
+"""
+
+import src.travel_buddy.helpers.helper_cache as helper_cache
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_singleflight as helper_singleflight
+import src.travel_buddy.views.health as health
+from flask import Flask
+
+
+def test_health(tmp_path, monkeypatch):
+    """
+    Tests that the health check shows each service's circuit, the lookups
+    collapsed into ones already in flight, and the route cache statistics.
+    """
+    cache = helper_cache.DistanceMatrixCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(helper_routes, "route_cache", cache)
+    cache.get("Exeter", "Bath", "driving")
+    monkeypatch.setattr(
+        helper_routes,
+        "route_lookups",
+        helper_singleflight.SingleFlight("test"),
+    )
+    helper_routes.route_lookups.do("key", lambda: None)
+
+    app = Flask(__name__)
+    app.register_blueprint(health.health_blueprint)
+    response = app.test_client().get("/health")
+
+    body = response.get_json()
+    assert response.status_code == (200 if body["healthy"] else 503)
+    assert set(body["dependencies"]) == set(helper_http.get_health())
+    assert body["collapsed_lookups"]["route_lookups"] == {
+        "calls": 1,
+        "collapsed": 0,
+        "in_flight": 0,
+    }
+    assert "collapsed" in body["collapsed_lookups"]["fuel_price_scrapes"]
+    assert body["route_cache"]["misses"] == 1
+    assert body["route_cache"]["entries"] == 0
@@ -0,0 +1,158 @@
+"""
+Tests for calling external services with timeouts, retries, and circuit
+breakers.
+"""
+
+import time
+
+import googlemaps
+import pytest
+import requests
+import src.travel_buddy.helpers.helper_http as helper_http
+import src.travel_buddy.helpers.helper_registry as helper_registry
+
+
+class FakeSession:
+    """
+    Responds to requests with the given status codes in order.
+    """
+
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        response = requests.Response()
+        response.status_code = self.status_codes.pop(0)
+        return response
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """
+    Replaces the shared HTTP session and the breaker for a test service.
+    """
+    fake = FakeSession([])
+    monkeypatch.setattr(helper_registry.registry, "get_http_session", lambda: fake)
+    monkeypatch.setitem(
+        helper_http.DEPENDENCIES,
+        "test",
+        helper_http.DependencyConfig(1, 10, 2, 0, 2, 60),
+    )
+    monkeypatch.setitem(
+        helper_http.breakers, "test", helper_http.CircuitBreaker("test", 2, 60)
+    )
+    return fake
+
+
+def test_request_retries_server_errors(session):
+    """
+    Tests that server errors are retried, but client errors aren't.
+    """
+    session.status_codes = [503, 200]
+    assert helper_http.request("test", "GET", "url").status_code == 200
+    assert helper_http.get_health()["test"]["state"] == "closed"
+
+    session.status_codes = [404, 200]
+    with pytest.raises(requests.HTTPError):
+        helper_http.request("test", "GET", "url")
+    assert session.status_codes == [200]
+
+
+def test_circuit_opens_and_recovers(session):
+    """
+    Tests that the circuit opens after consecutive failures, rejects calls
+    while open, and closes again after a successful trial call.
+    """
+    session.status_codes = [500, 500]
+    with pytest.raises(requests.HTTPError):
+        helper_http.request("test", "GET", "url")
+    with pytest.raises(helper_http.CircuitOpenError):
+        helper_http.request("test", "GET", "url")
+    health = helper_http.get_health()["test"]
+    assert health["state"] == "open"
+    assert health["rejected"] == 1
+
+    breaker = helper_http.breakers["test"]
+    breaker.opened_at -= breaker.reset_timeout
+    session.status_codes = [200]
+    assert helper_http.request("test", "GET", "url").status_code == 200
+    assert helper_http.get_health()["test"]["state"] == "closed"
+
+
+def test_deadline_limits_timeout(session):
+    """
+    Tests that the read timeout is cut to the time left before the deadline,
+    and nothing is requested once the deadline has passed.
+    """
+    session.status_codes = [200]
+    helper_http.request("test", "GET", "url", deadline=time.monotonic() + 2)
+    assert session.timeouts[0][1] <= 2
+
+    with pytest.raises(helper_http.DeadlineExceededError):
+        helper_http.request("test", "GET", "url", deadline=time.monotonic() - 1)
+    with pytest.raises(helper_http.DeadlineExceededError):
+        helper_http.call("test", lambda: None, deadline=time.monotonic() - 1)
+
+
+def test_call_counts_service_failures(session):
+    """
+    Tests that Google Maps errors caused by the request don't open the
+    circuit, but errors from the service do.
+    """
+
+    def fail(error):
+        raise error
+
+    for _ in range(3):
+        with pytest.raises(googlemaps.exceptions.ApiError):
+            helper_http.call("test", fail, googlemaps.exceptions.ApiError("NOT_FOUND"))
+    assert helper_http.get_health()["test"]["state"] == "closed"
+
+    # Bugs in the caller say nothing about the service either way.
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            helper_http.call("test", fail, KeyError("rows"))
+    health = helper_http.get_health()["test"]
+    assert health["successes"] == 3
+    assert health["failures"] == 0
+
+    for _ in range(2):
+        with pytest.raises(googlemaps.exceptions.TransportError):
+            helper_http.call("test", fail, googlemaps.exceptions.TransportError())
+    assert helper_http.get_health()["test"]["state"] == "open"
+
+
+def test_call_gives_up_at_deadline(session):
+    """
+    Tests that a slow call is given up on at the deadline.
+    """
+    start = time.monotonic()
+    with pytest.raises(helper_http.DeadlineExceededError):
+        helper_http.call("test", time.sleep, 2, deadline=start + 0.1)
+    assert time.monotonic() - start < 1
+    assert helper_http.call("test", lambda: 1, deadline=time.monotonic() + 1) == 1
+
+
+def test_call_keeps_late_result(session):
+    """
+    Tests that the result of a call which finishes after the deadline is
+    passed to the caller's handler.
+    """
+    late_results = []
+
+    def slow():
+        time.sleep(0.2)
+        return "response"
+
+    with pytest.raises(helper_http.DeadlineExceededError):
+        helper_http.call(
+            "test",
+            slow,
+            deadline=time.monotonic() + 0.05,
+            on_late_result=late_results.append,
+        )
+    assert late_results == []
+    time.sleep(0.4)
+    assert late_results == ["response"]
@@ -0,0 +1,101 @@
+"""
+Tests for the background job queue.
+"""
+
+import shutil
+import sqlite3
+import time
+
+import pytest
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    """
+    Creates a queue in a copy of the database, without the jobs queued by
+    migrations.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM job;")
+    return helper_jobs.JobQueue(db_path)
+
+
+def test_run_job(job_queue):
+    """
+    Tests that queued jobs are run with their payload, and removed once done.
+    """
+    results = []
+    job_queue.register("add", lambda a, b: results.append(a + b))
+    job_queue.enqueue("add", {"a": 1, "b": 2})
+    job_queue.enqueue("add", {"a": 3, "b": 4}, delay=60)
+
+    assert job_queue.get_stats() == {"queued": 2, "running": 0, "dead": 0}
+    assert job_queue.run_pending() == 1
+    assert results == [3]
+    assert job_queue.get_stats()["queued"] == 1
+    with pytest.raises(ValueError):
+        job_queue.enqueue("subtract", {})
+
+
+def test_retry_and_dead_letter(job_queue, monkeypatch):
+    """
+    Tests that failed jobs are retried until they've used every attempt, and
+    then moved to the dead letter table, cleaning up after them once.
+    """
+    monkeypatch.setattr(helper_jobs, "RETRY_BACKOFF", 0)
+    attempts = []
+    dead = []
+
+    def fail(name):
+        attempts.append(time.time())
+        raise RuntimeError("Service unavailable")
+
+    job_queue.register("fail", fail, lambda name: dead.append(name))
+    job_id = job_queue.enqueue("fail", {"name": "upload"}, max_attempts=3)
+    assert job_queue.run_pending() == 3
+    assert len(attempts) == 3
+    assert dead == ["upload"]
+    assert job_queue.get_stats() == {"queued": 0, "running": 0, "dead": 1}
+    with helper_database.get_connection(job_queue.db_path) as conn:
+        row = conn.execute(
+            "SELECT job_id, attempts, last_error FROM job_dead_letter;"
+        ).fetchone()
+    assert row[:2] == (job_id, 3)
+    assert "Service unavailable" in row[2]
+
+
+def test_expired_lease(job_queue, monkeypatch):
+    """
+    Tests that a job is claimed once, unless its worker's lease expires.
+    """
+    job_queue.register("noop", lambda: None)
+    job_id = job_queue.enqueue("noop")
+    assert job_queue.claim().job_id == job_id
+    assert job_queue.claim() is None
+
+    monkeypatch.setattr(helper_jobs, "LEASE_DURATION", 0)
+    with helper_database.get_connection(job_queue.db_path) as conn:
+        conn.execute("UPDATE job SET locked_until=0;")
+    job = job_queue.claim()
+    assert (job.job_id, job.attempts) == (job_id, 2)
+
+
+def test_workers(job_queue):
+    """
+    Tests that the worker threads run jobs as soon as they're enqueued.
+    """
+    done = []
+    job_queue.register("done", lambda: done.append(True))
+    job_queue.start()
+    try:
+        job_queue.enqueue("done")
+        deadline = time.time() + 5
+        while not done and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        job_queue.stop()
+    assert done
@@ -0,0 +1,115 @@
+"""
+Tests for applying schema migrations to the database.
+"""
+
+import os
+import shutil
+import sqlite3
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_migrations as helper_migrations
+
+
+def test_migrate(tmp_path):
+    """
+    Tests that a database is migrated to the latest version, and that
+    migrating it again makes no changes.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA user_version=0;")
+
+    assert helper_migrations.migrate(db_path) == len(helper_migrations.MIGRATIONS)
+    assert helper_migrations.migrate(db_path) == len(helper_migrations.MIGRATIONS)
+
+
+def test_migrate_baseline_schema(tmp_path):
+    """
+    Tests that a database with the schema from before any migrations were
+    added is migrated to the same schema as the main database.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    schema_path = os.path.join(os.path.dirname(__file__), "baseline_schema.sql")
+    with sqlite3.connect(db_path) as conn, open(schema_path) as schema:
+        conn.executescript(schema.read())
+        conn.execute("INSERT INTO account VALUES ('janedoe', 'password');")
+        conn.execute(
+            "INSERT INTO route (origin, destination) VALUES ('Exeter', 'Bath');"
+        )
+        conn.execute(
+            "INSERT INTO route_search VALUES ('janedoe', 1, 3, "
+            "'2022-02-01 09:00:00', '2022-02-01 09:00:00');"
+        )
+
+    assert helper_migrations.migrate(db_path) == len(helper_migrations.MIGRATIONS)
+    schema_query = "SELECT type, name, sql FROM sqlite_master ORDER BY name;"
+    with sqlite3.connect(db_path) as conn:
+        with sqlite3.connect(helper_database.get_database_path()) as main_conn:
+            assert conn.execute(schema_query).fetchall() == (
+                main_conn.execute(schema_query).fetchall()
+            )
+        assert conn.execute(
+            "SELECT routes_searched, unique_routes_searched FROM user_stats "
+            "WHERE username='janedoe';"
+        ).fetchone() == (3, 1)
+        assert conn.execute(
+            "SELECT route_id FROM user_top_route WHERE username='janedoe';"
+        ).fetchall() == [(1,)]
+
+
+def test_incomplete_carpools_use_index():
+    """
+    Tests that the query for incomplete carpools searches an index rather
+    than scanning the whole table.
+    """
+    with sqlite3.connect(helper_database.get_database_path()) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT journey_id FROM carpool_ride "
+            "WHERE is_complete=0 AND (pickup_epoch, journey_id) > (?, ?) "
+            "ORDER BY pickup_epoch, journey_id;",
+            (0, 0),
+        ).fetchall()
+    assert "idx_carpool_ride_is_complete_pickup_epoch" in plan[0][3]
+    assert len(plan) == 1
+
+
+def test_rating_summary_triggers(tmp_path):
+    """
+    Tests that the rating summaries match the ratings after ratings are
+    added, changed, and removed.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    helper_migrations.migrate(db_path)
+    summary_query = (
+        "SELECT username, rating_sum, rating_count, rating_average "
+        "FROM rating_summary ORDER BY username;"
+    )
+    aggregate_query = (
+        "SELECT rated_username, SUM(rating_given), COUNT(rating_given), "
+        "AVG(rating_given) FROM rating GROUP BY rated_username "
+        "ORDER BY rated_username;"
+    )
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO rating VALUES (?, ?, 21, ?, 'driver');",
+            [("a", "janedoe", 5), ("b", "janedoe", 2), ("c", "johndoe", 1)],
+        )
+        assert conn.execute(summary_query).fetchall() == (
+            conn.execute(aggregate_query).fetchall()
+        )
+
+        conn.execute("UPDATE rating SET rating_given=4 WHERE rater_username='b';")
+        conn.execute(
+            "UPDATE rating SET rated_username='janedoe' WHERE rater_username='c';"
+        )
+        assert conn.execute(summary_query).fetchall() == (
+            conn.execute(aggregate_query).fetchall()
+        )
+
+        conn.execute("DELETE FROM rating WHERE rated_username='janedoe';")
+        assert conn.execute(summary_query).fetchall() == (
+            conn.execute(aggregate_query).fetchall()
+        )
@@ -0,0 +1,33 @@
+"""
+Tests for the process-wide configuration and API clients.
+"""
+
+import json
+import shutil
+
+import src.travel_buddy.helpers.helper_registry as helper_registry
+
+
+def test_keys_are_loaded_once(tmp_path):
+    """
+    Tests that the keys are only read from the key file once, and are read
+    again when reloaded.
+    """
+    key_file = tmp_path / "keys.json"
+    shutil.copy("tests/keys_test.json", key_file)
+    registry = helper_registry.Registry(str(key_file))
+    assert registry.get_keys().get("test_key2") == "12345"
+
+    # Changes the key file, which only takes effect after a reload.
+    key_file.write_text(json.dumps({"test_key2": "NTQzMjE="}))
+    assert registry.get_keys().get("test_key2") == "12345"
+    registry.reload()
+    assert registry.get_keys().get("test_key2") == "54321"
+
+
+def test_http_session_is_shared():
+    """
+    Tests that the same HTTP session is reused.
+    """
+    registry = helper_registry.Registry("tests/keys_test.json")
+    assert registry.get_http_session() is registry.get_http_session()
@@ -2,7 +2,15 @@
 Tests the correctness of information given by routes analysis.
 """
 
+import shutil
+import time
+
+import src.travel_buddy.helpers.helper_cache as helper_cache
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_jobs as helper_jobs
+import src.travel_buddy.helpers.helper_migrations as helper_migrations
 import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_stats as helper_stats
 
 
 def test_convert_km_to_miles():
@@ -43,9 +51,248 @@ def test_calculate_fuel_cost():
     assert helper_routes.calculate_fuel_cost(10, 0) == 0
 
 
-def test_get_total_routes_searched():
+class SlowMapClient:
+    """
+    Stands in for the Google Maps API client, taking a fixed time per call.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def distance_matrix(self, origins, destinations, mode):
+        time.sleep(self.delay)
+        return {"rows": [{"elements": [{"distance": {"value": 1000, "text": mode}}]}]}
+
+
+def test_run_route_lookups_in_parallel(monkeypatch):
+    """
+    Tests that the lookups for a route analysis run at the same time, so the
+    total time is close to that of the slowest lookup.
+    """
+    monkeypatch.setattr(helper_routes, "get_fuel_price", lambda fuel_type: 1.5)
+    monkeypatch.setattr(
+        helper_routes, "generate_co2_emissions", lambda distance, *args: distance / 10
+    )
+    modes = ("walking", "driving", "bicycling", "transit")
+
+    start = time.monotonic()
+    route_data, fuel_price, driving_co2 = helper_routes.run_route_lookups(
+        SlowMapClient(0.3), "Exeter", "Exmouth", modes, "petrol", 1
+    )
+    assert time.monotonic() - start < 0.3 * len(modes)
+    assert set(route_data) == set(modes)
+    assert fuel_price == 1.5
+    assert driving_co2 == 100
+
+
+def test_run_route_lookups_budget(monkeypatch):
+    """
+    Tests that lookups which exceed the latency budget are given up on.
+    """
+    monkeypatch.setattr(helper_routes, "get_fuel_price", lambda fuel_type: 1.5)
+
+    start = time.monotonic()
+    route_data, fuel_price, driving_co2 = helper_routes.run_route_lookups(
+        SlowMapClient(1), "Exeter", "Exmouth", ("driving",), "petrol", 1, budget=0.2
+    )
+    assert time.monotonic() - start < 0.5
+    assert route_data == {"driving": {}}
+    assert fuel_price == 1.5
+    assert driving_co2 == -1
+
+
+def test_run_route_lookups_fuel_price_unavailable(monkeypatch):
+    """
+    Tests that a failed fuel price lookup is reported as unavailable rather
+    than as a price of zero.
+    """
+
+    def fail(fuel_type):
+        raise ConnectionError("Unable to reach the fuel price website.")
+
+    monkeypatch.setattr(helper_routes, "get_fuel_price", fail)
+    monkeypatch.setattr(
+        helper_routes, "generate_co2_emissions", lambda distance, *args: distance / 10
+    )
+
+    _, fuel_price, driving_co2 = helper_routes.run_route_lookups(
+        SlowMapClient(0), "Exeter", "Exmouth", ("driving",), "petrol", 1
+    )
+    assert fuel_price is None
+    assert driving_co2 == 100
+
+
+def test_get_route_data_serves_stale(tmp_path, monkeypatch):
+    """
+    Tests that an expired route is returned straight away, marked as stale,
+    while it's refreshed in the background.
+    """
+    cache = helper_cache.DistanceMatrixCache(
+        str(tmp_path / "cache.sqlite3"), ttls={"driving": 60}
+    )
+    monkeypatch.setattr(helper_routes, "route_cache", cache)
+    cache.set("Exeter", "Topsham", "driving", {"status": "OK", "rows": []})
+    cache.ttls["driving"] = -1
+
+    class MapClient(SlowMapClient):
+        def distance_matrix(self, origins, destinations, mode):
+            return {
+                "status": "OK",
+                **super().distance_matrix(origins, destinations, mode),
+            }
+
+    start = time.monotonic()
+    response = helper_routes.get_route_data(
+        MapClient(0.3), "Exeter", "Topsham", "driving"
+    )
+    assert time.monotonic() - start < 0.3
+    assert response == {"status": "OK", "rows": [], "stale": True}
+
+    # The refreshed route replaces the expired one once it has finished.
+    cache.ttls["driving"] = 60
+    deadline = time.monotonic() + 5
+    while cache.get("Exeter", "Topsham", "driving") == {"status": "OK", "rows": []}:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert cache.get("Exeter", "Topsham", "driving")["rows"][0]["elements"]
+
+
+def test_record_route_searches(tmp_path, monkeypatch):
+    """
+    Tests that repeated searches for a route are only counted once within the
+    debounce window, and that each user's searches are counted separately.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    start = int(time.time())
+
+    helper_routes.record_route_searches(
+        [
+            ("janedoe", "Exeter", "Bristol", start),
+            ("janedoe", "Exeter", "Bristol", start + 60),
+            ("johndoe", "Exeter", "Bristol", start + 120),
+            ("janedoe", "Exeter", "Bristol", start + 400),
+        ]
+    )
+    conn = helper_database.get_connection()
+    searches = conn.execute(
+        "SELECT s.username, s.search_count, s.last_searched_epoch, "
+        "s.last_updated_epoch FROM route_search s JOIN route r "
+        "ON s.route_id = r.route_id WHERE r.origin='Exeter' "
+        "AND r.destination='Bristol' ORDER BY s.username;"
+    ).fetchall()
+    assert searches == [
+        ("janedoe", 2, start + 400, start + 400),
+        ("johndoe", 1, start + 120, start + 120),
+    ]
+    assert helper_stats.get_user_stats("janedoe")["routes_searched"] == 3
+
+
+def test_get_top_routes(tmp_path, monkeypatch):
+    """
+    Tests that a user's top routes are ordered by search count and then how
+    recently they were searched, and only the most searched are stored.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    start = int(time.time())
+    stored = helper_migrations.TOP_ROUTES_STORED
+
+    # Each search is outside the debounce window, so each one is counted.
+    events = [
+        ("janedoe", f"Origin {i}", "Exeter", start + i * 1000)
+        for i in range(stored + 2)
+    ]
+    events += [("janedoe", "Origin 0", "Exeter", start + 20000)]
+    helper_routes.record_route_searches(events)
+
+    top_routes = helper_routes.get_top_routes("janedoe", stored + 2)
+    assert len(top_routes) == stored
+    assert [route[1:] for route in top_routes[:3]] == [
+        ("Origin 0", "Exeter", 2),
+        (f"Origin {stored + 1}", "Exeter", 1),
+        (f"Origin {stored}", "Exeter", 1),
+    ]
+    assert helper_routes.get_most_frequent_route("janedoe")[1:] == (
+        "Origin 0",
+        "Exeter",
+    )
+    assert helper_routes.get_top_routes("nobody") == []
+    assert helper_routes.get_most_frequent_route("nobody") is None
+    # Without a username, the route is for the user who is logged in.
+    monkeypatch.setattr(helper_routes, "session", {"username": "janedoe"})
+    assert helper_routes.get_most_frequent_route() == (
+        helper_routes.get_most_frequent_route("janedoe")
+    )
+
+
+def test_route_search_buffer(tmp_path, monkeypatch):
     """
-    Tests that the number of routes (unique and total) is calculated correctly.
+    Tests that searches are only buffered while the buffer is running, and
+    are all recorded when it stops.
     """
-    # The username '@' isn't allowed, so it should have no carpools searched.
-    assert helper_routes.get_total_routes_searched("@") == (0, 0)
+    recorded = []
+    monkeypatch.setattr(helper_routes, "record_route_searches", recorded.extend)
+    buffer = helper_routes.RouteSearchBuffer(flush_interval=60000)
+    event = ("janedoe", "Exeter", "Bristol", 0)
+
+    assert not buffer.add(event)
+    buffer.start()
+    assert buffer.add(event)
+    assert buffer.add(event)
+    assert recorded == []
+    buffer.stop()
+    assert recorded == [event, event]
+
+
+def test_route_search_buffer_queues_failures(tmp_path, monkeypatch):
+    """
+    Tests that searches which fail to be recorded are queued as a job, which
+    records them when it runs.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    conn = helper_database.get_connection()
+    with conn:
+        conn.execute("DELETE FROM job;")
+
+    def fail(events):
+        raise ConnectionError("The database is locked.")
+
+    monkeypatch.setattr(helper_routes, "record_route_searches", fail)
+    buffer = helper_routes.RouteSearchBuffer()
+    buffer._events = [("janedoe", "Exeter", "Truro", 0)]
+    assert buffer.flush() == 1
+    assert helper_jobs.job_queue.get_stats()["queued"] == 1
+
+    assert helper_jobs.job_queue.run_pending() == 1
+    assert conn.execute(
+        "SELECT COUNT(*) FROM route_search s JOIN route r USING (route_id) "
+        "WHERE s.username='janedoe' AND r.origin='Exeter' AND r.destination='Truro';"
+    ).fetchone() == (1,)
+
+
+def test_late_route_data_is_cached(tmp_path, monkeypatch):
+    """
+    Tests that a route which arrives after the deadline is still cached, so
+    the next lookup doesn't call the API again.
+    """
+    cache = helper_cache.DistanceMatrixCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(helper_routes, "route_cache", cache)
+
+    class MapClient(SlowMapClient):
+        def distance_matrix(self, origins, destinations, mode):
+            return {
+                **super().distance_matrix(origins, destinations, mode),
+                "status": "OK",
+            }
+
+    response = helper_routes.get_route_data(
+        MapClient(0.2), "Exeter", "Crediton", "driving", time.monotonic() + 0.05
+    )
+    assert response == {}
+    time.sleep(0.4)
+    assert cache.get("Exeter", "Crediton", "driving")["status"] == "OK"
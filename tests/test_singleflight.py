@@ -0,0 +1,70 @@
+"""
+Tests for collapsing concurrent identical lookups.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import src.travel_buddy.helpers.helper_singleflight as helper_singleflight
+
+# Holds up the function being called until every caller has started.
+release = threading.Event()
+
+
+def run_concurrently(flight, key, fn, callers: int) -> list:
+    """
+    Starts calls for the same key from several threads, and releases the
+    function once every caller has joined the call in flight.
+    """
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [executor.submit(flight.do, key, fn) for _ in range(callers)]
+        while flight.get_stats()["calls"] < callers:
+            time.sleep(0.01)
+        release.set()
+        return futures
+
+
+def test_concurrent_calls_are_collapsed():
+    """
+    Tests that concurrent calls for the same key share one call, while calls
+    for another key or after it has finished call the function again.
+    """
+    flight = helper_singleflight.SingleFlight("test")
+    calls = []
+
+    def lookup():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    release.clear()
+    futures = run_concurrently(flight, "key", lookup, 8)
+    assert [future.result() for future in futures] == ["result"] * 8
+    assert len(calls) == 1
+    assert flight.get_stats() == {"calls": 8, "collapsed": 7, "in_flight": 0}
+
+    assert flight.do("key", lookup) == "result"
+    assert flight.do("other", lookup) == "result"
+    assert len(calls) == 3
+    assert flight.get_stats()["collapsed"] == 7
+
+
+def test_exception_is_shared():
+    """
+    Tests that every caller waiting on a failed call gets its exception, and
+    the next call tries again.
+    """
+    flight = helper_singleflight.SingleFlight("test")
+
+    def lookup():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    release.clear()
+    futures = run_concurrently(flight, "key", lookup, 4)
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result()
+    assert flight.do("key", lambda: "recovered") == "recovered"
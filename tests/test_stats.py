@@ -0,0 +1,93 @@
+"""
+Tests for the user statistics shown on profiles.
+"""
+
+import shutil
+
+import pytest
+
+import src.travel_buddy.helpers.helper_carpool as helper_carpool
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_stats as helper_stats
+
+
+def test_user_stats_match_rebuild(tmp_path, monkeypatch):
+    """
+    Tests that the statistics updated as rides are completed, passengers are
+    added, and routes are searched match the statistics calculated from
+    scratch.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    monkeypatch.setattr(helper_routes, "get_fuel_price", lambda fuel_type: 1.5)
+    usernames = ["janedoe", "johndoe"]
+
+    helper_carpool.complete_carpool_ride(21)
+    # Completing a ride again doesn't count it twice.
+    helper_carpool.complete_carpool_ride(21)
+    helper_carpool.add_passenger_to_carpool_journey(25, "johndoe")
+    helper_routes.save_route("janedoe", "Exeter", "Bristol")
+    stats = {username: helper_stats.get_user_stats(username) for username in usernames}
+
+    assert stats["janedoe"]["routes_searched"] == 2
+    assert stats["johndoe"]["carpools_joined"] == 2
+    for row in helper_stats.compute_user_stats(usernames):
+        assert tuple(stats[row[0]].values()) == pytest.approx(row[1:])
+
+    # The statistics of users who no longer exist are removed.
+    with helper_database.get_connection() as conn:
+        helper_stats.update_user_stats(conn.cursor(), "nobody", carpools_joined=1)
+    assert helper_stats.rebuild_user_stats(workers=2) == len(
+        helper_database.get_connection().execute("SELECT * FROM account;").fetchall()
+    )
+    for username in usernames:
+        assert helper_stats.get_user_stats(username) == pytest.approx(stats[username])
+    assert helper_stats.get_user_stats("nobody") == dict.fromkeys(
+        helper_stats.USER_STATS_COLUMNS, 0
+    )
+
+
+def test_complete_ride_without_car(tmp_path, monkeypatch):
+    """
+    Tests that a ride whose driver has no car is completed with its fuel cost
+    left unpriced, and that the driver's statistics can still be shown.
+    """
+    db_path = str(tmp_path / "db.sqlite3")
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+    conn = helper_database.get_connection()
+    driver = conn.execute(
+        "SELECT driver FROM carpool_ride WHERE journey_id=21;"
+    ).fetchone()[0]
+    with conn:
+        conn.execute("DELETE FROM car WHERE owner=?;", (driver,))
+
+    helper_carpool.complete_carpool_ride(21)
+    assert conn.execute(
+        "SELECT is_complete, fuel_cost FROM carpool_ride WHERE journey_id=21;"
+    ).fetchone() == (1, None)
+    stats = helper_stats.get_user_stats(driver)
+    for row in helper_stats.compute_user_stats([driver]):
+        assert tuple(stats.values()) == pytest.approx(row[1:])
+    assert helper_carpool.price_money_saved(
+        driver, stats["fuel_cost_saved"], stats["unpriced_distance"]
+    ) == round(stats["fuel_cost_saved"], 2)
+
+
+def test_compute_user_stats_in_chunks(monkeypatch):
+    """
+    Tests that the statistics of more users than fit in one query are
+    calculated across several queries.
+    """
+    usernames = [
+        row[0]
+        for row in helper_database.get_connection().execute(
+            "SELECT username FROM account ORDER BY username;"
+        )
+    ]
+    expected = helper_stats.compute_user_stats(usernames)
+    monkeypatch.setattr(helper_stats, "MAX_QUERY_USERNAMES", 3)
+    assert sorted(helper_stats.compute_user_stats(usernames)) == sorted(expected)
+    assert len(expected) == len(usernames)
@@ -0,0 +1,103 @@
+"""
+Tests for projecting the fuel cost and CO2 emissions of cars.
+"""
+
+import pytest
+import src.travel_buddy.helpers.helper_ev as helper_ev
+import src.travel_buddy.helpers.helper_general as helper_general
+import src.travel_buddy.helpers.helper_routes as helper_routes
+import src.travel_buddy.helpers.helper_trends as helper_trends
+
+
+def test_parse_monthly_miles():
+    """
+    Tests that only sensible mileages are accepted.
+    """
+    assert helper_trends.parse_monthly_miles("500") == 500
+    assert helper_trends.parse_monthly_miles(None) == 1000
+    assert helper_trends.parse_monthly_miles("abc") == 1000
+    assert helper_trends.parse_monthly_miles("-5") == 1000
+    assert helper_trends.parse_monthly_miles("1000000") == 1000
+
+
+def test_project_evs():
+    """
+    Tests that electric cars are projected over every horizon, matching the
+    single car calculations, for one mileage or a mileage for each car.
+    """
+    projection = helper_trends.project_evs([179, 238], 500)
+    assert projection.costs.shape == (2, len(helper_trends.HORIZONS))
+    assert projection.co2.shape == projection.costs.shape
+    for efficiency, costs, co2 in zip([179, 238], projection.costs, projection.co2):
+        monthly_cost = helper_general.get_ev_cost_1_month(efficiency, 500)
+        monthly_co2 = helper_general.get_ev_co2_1_month(efficiency * 500)
+        assert costs == pytest.approx(
+            [monthly_cost * h for h in helper_trends.HORIZONS]
+        )
+        assert co2 == pytest.approx([monthly_co2 * h for h in helper_trends.HORIZONS])
+
+    projection = helper_trends.project_evs([200, 200], [100, 300], (1, 2))
+    assert projection.costs[1] == pytest.approx([c * 3 for c in projection.costs[0]])
+    assert projection.costs[0][1] == pytest.approx(projection.costs[0][0] * 2)
+
+
+def test_project_fuel_car():
+    """
+    Tests that a petrol car's projection matches the fuel cost calculations.
+    """
+    projection = helper_trends.project_fuel_car(40, 1.5, "petrol", 1.4, 1000, (1, 12))
+    monthly_cost = helper_routes.calculate_fuel_cost(
+        helper_routes.calculate_fuel_used(1000, 40), 1.5
+    )
+    assert projection.costs.tolist() == [
+        pytest.approx([monthly_cost, monthly_cost * 12])
+    ]
+    assert projection.co2[0][1] == pytest.approx(projection.co2[0][0] * 12)
+    assert projection.co2[0][0] > 0
+
+
+def test_project_broadcasts():
+    """
+    Tests that every car is projected over every horizon in one matrix, with
+    no cars giving an empty matrix.
+    """
+    projection = helper_trends.project([1, 2, 3], [0.5, 1, 1.5], (1, 12))
+    assert projection.costs.tolist() == [[1, 12], [2, 24], [3, 36]]
+    assert projection.co2.tolist() == [[0.5, 6], [1, 12], [1.5, 18]]
+    assert helper_trends.project_evs([], 500).costs.shape == (
+        0,
+        len(helper_trends.HORIZONS),
+    )
+
+
+def test_parse_horizons():
+    """
+    Tests that only sensible time horizons are accepted.
+    """
+    assert helper_trends.parse_horizons("1,24,36") == (1, 24, 36)
+    assert helper_trends.parse_horizons(None) == helper_trends.HORIZONS
+    assert helper_trends.parse_horizons("1,a") == helper_trends.HORIZONS
+    assert helper_trends.parse_horizons("0") == helper_trends.HORIZONS
+    assert helper_trends.parse_horizons("1,100000") == helper_trends.HORIZONS
+
+
+def test_compare_ev(monkeypatch):
+    """
+    Tests that comparisons match the projections of each car, and that the
+    monthly figures are remembered for repeated comparisons.
+    """
+    monkeypatch.setattr(helper_routes, "get_fuel_price", lambda fuel_type: 1.5)
+    helper_trends.compare_monthly.cache_clear()
+    car = helper_ev.ElectricCar("Fiat", "500e", 28195, 179, "500e.jpg", 180)
+
+    comparison = helper_trends.compare_ev(car, 40, "petrol", 1.4, 500, (1, 24))
+    ev = helper_trends.project_evs([179], 500, (1, 24))
+    user = helper_trends.project_fuel_car(40, 1.5, "petrol", 1.4, 500, (1, 24))
+    assert comparison["horizons"] == [1, 24]
+    assert comparison["ev"]["costs"] == pytest.approx(ev.costs[0], abs=0.01)
+    assert comparison["user"]["co2"] == pytest.approx(user.co2[0], abs=0.01)
+
+    helper_trends.compare_ev(car, 40, "petrol", 1.4, 500, (12,))
+    assert helper_trends.compare_monthly.cache_info().hits == 1
+    helper_trends.compare_ev(car, 40, "petrol", 1.4, 600)
+    assert helper_trends.compare_monthly.cache_info().misses == 2
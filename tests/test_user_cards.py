@@ -0,0 +1,63 @@
+"""
+Tests for loading the details shown on user cards.
+"""
+
+import shutil
+
+import src.travel_buddy.helpers.helper_database as helper_database
+import src.travel_buddy.helpers.helper_user_cards as helper_user_cards
+from flask import Flask
+
+
+def use_database_copy(monkeypatch, db_path: str) -> None:
+    """
+    Uses a copy of the database, so that the cards aren't affected by other
+    tests.
+    """
+    shutil.copy(helper_database.get_database_path(), db_path)
+    monkeypatch.setattr(helper_database, "get_database_path", lambda: db_path)
+
+
+def test_load_user_cards(tmp_path, monkeypatch):
+    """
+    Tests that the cards of several users are loaded in one query, then
+    cached until the user is invalidated.
+    """
+    use_database_copy(monkeypatch, str(tmp_path / "db.sqlite3"))
+    queries = []
+    helper_database.get_connection().set_trace_callback(queries.append)
+    loader = helper_user_cards.UserCardLoader()
+
+    cards = loader.load(["johndoe", "janedoe", "johndoe", "nobody"])
+    assert len(queries) == 1
+    assert set(cards) == {"johndoe", "janedoe"}
+    assert cards["johndoe"].rating_count == 2
+    assert cards["johndoe"].rating_average == 3.5
+
+    assert loader.load(["janedoe", "johndoe"]) == cards
+    assert len(queries) == 1
+
+    loader.invalidate("janedoe")
+    assert loader.load_one("janedoe") == cards["janedoe"]
+    assert len(queries) == 2
+
+
+def test_user_cards_evicted(tmp_path, monkeypatch):
+    """
+    Tests that the least recently used cards are evicted between requests,
+    but are remembered for the rest of the request.
+    """
+    use_database_copy(monkeypatch, str(tmp_path / "db.sqlite3"))
+    queries = []
+    loader = helper_user_cards.UserCardLoader(max_entries=1)
+    app = Flask(__name__)
+
+    with app.app_context():
+        helper_database.get_connection().set_trace_callback(queries.append)
+        loader.load(["johndoe", "janedoe"])
+        loader.load(["johndoe", "janedoe"])
+        assert len(queries) == 1
+    with app.app_context():
+        helper_database.get_connection().set_trace_callback(queries.append)
+        loader.load(["johndoe", "janedoe"])
+        assert len(queries) == 2